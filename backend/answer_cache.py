@@ -0,0 +1,304 @@
+"""Two-tier answer cache for the /ask endpoint.
+
+Tier 1 is an exact lookup on a hash of the normalized query, language and use
+case. Tier 2 compares character-trigram shingles of the normalized query
+against recent entries in the same (lang, use case) bucket and returns the
+closest one when its Jaccard similarity clears a configurable threshold and
+both queries have the same signature: the same words apart from stopwords.
+Trigrams alone rate "can police arrest me" and "can police not arrest me",
+or "bailable" and "non-bailable", as near-duplicates, so negations and
+numbers always have to match exactly.
+
+Entries live in an in-process LRU with a TTL and can optionally be mirrored to
+a Mongo collection so that answers survive restarts and are shared between
+workers.
+"""
+import hashlib
+import logging
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Any, Dict, FrozenSet, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w\s]+", re.UNICODE)
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    text = _NON_WORD.sub(" ", query.lower())
+    return _SPACES.sub(" ", text).strip()
+
+
+# Ignored when comparing signatures. Negations ("not", "no", "without", ...)
+# and modal verbs are deliberately absent: they change the question.
+STOPWORDS = frozenset("""
+a an the i me my mine we our you your he him his she her it its they them their
+is am are was were be been being do does did have has had to of in on at for by
+from with about as into over under than then so and or if what which who whom
+whose when where why how this that these those there here any some please
+""".split())
+
+# Contractions once punctuation is stripped: "isn't" -> "isn t", "can't" -> "can t"
+_CONTRACTIONS = {
+    "t": "not", "nt": "not",
+    "isn": "is", "aren": "are", "wasn": "was", "weren": "were", "don": "do", "doesn": "does",
+    "didn": "did", "hasn": "has", "haven": "have", "hadn": "had", "won": "will",
+    "wouldn": "would", "shouldn": "should", "couldn": "could", "mustn": "must",
+    "m": "am", "re": "are", "s": "is", "ve": "have", "ll": "will", "d": "had",
+}
+
+
+def query_signature(normalized: str) -> FrozenSet[str]:
+    """Words of a normalized query that a similar query must share"""
+    signature = set()
+    for token in normalized.split(" "):
+        if token == "cannot":
+            signature.update(("can", "not"))
+            continue
+        token = _CONTRACTIONS.get(token, token)
+        if token not in STOPWORDS:
+            signature.add(token)
+    return frozenset(signature)
+
+
+def cache_key(normalized: str, lang: str, use_case: Optional[str]) -> str:
+    raw = f"{lang}|{use_case or 'general'}|{normalized}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def shingles(normalized: str, k: int = 3) -> Set[str]:
+    """Character k-gram shingles of a normalized query"""
+    padded = f" {normalized} "
+    if len(padded) <= k:
+        return {padded}
+    return {padded[i:i + k] for i in range(len(padded) - k + 1)}
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    inter = len(a & b)
+    return inter / (len(a) + len(b) - inter)
+
+
+class _Entry:
+    __slots__ = ("key", "bucket", "tokens", "signature", "shingles", "response", "expires_at")
+
+    def __init__(self, key, bucket, tokens, signature, shingle_set, response, expires_at):
+        self.key = key
+        self.bucket = bucket
+        self.tokens = tokens
+        self.signature = signature
+        self.shingles = shingle_set
+        self.response = response
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    """In-process LRU/TTL answer cache with an optional Mongo mirror"""
+
+    def __init__(
+        self,
+        ttl_seconds: int = 6 * 60 * 60,
+        max_entries: int = 2000,
+        similarity_threshold: float = 0.85,
+        collection=None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.collection = collection
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # bucket -> token -> keys; used to find similarity candidates cheaply
+        self._index: Dict[Tuple[str, str], Dict[str, Set[str]]] = {}
+
+        self._stats = {
+            "exact_hits": 0,
+            "similar_hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "similarity_checks": 0,
+            "similarity_score_sum": 0.0,
+            "near_misses": 0,
+            "signature_rejects": 0,
+        }
+
+    # ---- public API ----
+
+    async def get(self, query: str, lang: str, use_case: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return a cached AskResponse dict or None"""
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+        key = cache_key(normalized, lang, use_case)
+
+        entry = self._get_live(key)
+        if entry:
+            self._stats["exact_hits"] += 1
+            return entry.response
+
+        entry = self._find_similar(normalized, (lang, use_case or "general"))
+        if entry:
+            self._stats["similar_hits"] += 1
+            return entry.response
+
+        if self.collection is not None:
+            response = await self._mongo_get(key)
+            if response is not None:
+                self._stats["mongo_hits"] += 1
+                self._put(key, normalized, (lang, use_case or "general"), response)
+                return response
+
+        self._stats["misses"] += 1
+        return None
+
+    async def set(self, query: str, lang: str, use_case: Optional[str], response: Dict[str, Any]) -> None:
+        """Store an AskResponse dict for the given query"""
+        normalized = normalize_query(query)
+        if not normalized:
+            return
+        key = cache_key(normalized, lang, use_case)
+        self._put(key, normalized, (lang, use_case or "general"), response)
+        self._stats["stores"] += 1
+
+        if self.collection is not None:
+            expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+            try:
+                await self.collection.update_one(
+                    {"key": key},
+                    {"$set": {
+                        "key": key,
+                        "lang": lang,
+                        "use_case": use_case,
+                        "normalized_query": normalized,
+                        "response": response,
+                        "expires_at": expires_at,
+                    }},
+                    upsert=True,
+                )
+            except Exception as e:
+                logger.warning(f"Answer cache write failed: {e}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._index.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self._stats["exact_hits"] + self._stats["similar_hits"] + self._stats["mongo_hits"]
+        lookups = hits + self._stats["misses"]
+        checks = self._stats["similarity_checks"]
+        return {
+            **self._stats,
+            "hits": hits,
+            "lookups": lookups,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "avg_best_similarity": round(self._stats["similarity_score_sum"] / checks, 4) if checks else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "similarity_threshold": self.similarity_threshold,
+            "mongo_enabled": self.collection is not None,
+        }
+
+    # ---- internals ----
+
+    def _get_live(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at < time.monotonic():
+            self._remove(key)
+            self._stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _find_similar(self, normalized: str, bucket: Tuple[str, str]) -> Optional[_Entry]:
+        token_index = self._index.get(bucket)
+        if not token_index:
+            return None
+
+        candidates: Set[str] = set()
+        for token in normalized.split(" "):
+            candidates.update(token_index.get(token, ()))
+        if not candidates:
+            return None
+
+        query_shingles = shingles(normalized)
+        signature = query_signature(normalized)
+        best_key, best_score = None, 0.0
+        for key in candidates:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            score = jaccard(query_shingles, entry.shingles)
+            if entry.signature != signature:
+                # Close in spelling but a different question (negation, number, ...)
+                if score >= self.similarity_threshold:
+                    self._stats["signature_rejects"] += 1
+                continue
+            if score > best_score:
+                best_key, best_score = key, score
+
+        self._stats["similarity_checks"] += 1
+        self._stats["similarity_score_sum"] += best_score
+        if best_key is None or best_score < self.similarity_threshold:
+            if best_score >= self.similarity_threshold - 0.1:
+                self._stats["near_misses"] += 1
+            return None
+        return self._get_live(best_key)
+
+    def _put(self, key: str, normalized: str, bucket: Tuple[str, str], response: Dict[str, Any]) -> None:
+        if key in self._entries:
+            self._remove(key)
+
+        tokens = frozenset(normalized.split(" "))
+        self._entries[key] = _Entry(
+            key, bucket, tokens, query_signature(normalized), shingles(normalized), response,
+            time.monotonic() + self.ttl_seconds,
+        )
+        token_index = self._index.setdefault(bucket, {})
+        for token in tokens:
+            token_index.setdefault(token, set()).add(key)
+
+        while len(self._entries) > self.max_entries:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        token_index = self._index.get(entry.bucket, {})
+        for token in entry.tokens:
+            keys = token_index.get(token)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del token_index[token]
+
+    async def _mongo_get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            doc = await self.collection.find_one({"key": key}, {"_id": 0, "response": 1, "expires_at": 1})
+        except Exception as e:
+            logger.warning(f"Answer cache read failed: {e}")
+            return None
+        if not doc:
+            return None
+        expires_at = doc["expires_at"]
+        if isinstance(expires_at, str):  # written before dates were stored natively
+            expires_at = datetime.fromisoformat(expires_at)
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        if expires_at < datetime.now(timezone.utc):
+            return None
+        return doc["response"]
@@ -0,0 +1,334 @@
+"""Pre-generated answers for the canonical questions behind the use-case chips.
+
+canonical_questions.json lists the most asked questions per use case and
+language, most asked first, each with a few aliases. ``build`` generates an
+answer for each through the same search + LLM pipeline as /ask and stores
+it in the ``answer_packs`` collection as a candidate; answers that did not
+parse completely are not kept. A candidate is served once it is approved
+(``approve``, or ``build --approve``), so answers can be reviewed first. A
+rebuild replaces the candidate and the approved answer keeps being served
+until the new one is approved.
+
+``AnswerPacks`` loads the approved answers into memory at startup and again
+every ``reload_seconds``, so approvals reach every worker without a restart.
+/ask answers from it, before the answer cache, when the normalized query
+equals a canonical question or alias, or is within ``similarity_threshold``
+(trigram Jaccard, as in the answer cache) of one for the same language and
+use case with the same signature, so "... if I am not arrested?" never
+gets the answer to "... if I am arrested?".
+
+Refresh on a schedule, e.g. weekly from cron:
+
+    cd backend && python answer_packs.py build --stale-days 7 [--top 5] [--approve]
+    python answer_packs.py list
+    python answer_packs.py approve --all | ID...
+    python answer_packs.py suggest --days 30    # most asked questions, to curate the list
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from answer_cache import cache_key, jaccard, normalize_query, query_signature, shingles
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUESTIONS = os.path.join(os.path.dirname(__file__), "canonical_questions.json")
+
+# (question, lang, use_case) -> (AskResponse dict, complete)
+Generate = Callable[[str, str, str], Awaitable[Tuple[Dict[str, Any], bool]]]
+
+
+def pack_id(question: str, lang: str, use_case: str) -> str:
+    return f"{use_case}:{lang}:{cache_key(normalize_query(question), lang, use_case)[:12]}"
+
+
+def load_questions(path: str = DEFAULT_QUESTIONS) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def top_questions(questions: List[Dict[str, Any]], top: int) -> List[Dict[str, Any]]:
+    """The first ``top`` questions of each (use case, language)"""
+    taken: Counter = Counter()
+    selected = []
+    for question in questions:
+        group = (question["use_case"], question["lang"])
+        if taken[group] < top:
+            taken[group] += 1
+            selected.append(question)
+    return selected
+
+
+class AnswerPacks:
+    def __init__(self, collection, similarity_threshold: float = 0.85):
+        self.collection = collection
+        self.similarity_threshold = similarity_threshold
+        self._exact: Dict[str, Dict[str, Any]] = {}
+        # (lang, use case) -> signature -> [(shingles, response)]
+        self._buckets: Dict[Tuple[str, str], Dict[FrozenSet[str], List[Tuple[Set[str], Dict[str, Any]]]]] = {}
+        self._packs = 0
+        self._loaded_at: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {"exact_hits": 0, "similar_hits": 0, "misses": 0, "reloads": 0, "reload_errors": 0}
+
+    async def start(self, reload_seconds: float = 300):
+        await self.reload()
+        if self._task is None and reload_seconds > 0:
+            self._task = asyncio.create_task(self._run(reload_seconds))
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def reload(self) -> int:
+        """Load approved answers; on failure the previous set is kept"""
+        try:
+            docs = await self.collection.find(
+                {"response": {"$type": "object"}},
+                {"_id": 1, "use_case": 1, "lang": 1, "question": 1, "aliases": 1, "response": 1},
+            ).to_list(None)
+        except Exception as e:
+            self._stats["reload_errors"] += 1
+            logger.error(f"Answer packs reload failed: {e}")
+            return self._packs
+
+        exact: Dict[str, Dict[str, Any]] = {}
+        buckets: Dict[Tuple[str, str], Dict[FrozenSet[str], List[Tuple[Set[str], Dict[str, Any]]]]] = defaultdict(lambda: defaultdict(list))
+        for doc in docs:
+            bucket = (doc["lang"], doc["use_case"])
+            for phrasing in [doc["question"], *doc.get("aliases", [])]:
+                normalized = normalize_query(phrasing)
+                if normalized:
+                    exact[cache_key(normalized, *bucket)] = doc["response"]
+                    buckets[bucket][query_signature(normalized)].append((shingles(normalized), doc["response"]))
+
+        # Swap whole maps so lookups never see a half-built set
+        self._exact, self._buckets = exact, {bucket: dict(groups) for bucket, groups in buckets.items()}
+        self._packs = len(docs)
+        self._loaded_at = datetime.now(timezone.utc)
+        self._stats["reloads"] += 1
+        return self._packs
+
+    def get(self, query: str, lang: str, use_case: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return the approved AskResponse dict for a canonical question, or None"""
+        if not use_case or not self._packs:
+            return None
+        normalized = normalize_query(query)
+        if not normalized:
+            return None
+
+        response = self._exact.get(cache_key(normalized, lang, use_case))
+        if response is not None:
+            self._stats["exact_hits"] += 1
+            return response
+
+        query_shingles = shingles(normalized)
+        best, best_score = None, 0.0
+        # Only phrasings with the same words apart from stopwords are compared
+        candidates = self._buckets.get((lang, use_case), {}).get(query_signature(normalized), ())
+        for candidate_shingles, candidate in candidates:
+            score = jaccard(query_shingles, candidate_shingles)
+            if score > best_score:
+                best, best_score = candidate, score
+        if best is not None and best_score >= self.similarity_threshold:
+            self._stats["similar_hits"] += 1
+            return best
+
+        self._stats["misses"] += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "packs": self._packs,
+            "phrasings": len(self._exact),
+            "loaded_at": self._loaded_at,
+            "similarity_threshold": self.similarity_threshold,
+        }
+
+    # ---- internals ----
+
+    async def _run(self, reload_seconds: float):
+        while True:
+            await asyncio.sleep(reload_seconds)
+            await self.reload()
+
+
+# ====== Batch job ======
+
+async def build_packs(
+    collection,
+    questions: List[Dict[str, Any]],
+    generate: Generate,
+    stale_days: float = 0,
+    approve: bool = False,
+) -> Dict[str, int]:
+    """Generate candidates for ``questions``; returns counts by outcome"""
+    counts: Counter = Counter()
+    now = datetime.now(timezone.utc)
+    for question in questions:
+        use_case, lang = question["use_case"], question["lang"]
+        _id = pack_id(question["question"], lang, use_case)
+        meta = {
+            "use_case": use_case,
+            "lang": lang,
+            "question": question["question"],
+            "aliases": question.get("aliases", []),
+        }
+
+        existing = await collection.find_one({"_id": _id}, {"generated_at": 1})
+        generated_at = existing.get("generated_at") if existing else None
+        if stale_days and generated_at and now - generated_at < timedelta(days=stale_days):
+            # Still fresh; aliases may have changed, the answer has not
+            await collection.update_one({"_id": _id}, {"$set": meta})
+            counts["fresh"] += 1
+            continue
+
+        try:
+            response, complete = await generate(question["question"], lang, use_case)
+        except Exception as e:
+            logger.error(f"{_id}: generation failed: {e}")
+            counts["failed"] += 1
+            continue
+        if not complete:
+            logger.warning(f"{_id}: answer did not parse completely; keeping the previous one")
+            counts["incomplete"] += 1
+            continue
+
+        update: Dict[str, Any] = {"$set": {**meta, "generated_at": now}}
+        if approve:
+            update["$set"].update({"response": response, "approved_at": now})
+            update["$unset"] = {"candidate": ""}
+        else:
+            update["$set"]["candidate"] = response
+        await collection.update_one({"_id": _id}, update, upsert=True)
+        counts["generated"] += 1
+        logger.info(f"{_id}: generated{' and approved' if approve else ''}")
+    return dict(counts)
+
+
+async def approve_packs(collection, ids: Optional[List[str]] = None) -> int:
+    """Serve the pending candidates of ``ids`` (all pending ones if None)"""
+    query: Dict[str, Any] = {"candidate": {"$type": "object"}}
+    if ids is not None:
+        query["_id"] = {"$in": ids}
+    approved = 0
+    async for doc in collection.find(query, {"candidate": 1}):
+        await collection.update_one(
+            {"_id": doc["_id"]},
+            {"$set": {"response": doc["candidate"], "approved_at": datetime.now(timezone.utc)}, "$unset": {"candidate": ""}},
+        )
+        approved += 1
+    return approved
+
+
+async def prune_packs(collection, keep: Set[str]) -> int:
+    result = await collection.delete_many({"_id": {"$nin": sorted(keep)}})
+    return result.deleted_count
+
+
+async def suggest_questions(ask_logs, days: int, top: int) -> Dict[str, List[Tuple[str, int]]]:
+    """Most asked normalized questions per use case over the last ``days``"""
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    pipeline = [
+        {"$match": {"created_at": {"$gte": since}}},
+        {"$group": {"_id": {"use_case": "$use_case", "query": "$query"}, "count": {"$sum": 1}}},
+    ]
+    counts: Dict[str, Counter] = defaultdict(Counter)
+    async for row in ask_logs.aggregate(pipeline):
+        normalized = normalize_query(row["_id"].get("query") or "")
+        if normalized:
+            counts[row["_id"].get("use_case") or "general"][normalized] += row["count"]
+    return {use_case: counter.most_common(top) for use_case, counter in sorted(counts.items())}
+
+
+async def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Build and manage pre-generated answers for canonical questions")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="generate answers for the canonical questions")
+    build.add_argument("--questions", default=DEFAULT_QUESTIONS)
+    build.add_argument("--top", type=int, default=5, help="questions per use case and language")
+    build.add_argument("--use-cases", help="comma-separated use cases (default all)")
+    build.add_argument("--stale-days", type=float, default=0, help="skip answers generated more recently than this")
+    build.add_argument("--approve", action="store_true", help="serve new answers without review")
+    build.add_argument("--prune", action="store_true", help="delete packs for questions no longer listed")
+    commands.add_parser("list", help="show packs and their review status")
+    approve = commands.add_parser("approve", help="serve pending answers")
+    approve.add_argument("ids", nargs="*")
+    approve.add_argument("--all", action="store_true")
+    suggest = commands.add_parser("suggest", help="most asked questions per use case from ask_logs")
+    suggest.add_argument("--days", type=int, default=30)
+    suggest.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    if args.command == "approve" and not (args.ids or args.all):
+        print("Pass pack ids or --all", file=sys.stderr)
+        return 2
+
+    if args.command != "build":
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"), tz_aware=True)
+        db = client.get_database(os.environ.get("DB_NAME", "adhikaar"))
+        try:
+            if args.command == "list":
+                async for doc in db.answer_packs.find({}).sort("_id", 1):
+                    status = "approved" if doc.get("response") else "pending"
+                    if doc.get("response") and doc.get("candidate"):
+                        status = "approved, update pending"
+                    print(f"{doc['_id']:32} {status:26} {doc.get('generated_at')}  {doc['question']}")
+            elif args.command == "approve":
+                print(f"approved {await approve_packs(db.answer_packs, None if args.all else args.ids)}")
+            else:
+                for use_case, rows in (await suggest_questions(db.ask_logs, args.days, args.top)).items():
+                    print(use_case)
+                    for query, count in rows:
+                        print(f"  {count:6}  {query}")
+        finally:
+            client.close()
+        return 0
+
+    # Generate through the /ask pipeline itself, with its LLM and search configuration
+    import server
+
+    questions = top_questions(load_questions(args.questions), args.top)
+    if args.use_cases:
+        wanted = {name.strip() for name in args.use_cases.split(",")}
+        questions = [q for q in questions if q["use_case"] in wanted]
+
+    async def generate(question: str, lang: str, use_case: str):
+        ask_request = server.AskRequest(query=question, lang=lang, context={"useCase": use_case})
+        response_text, sources = await server.run_ask_pipeline(ask_request, use_case)
+        result, complete = server.build_ask_response(response_text, ask_request, sources)
+        return result.model_dump(), complete
+
+    await server.llm_router.start()
+    await server.search_client.start()
+    try:
+        counts = await build_packs(server.db.answer_packs, questions, generate, args.stale_days, args.approve)
+        if args.prune and not args.use_cases:
+            keep = {pack_id(q["question"], q["lang"], q["use_case"]) for q in questions}
+            counts["pruned"] = await prune_packs(server.db.answer_packs, keep)
+    finally:
+        await server.search_client.close()
+        await server.llm_router.close()
+        server.client.close()
+    print(" ".join(f"{k}={v}" for k, v in sorted(counts.items())) or "nothing to do")
+    return 1 if counts.get("failed") else 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
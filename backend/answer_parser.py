@@ -0,0 +1,183 @@
+"""Parse the model's /ask answer into AskResponse fields.
+
+The model is asked for ``{"title", "summary", "steps", "template"}`` but
+replies vary: code fences, prose before or after the object, output cut off
+at the token limit, or plain numbered text. ``parse_answer`` handles them
+in order of preference:
+
+1. ``json``: the text between the outermost braces is decoded (with
+   ``orjson`` when it is installed), which covers code fences and prose
+   around the object; if that fails, one string-aware pass over the text
+   finds the first balanced ``{...}`` and that is decoded instead;
+2. ``repaired``: if that pass reaches the end with containers still open,
+   the output was cut off; it is truncated after the last complete value,
+   which keeps every field and step that was complete, and the containers
+   are closed;
+3. ``text``: numbered or bulleted lines become steps and the remaining
+   prose the summary.
+
+Whatever was recovered is then validated field by field; values of the
+wrong type are dropped rather than failing the whole answer.
+"""
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson is optional
+    _loads = json.loads
+
+MAX_STEPS = 5
+
+_STEP_LINE = re.compile(r"^\s*(?:\d{1,2}[.)]|[-*•])\s+(.+)$")
+_HEADING_LINE = re.compile(r"^\s*(?:#+|\*\*)")
+# Whole strings (escapes included) are one token, so their contents are skipped
+_JSON_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\],]|"')
+
+
+@dataclass
+class ParsedAnswer:
+    status: str  # "json", "repaired" or "text"
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    steps: List[str] = field(default_factory=list)
+    template: Optional[str] = None
+
+    @property
+    def complete(self) -> bool:
+        """True for a well-formed answer with every field the prompt asks for"""
+        return self.status == "json" and bool(self.title and self.summary and self.steps)
+
+
+def _scan(text: str, start: int) -> Tuple[Optional[int], Optional[str]]:
+    """One pass over ``text`` from the ``{`` at ``start``.
+
+    Returns (end, None) when the object closes at ``end``, otherwise
+    (None, repaired) where ``repaired`` is the text up to the last complete
+    value with the open containers closed, or None if nothing complete was
+    seen.
+    """
+    stack: List[str] = []
+    cut = None
+    for match in _JSON_TOKEN.finditer(text, start):
+        token = match.group()
+        if token == "{" or token == "[":
+            stack.append("}" if token == "{" else "]")
+        elif token == "}" or token == "]":
+            if stack:
+                stack.pop()
+            if not stack:
+                return match.end(), None
+            cut = (match.end(), "".join(reversed(stack)))
+        elif token == ",":
+            # Everything before a comma is complete
+            cut = (match.start(), "".join(reversed(stack)))
+        elif token == '"':
+            break  # unterminated string: the output was cut off here
+        elif stack[-1] == "]":
+            # A closed string inside an array is a complete element
+            cut = (match.end(), "".join(reversed(stack)))
+    if cut is None:
+        return None, None
+    return None, text[start:cut[0]] + cut[1]
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """Return the first balanced top-level ``{...}`` in ``text``, or None"""
+    start = text.find("{")
+    if start < 0:
+        return None
+    end, _ = _scan(text, start)
+    return text[start:end] if end is not None else None
+
+
+def _clean_text(value: Any) -> Optional[str]:
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return None
+
+
+def _clean_steps(value: Any) -> List[str]:
+    if not isinstance(value, list):
+        return []
+    steps = []
+    for item in value:
+        if isinstance(item, dict):
+            # Some replies use [{"step": "..."}] or [{"text": "..."}]
+            item = item.get("step") or item.get("text") or item.get("description")
+        text = _clean_text(item)
+        if text:
+            steps.append(text)
+    return steps[:MAX_STEPS]
+
+
+def validate_fields(status: str, data: Dict[str, Any]) -> ParsedAnswer:
+    return ParsedAnswer(
+        status=status,
+        title=_clean_text(data.get("title")),
+        summary=_clean_text(data.get("summary")),
+        steps=_clean_steps(data.get("steps")),
+        template=_clean_text(data.get("template")),
+    )
+
+
+def _decode(candidate: str) -> Optional[Dict[str, Any]]:
+    try:
+        data = _loads(candidate)
+    except ValueError:  # json and orjson decode errors both subclass it
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _parse_json(text: str) -> Optional[ParsedAnswer]:
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    # Usually everything between the outermost braces is the object, which
+    # also drops code fences and prose. Braces in trailing prose are stepped
+    # back over a few times; past that, or for cut-off output, scan instead
+    end = len(text)
+    for _ in range(3):
+        end = text.rfind("}", start, end)
+        if end < 0:
+            break
+        data = _decode(text[start:end + 1])
+        if data is not None:
+            return validate_fields("json", data)
+
+    end, repaired = _scan(text, start)
+    if end is not None:
+        data = _decode(text[start:end])
+        return validate_fields("json", data) if data is not None else None
+    if repaired is not None:
+        data = _decode(repaired)
+        if data is not None:
+            answer = validate_fields("repaired", data)
+            if answer.title or answer.summary or answer.steps:
+                return answer
+    return None
+
+
+def _parse_text(text: str) -> ParsedAnswer:
+    steps = []
+    summary_lines = []
+    for line in text.splitlines():
+        match = _STEP_LINE.match(line)
+        if match:
+            steps.append(match.group(1).strip())
+        elif line.strip() and not _HEADING_LINE.match(line) and not line.strip().startswith("```"):
+            if len(" ".join(summary_lines)) <= 150:
+                summary_lines.append(line.strip())
+    summary = " ".join(summary_lines[:3]) or text.strip()[:200] or None
+    return ParsedAnswer(status="text", summary=summary, steps=steps[:MAX_STEPS])
+
+
+def parse_answer(text: str) -> ParsedAnswer:
+    return _parse_json(text) or _parse_text(text)
+
@@ -0,0 +1,394 @@
+"""Load test for /ask, /wallet/*, /themes and /auth/me.
+
+By default the app runs in-process: requests go through ``httpx.ASGITransport``,
+Mongo is replaced by ``mongomock_motor`` (or a real mongod with
+``--mongo-url``), the LLM is the ``mock`` provider and Google search is a
+stub, both with configurable latency. ``--base-url`` drives an already
+running server instead, with whatever LLM and search it is configured for.
+
+Requests are sent open-loop: each scenario is picked by weight and started
+on a fixed schedule at ``--rps``, whether or not earlier requests have
+finished, so a slow server shows up as latency and errors rather than as a
+lower request rate. The report gives throughput, p50/p95/p99 latency and
+error rate per scenario and overall. With ``--max-p95-ms`` or
+``--max-error-rate`` the exit status is 1 when a scenario exceeds them, so
+the run can gate a deploy.
+
+    cd backend && python -m benchmarks.load_test [--rps 50] [--duration 30] \\
+        [--llm-latency-ms 800] [--search-latency-ms 150] [--output report.json]
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+import uuid
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+DEFAULT_MIX = "ask=2,wallet_list=3,wallet_get=1,wallet_save=1,themes=2,auth_me=3"
+
+QUERIES = [
+    "Police refused to file my FIR, what can I do?",
+    "My landlord is not returning my security deposit",
+    "How do I file a consumer complaint against an online seller?",
+    "My employer has not paid my salary for three months",
+    "How can I get a copy of my land records?",
+    "What should I do after a road accident with no insurance details?",
+    "How do I file an RTI application?",
+    "My bank charged me for a transaction I did not make",
+]
+USE_CASES = ["police", "tenant", "consumer", "employment", "land", "traffic", "rti", "banking"]
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def latency(mean_ms: float, jitter: float) -> Callable[[], float]:
+    """Seconds drawn from a lognormal around ``mean_ms``; ``jitter`` is its sigma"""
+    if mean_ms <= 0:
+        return lambda: 0.0
+    if jitter <= 0:
+        return lambda: mean_ms / 1000
+    return lambda: random.lognormvariate(0, jitter) * mean_ms / 1000
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+# ====== Scenarios ======
+
+class LoadUser:
+    """One signed-in user with a client that sends their session cookie"""
+
+    def __init__(self, client: httpx.AsyncClient, doc_ids: List[str]):
+        self.client = client
+        self.doc_ids = doc_ids
+
+
+async def ask(user: LoadUser, args) -> httpx.Response:
+    i = random.randrange(args.ask_distinct)
+    return await user.client.post("/api/v1/ask", json={
+        "query": f"{QUERIES[i % len(QUERIES)]} (case {i})",
+        "context": {"useCase": USE_CASES[i % len(USE_CASES)]},
+    })
+
+
+async def wallet_list(user: LoadUser, args) -> httpx.Response:
+    return await user.client.get("/api/v1/wallet/list", params={"limit": 20})
+
+
+async def wallet_get(user: LoadUser, args) -> httpx.Response:
+    return await user.client.get(f"/api/v1/wallet/{random.choice(user.doc_ids)}")
+
+
+async def wallet_save(user: LoadUser, args) -> httpx.Response:
+    response = await user.client.post("/api/v1/wallet/save", json={
+        "title": f"Draft {uuid.uuid4().hex[:8]}",
+        "content": "x" * args.doc_bytes,
+        "tags": random.sample(["consumer", "police", "rti", "refund"], 2),
+    })
+    if response.status_code == 200:
+        user.doc_ids.append(response.json()["id"])
+    return response
+
+
+async def themes(user: LoadUser, args) -> httpx.Response:
+    return await user.client.get("/api/v1/themes")
+
+
+async def auth_me(user: LoadUser, args) -> httpx.Response:
+    return await user.client.get("/api/auth/me")
+
+
+SCENARIOS = {
+    "ask": ask,
+    "wallet_list": wallet_list,
+    "wallet_get": wallet_get,
+    "wallet_save": wallet_save,
+    "themes": themes,
+    "auth_me": auth_me,
+}
+
+
+# ====== App under test ======
+
+def configure_environment(args) -> bool:
+    """Set before server is imported; explicit environment variables win.
+
+    Returns True when the database is a scratch one to drop afterwards.
+    """
+    scratch = "DB_NAME" not in os.environ
+    os.environ.setdefault("MONGO_URL", args.mongo_url or "mongodb://localhost:27017")
+    os.environ.setdefault("DB_NAME", f"adhikaar_loadtest_{uuid.uuid4().hex[:8]}")
+    os.environ.setdefault("LLM_PROVIDER", "mock")
+    os.environ.setdefault("LLM_ROUTING_POLICY", "off")
+    os.environ.setdefault("GOOGLE_API_KEY", "loadtest")
+    os.environ.setdefault("GOOGLE_CSE_ID", "loadtest")
+    # The load generator is a handful of users, so per-user limits would
+    # turn most /ask calls into 429s
+    os.environ.setdefault("RATE_LIMIT_BACKEND", "local")
+    os.environ.setdefault("ASK_RATE_LIMIT", "1000000/minute")
+
+    if not args.mongo_url:
+        try:
+            import mongomock_motor
+        except ImportError:
+            raise SystemExit("mongomock_motor is not installed; pip install mongomock-motor or pass --mongo-url")
+        import motor.motor_asyncio
+
+        motor.motor_asyncio.AsyncIOMotorClient = mongomock_motor.AsyncMongoMockClient
+    return scratch
+
+
+def search_stub(search_latency: Callable[[], float]) -> httpx.AsyncClient:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(search_latency())
+        query = request.url.params.get("q", "")
+        return httpx.Response(200, json={"items": [
+            {
+                "title": f"Result {i} for {query[:40]}",
+                "link": f"https://indiankanoon.org/doc/{abs(hash((query, i))) % 10 ** 8}/",
+                "snippet": "Stub search result used by the load test.",
+            }
+            for i in range(3)
+        ]})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def start_app(args):
+    scratch = configure_environment(args)
+    import server
+
+    for route in server.llm_router.routes:
+        provider = route.pool.provider
+        if getattr(provider, "name", None) == "mock":
+            provider.delay = latency(args.llm_latency_ms, args.jitter)
+    # start() keeps a client that is already set
+    server.search_client._client = search_stub(latency(args.search_latency_ms, args.jitter))
+
+    # server configures INFO logging, which would log every request
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    await server.app.router.startup()
+    return server, scratch
+
+
+async def stop_app(server, drop_database: bool):
+    await server.app.router.shutdown()
+    if drop_database:
+        await server.client.drop_database(server.db.name)
+    server.client.close()
+
+
+# ====== Load generator ======
+
+async def create_users(make_client: Callable[[Dict[str, str]], httpx.AsyncClient], args) -> List[LoadUser]:
+    users = []
+    for i in range(args.users):
+        token = uuid.uuid4().hex
+        client = make_client({"Cookie": f"session_token={token}"})
+        response = await client.post("/api/auth/session", json={
+            "session_token": token,
+            "email": f"load{i}-{token[:6]}@example.com",
+            "name": f"Load User {i}",
+        })
+        response.raise_for_status()
+        user = LoadUser(client, [])
+        for _ in range(args.seed_docs):
+            await wallet_save(user, args)
+        for j in range(args.seed_themes):
+            await client.post("/api/v1/themes", json={"name": f"Theme {j}", "tokens": {"colors": {"primary": "#123456"}}})
+        users.append(user)
+    return users
+
+
+async def run_load(users: List[LoadUser], mix: Dict[str, float], args) -> Dict[str, Any]:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples: Dict[str, List[float]] = defaultdict(list)
+    statuses: Dict[str, Counter] = defaultdict(Counter)
+    in_flight = set()
+    max_in_flight = 0
+
+    async def one(name: str):
+        user = random.choice(users)
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(SCENARIOS[name](user, args), args.timeout)
+            status = str(response.status_code)
+        except asyncio.TimeoutError:
+            status = "timeout"
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        samples[name].append((time.perf_counter() - started) * 1000)
+        statuses[name][status] += 1
+
+    loop = asyncio.get_running_loop()
+    interval = 1 / args.rps
+    total = int(args.rps * args.duration)
+    started = loop.time()
+    late = 0
+    for i in range(total):
+        # Fixed schedule: sleep until the i-th slot, never "after the last one finished"
+        delay = started + i * interval - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif delay < -interval:
+            late += 1
+        task = asyncio.create_task(one(random.choices(names, weights)[0]))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+        max_in_flight = max(max_in_flight, len(in_flight))
+    send_seconds = loop.time() - started
+    if in_flight:
+        await asyncio.wait(list(in_flight))
+    elapsed = loop.time() - started
+
+    def summary(latencies: List[float], counts: Counter) -> Dict[str, Any]:
+        ordered = sorted(latencies)
+        requests = sum(counts.values())
+        errors = sum(n for status, n in counts.items() if not status.startswith("2"))
+        return {
+            "requests": requests,
+            "throughput_rps": round(requests / elapsed, 1),
+            "p50_ms": round(percentile(ordered, 50), 1),
+            "p95_ms": round(percentile(ordered, 95), 1),
+            "p99_ms": round(percentile(ordered, 99), 1),
+            "max_ms": round(ordered[-1], 1) if ordered else 0.0,
+            "error_rate": round(errors / requests, 4) if requests else 0.0,
+            "statuses": dict(counts),
+        }
+
+    overall = summary([ms for name in samples for ms in samples[name]], sum(statuses.values(), Counter()))
+    overall.update({
+        "target_rps": args.rps,
+        "send_seconds": round(send_seconds, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "late_sends": late,
+        "max_in_flight": max_in_flight,
+    })
+    return {
+        "overall": overall,
+        "scenarios": {name: summary(samples[name], statuses[name]) for name in names if statuses[name]},
+    }
+
+
+def check_thresholds(report: Dict[str, Any], args) -> List[str]:
+    failures = []
+    for name, result in report["scenarios"].items():
+        if args.max_p95_ms and result["p95_ms"] > args.max_p95_ms:
+            failures.append(f"{name}: p95 {result['p95_ms']}ms > {args.max_p95_ms}ms")
+        if args.max_error_rate is not None and result["error_rate"] > args.max_error_rate:
+            failures.append(f"{name}: error rate {result['error_rate']} > {args.max_error_rate}")
+    return failures
+
+
+async def _main(args) -> int:
+    mix = parse_mix(args.mix)
+    random.seed(args.seed)
+
+    clients: List[httpx.AsyncClient] = []
+    server = None
+    scratch = False
+    if args.base_url:
+        base_url = args.base_url
+        transport = None
+    else:
+        server, scratch = await start_app(args)
+        base_url = "http://loadtest"
+        transport = httpx.ASGITransport(app=server.app)
+
+    def make_client(headers: Dict[str, str]) -> httpx.AsyncClient:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            transport=transport,
+            headers=headers,
+            limits=httpx.Limits(max_connections=args.connections, max_keepalive_connections=args.connections),
+        )
+        clients.append(client)
+        return client
+
+    try:
+        users = await create_users(make_client, args)
+        if args.warmup:
+            warmup = argparse.Namespace(**{**vars(args), "duration": args.warmup})
+            await run_load(users, mix, warmup)
+        report = await run_load(users, mix, args)
+    finally:
+        for client in clients:
+            await client.aclose()
+        if server is not None:
+            await stop_app(server, scratch and bool(args.mongo_url))
+
+    report["config"] = {
+        "target": args.base_url or ("in-process, mongod" if args.mongo_url else "in-process, mongomock"),
+        "mix": mix,
+        "users": args.users,
+        "llm_latency_ms": None if args.base_url else args.llm_latency_ms,
+        "search_latency_ms": None if args.base_url else args.search_latency_ms,
+        "jitter": args.jitter,
+    }
+    if server is not None:
+        report["server"] = {
+            "answer_cache": server.answer_cache.stats(),
+            "llm": server.llm_router.stats(),
+            "flights": server.ask_flights.stats(),
+        }
+
+    rendered = json.dumps(report, indent=2, default=str)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(rendered + "\n")
+    print(rendered)
+
+    failures = check_thresholds(report, args)
+    for failure in failures:
+        print(f"FAIL {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rps", type=float, default=50, help="target request rate")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load")
+    parser.add_argument("--warmup", type=float, default=0, help="seconds of unreported load first")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"scenario weights (default {DEFAULT_MIX})")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--seed-docs", type=int, default=30, help="wallet documents per user before the run")
+    parser.add_argument("--seed-themes", type=int, default=3, help="themes per user before the run")
+    parser.add_argument("--doc-bytes", type=int, default=2000, help="content size of saved documents")
+    parser.add_argument("--ask-distinct", type=int, default=40, help="distinct /ask questions (lower means more cache hits)")
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--search-latency-ms", type=float, default=150)
+    parser.add_argument("--jitter", type=float, default=0.5, help="lognormal sigma for stub latencies, 0 for fixed")
+    parser.add_argument("--timeout", type=float, default=30, help="client timeout per request")
+    parser.add_argument("--connections", type=int, default=100, help="connections per user client")
+    parser.add_argument("--mongo-url", help="use this mongod instead of mongomock (a scratch database is dropped afterwards)")
+    parser.add_argument("--base-url", help="load an already running server instead of starting one")
+    parser.add_argument("--max-p95-ms", type=float, help="fail when any scenario's p95 is above this")
+    parser.add_argument("--max-error-rate", type=float, help="fail when any scenario's error rate is above this")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the JSON report here")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(_main(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Compare answer_parser with the previous /ask parsing on a corpus of LLM replies.
+
+Each corpus line is ``{"kind", "text", "expected_steps"}``. For both parsers
+the report gives the parse time per reply (mean, median, worst), how often
+the reply was recovered as structured data rather than by the plain-text
+fallback, and how often the steps came out exactly as expected.
+
+    cd backend && python -m benchmarks.parse_answers [corpus.jsonl] [--repeat N]
+"""
+import argparse
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Tuple
+
+from answer_parser import parse_answer
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "llm_outputs.jsonl")
+
+
+def legacy_parse(response_text: str) -> Tuple[bool, List[str]]:
+    """The fence slicing + json.loads + line fallback /ask used before answer_parser"""
+    try:
+        if '```json' in response_text:
+            json_start = response_text.find('```json') + 7
+            json_end = response_text.find('```', json_start)
+            response_text = response_text[json_start:json_end].strip()
+        elif '```' in response_text:
+            json_start = response_text.find('```') + 3
+            json_end = response_text.find('```', json_start)
+            response_text = response_text[json_start:json_end].strip()
+        parsed_data = json.loads(response_text)
+        return True, parsed_data.get('steps', [])[:5]
+    except (json.JSONDecodeError, KeyError):
+        steps = []
+        for line in response_text.split('\n'):
+            cleaned = line.strip()
+            if cleaned.startswith(('1.', '2.', '3.', '4.', '5.', '-', '•')):
+                steps.append(cleaned.lstrip('123456789.-•').strip())
+        return False, steps[:5]
+
+
+def current_parse(response_text: str) -> Tuple[bool, List[str]]:
+    answer = parse_answer(response_text)
+    return answer.status != "text", answer.steps
+
+
+def run(corpus: List[Dict[str, Any]], parse, repeat: int) -> Dict[str, Any]:
+    row_us = []
+    for row in corpus:
+        started = time.perf_counter()
+        for _ in range(repeat):
+            parse(row["text"])
+        row_us.append((time.perf_counter() - started) / repeat * 1e6)
+    row_us.sort()
+
+    structured = 0
+    steps_ok = 0
+    failures = defaultdict(int)
+    for row in corpus:
+        ok, steps = parse(row["text"])
+        structured += ok
+        if steps == row["expected_steps"]:
+            steps_ok += 1
+        else:
+            failures[row["kind"]] += 1
+    return {
+        "us_per_parse_mean": round(sum(row_us) / len(row_us), 1),
+        "us_per_parse_p50": round(row_us[len(row_us) // 2], 1),
+        "us_per_parse_max": round(row_us[-1], 1),
+        "structured": f"{structured}/{len(corpus)}",
+        "steps_exact": f"{steps_ok}/{len(corpus)}",
+        "step_failures_by_kind": dict(failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="?", default=DEFAULT_CORPUS)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(args.corpus, encoding="utf-8") as f:
+        corpus = [json.loads(line) for line in f if line.strip()]
+
+    report = {
+        "corpus": len(corpus),
+        "legacy": run(corpus, legacy_parse, args.repeat),
+        "answer_parser": run(corpus, current_parse, args.repeat),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Response serialization cost for /wallet/list and /themes payloads.
+
+``before`` is the previous path: documents with ISO-string dates returned
+as a dict, so FastAPI runs ``jsonable_encoder`` over them and renders a
+``JSONResponse``. ``after`` is the current path: documents with native
+datetimes rendered directly by ``ORJSONResponse``.
+
+    cd backend && python -m benchmarks.serialization [--docs N] [--repeat N]
+"""
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+
+def wallet_docs(n: int) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "user_id": str(uuid.uuid4()),
+            "title": f"Complaint draft {i}",
+            "tags": ["consumer", "refund"] if i % 2 else ["police"],
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(n)
+    ]
+
+
+def themes(n: int) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    tokens = {
+        "colors": {f"c{j}": f"#{j:06x}" for j in range(24)},
+        "radius": {"sm": 4, "md": 8, "lg": 16},
+        "font": {"family": "Inter", "sizes": [12, 14, 16, 20, 24]},
+    }
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name": f"Theme {i}",
+            "tokens": tokens,
+            "owner_id": str(uuid.uuid4()),
+            "scope": "user",
+            "visibility": "private",
+            "status": "published",
+            "created_at": now,
+            "updated_at": now,
+            "deleted_at": None,
+            "version": "1.0.0",
+        }
+        for i in range(n)
+    ]
+
+
+def as_iso_strings(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{k: v.isoformat() if isinstance(v, datetime) else v for k, v in doc.items()} for doc in docs]
+
+
+def before(key: str, docs: List[Dict[str, Any]]) -> bytes:
+    return JSONResponse(jsonable_encoder({key: docs})).body
+
+
+def after(key: str, docs: List[Dict[str, Any]]) -> bytes:
+    return ORJSONResponse({key: docs}).body
+
+
+def timed(fn: Callable[[], bytes], repeat: int) -> Dict[str, float]:
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "ms_p50": round(samples[len(samples) // 2], 3),
+        "ms_p95": round(samples[int(len(samples) * 0.95)], 3),
+        "bytes": len(fn()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    report = {}
+    for route, key, docs in (
+        ("/wallet/list", "documents", wallet_docs(args.docs)),
+        ("/themes", "themes", themes(args.docs)),
+    ):
+        legacy_docs = as_iso_strings(docs)
+        old = timed(lambda: before(key, legacy_docs), args.repeat)
+        new = timed(lambda: after(key, docs), args.repeat)
+        report[route] = {
+            "docs": args.docs,
+            "before": old,
+            "after": new,
+            "speedup_p50": round(old["ms_p50"] / new["ms_p50"], 1),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
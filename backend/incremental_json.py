@@ -0,0 +1,161 @@
+"""Incremental parser for the streamed /ask JSON answer.
+
+The model is asked for a flat object of the form
+``{"title": str, "summary": str, "steps": [str, ...], "template": str|null}``.
+``IncrementalAnswerParser`` consumes the text as it arrives and reports each
+top-level field, and each element of a top-level array, as soon as its value
+is complete, so the SSE endpoint can push them before generation finishes.
+Leading prose and markdown code fences are skipped by waiting for the first
+``{``.
+"""
+import json
+from typing import Any, List, Optional, Tuple
+
+# (kind, key, value) where kind is "field" for a completed top-level value
+# or "item" for a completed element of a top-level array
+ParseEvent = Tuple[str, str, Any]
+
+
+class IncrementalAnswerParser:
+    def __init__(self):
+        self._started = False
+        self._done = False
+        self._stack: List[str] = []  # container types: "{" or "["
+        self._in_string = False
+        self._escape = False
+        self._string_buf: List[str] = []
+        self._expect_key = True
+        self._key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._array_items: List[Any] = []
+        self._scalar_buf: List[str] = []
+        # Raw text of a nested value (object, or non-string array element)
+        self._nested_buf: List[str] = []
+        self._nested_base = 0
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def feed(self, chunk: str) -> List[ParseEvent]:
+        events: List[ParseEvent] = []
+        for ch in chunk:
+            if self._done:
+                break
+            if not self._started:
+                if ch == "{":
+                    self._started = True
+                    self._stack.append("{")
+                continue
+            self._consume(ch, events)
+        return events
+
+    # ---- internals ----
+
+    def _depth(self) -> int:
+        return len(self._stack)
+
+    def _consume(self, ch: str, events: List[ParseEvent]):
+        depth = self._depth()
+
+        # Anything nested below the level we report on is captured raw
+        if self._nested_base:
+            self._nested_buf.append(ch)
+            if self._in_string:
+                self._advance_string(ch)
+                return
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._stack.append(ch)
+            elif ch in "}]":
+                self._stack.pop()
+                if self._depth() < self._nested_base:
+                    self._finish_nested(events)
+            return
+
+        if self._in_string:
+            if self._advance_string(ch):
+                self._finish_string(events)
+            else:
+                self._string_buf.append(ch)
+            return
+
+        if self._scalar_buf and ch in ",}]":
+            self._finish_scalar(events)
+
+        if ch == '"':
+            self._in_string = True
+            self._string_buf = []
+        elif ch == ":" and depth == 1:
+            self._expect_key = False
+        elif ch == "," and depth == 1:
+            self._expect_key = True
+        elif ch == "[" and depth == 1 and not self._expect_key:
+            self._stack.append("[")
+            self._array_key = self._key
+            self._array_items = []
+        elif ch == "]" and depth == 2:
+            self._stack.pop()
+            events.append(("field", self._array_key, self._array_items))
+            self._array_key = None
+        elif ch == "}" and depth == 1:
+            self._stack.pop()
+            self._done = True
+        elif ch in "{[":
+            # Nested object at top level, or nested container inside an array
+            self._nested_base = depth + 1
+            self._nested_buf = [ch]
+            self._stack.append(ch)
+        elif not ch.isspace() and ch != ",":
+            self._scalar_buf.append(ch)
+
+    def _advance_string(self, ch: str) -> bool:
+        """Track escapes; return True when ``ch`` closes the string"""
+        if self._escape:
+            self._escape = False
+            return False
+        if ch == "\\":
+            self._escape = True
+            return False
+        if ch == '"':
+            self._in_string = False
+            return True
+        return False
+
+    def _emit_value(self, value: Any, events: List[ParseEvent]):
+        if self._depth() == 2:
+            self._array_items.append(value)
+            events.append(("item", self._array_key, value))
+        elif self._key is not None:
+            events.append(("field", self._key, value))
+
+    def _finish_string(self, events: List[ParseEvent]):
+        raw = "".join(self._string_buf)
+        try:
+            value = json.loads(f'"{raw}"')
+        except json.JSONDecodeError:
+            value = raw
+        if self._depth() == 1 and self._expect_key:
+            self._key = value
+        else:
+            self._emit_value(value, events)
+
+    def _finish_scalar(self, events: List[ParseEvent]):
+        raw = "".join(self._scalar_buf).strip()
+        self._scalar_buf = []
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        self._emit_value(value, events)
+
+    def _finish_nested(self, events: List[ParseEvent]):
+        raw = "".join(self._nested_buf)
+        self._nested_base = 0
+        self._nested_buf = []
+        try:
+            value = json.loads(raw)
+        except json.JSONDecodeError:
+            value = raw
+        self._emit_value(value, events)
@@ -0,0 +1,180 @@
+"""Index declarations and query-plan verification.
+
+``REQUIRED_INDEXES`` lists every index the API's queries rely on;
+``ensure_indexes`` creates them at startup (``create_indexes`` is a no-op for
+indexes that already exist with the same spec). ``QUERY_SHAPES`` mirrors the
+filters used by the routes, and ``verify_query_plans`` runs ``explain()`` on
+each one and raises if any of them would fall back to a collection scan.
+
+Run against a local mongod to check the plans, e.g. in CI:
+
+    MONGO_URL=mongodb://localhost:27017 DB_NAME=adhikaar_test python indexes.py
+"""
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_INDEXES: Dict[str, List[IndexModel]] = {
+    "sessions": [
+        IndexModel([("token_hash", ASCENDING)], name="token_hash_unique", unique=True),
+        # Sessions are removed by Mongo once expires_at (a BSON date) has passed
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "users": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    "wallet_docs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Keyset pagination sorts by (created_at, id) within a user
+        IndexModel(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="user_id_created_at_id",
+        ),
+    ],
+    "themes": [
+        IndexModel([("id", ASCENDING), ("owner_id", ASCENDING)], name="id_owner_id"),
+        IndexModel(
+            [("owner_id", ASCENDING), ("scope", ASCENDING), ("status", ASCENDING)],
+            name="owner_id_scope_status",
+        ),
+    ],
+    "ask_logs": [
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "answer_cache": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "ask_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Workers claim queued jobs whose run_after has passed, and running
+        # jobs whose lease has expired
+        IndexModel([("status", ASCENDING), ("run_after", ASCENDING)], name="status_run_after"),
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease_until"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "rate_limits": [
+        # Bucket counters are looked up by _id; old buckets expire on their own
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "translations": [
+        # Looked up by _id (a hash of language and text). created_at is set on
+        # every write, so a translation is dropped 30 days after it was last
+        # stored and the next answer that needs it translates it again
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl", expireAfterSeconds=30 * 24 * 60 * 60),
+    ],
+}
+
+_PLACEHOLDER_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# (name, collection, filter) for each query the routes issue
+QUERY_SHAPES = [
+    ("session_by_token", "sessions", {"token_hash": "x"}),
+    ("user_by_id", "users", {"id": "x"}),
+    ("user_by_email", "users", {"email": "x@example.com"}),
+    ("wallet_list", "wallet_docs", {"user_id": "x"}),
+    ("wallet_list_page", "wallet_docs", {
+        "user_id": "x",
+        "$or": [{"created_at": {"$lt": "x"}}, {"created_at": "x", "id": {"$lt": "x"}}],
+    }),
+    ("wallet_list_page_date", "wallet_docs", {
+        "user_id": "x",
+        "$or": [
+            {"created_at": {"$lt": _PLACEHOLDER_DATE}},
+            {"created_at": _PLACEHOLDER_DATE, "id": {"$lt": "x"}},
+            {"created_at": {"$type": "string"}},
+        ],
+    }),
+    ("wallet_delete", "wallet_docs", {"id": "x", "user_id": "x"}),
+    ("wallet_blobs_by_hash", "wallet_blobs", {"_id": {"$in": ["x"]}}),
+    ("themes_list", "themes", {"scope": "user", "status": {"$ne": "deleted"}, "owner_id": "x"}),
+    ("theme_by_id", "themes", {"id": "x", "owner_id": "x"}),
+    ("theme_version", "theme_versions", {"_id": "x"}),
+    ("translations_by_key", "translations", {"_id": {"$in": ["x"]}}),
+    ("ask_logs_range", "ask_logs", {"created_at": {"$gte": _PLACEHOLDER_DATE}}),
+    ("answer_cache_by_key", "answer_cache", {"key": "x"}),
+    ("ask_job_by_id", "ask_jobs", {"id": "x"}),
+    ("ask_job_claim", "ask_jobs", {"$or": [
+        {"status": "queued", "run_after": {"$lte": _PLACEHOLDER_DATE}},
+        {"status": "running", "lease_until": {"$lt": _PLACEHOLDER_DATE}},
+    ]}),
+]
+
+
+async def ensure_indexes(db) -> None:
+    """Create all required indexes; failures are logged per collection"""
+    for collection, indexes in REQUIRED_INDEXES.items():
+        try:
+            await db[collection].create_indexes(indexes)
+        except Exception as e:
+            logger.error(f"Index creation failed for {collection}: {e}")
+
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    stages = []
+    stack = [plan]
+    while stack:
+        node = stack.pop()
+        if "queryPlan" in node:  # slot-based engine wraps the classic plan
+            node = node["queryPlan"]
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "inputStage" in node:
+            stack.append(node["inputStage"])
+        stack.extend(node.get("inputStages", []))
+    return stages
+
+
+async def explain_query_shapes(db) -> List[Dict[str, Any]]:
+    """Return the winning plan stages for every declared query shape"""
+    report = []
+    for name, collection, query in QUERY_SHAPES:
+        explain = await db[collection].find(query).explain()
+        stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+        report.append({
+            "name": name,
+            "collection": collection,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages,
+        })
+    return report
+
+
+async def verify_query_plans(db) -> List[Dict[str, Any]]:
+    """Raise RuntimeError if any declared query shape is planned as a COLLSCAN"""
+    report = await explain_query_shapes(db)
+    scans = [r["name"] for r in report if r["collscan"]]
+    if scans:
+        raise RuntimeError(f"Queries without a supporting index (COLLSCAN): {', '.join(scans)}")
+    return report
+
+
+async def _main() -> int:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"))
+    db = client.get_database(os.environ.get("DB_NAME", "adhikaar"))
+    try:
+        await ensure_indexes(db)
+        for row in await explain_query_shapes(db):
+            status = "COLLSCAN" if row["collscan"] else "ok"
+            print(f"{status:9} {row['name']:22} {' <- '.join(row['stages'])}")
+        await verify_query_plans(db)
+    except RuntimeError as e:
+        print(e, file=sys.stderr)
+        return 1
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
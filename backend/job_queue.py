@@ -0,0 +1,357 @@
+"""Persistent job queue for /ask work that may take longer than a request.
+
+Jobs are documents in a Mongo collection. ``JobQueue.enqueue`` inserts one
+as ``queued``; worker tasks claim the oldest runnable job with
+``find_one_and_update``, which sets it ``running`` with a lease, and run the
+handler on it. Any number of workers can share the collection: the web
+process (``workers`` > 0), separate worker processes (``python
+job_queue.py``), or both. LLM concurrency is then set by the worker count,
+not by how many requests the web workers hold open.
+
+* A job whose handler raises ``RetryableJobError`` is queued again after an
+  exponential backoff, up to ``max_attempts``; other errors fail it.
+* A job whose worker died is claimed again once its lease has passed. A
+  worker that is stopped puts its running jobs back in the queue.
+* Finished jobs get ``expires_at`` and are removed by a TTL index after
+  ``retention_seconds``.
+* If the job has a ``callback_url``, the finished job is POSTed to it, with an
+  ``X-Adhikaar-Signature`` HMAC-SHA256 header when a secret is configured.
+  Delivery is retried a few times; clients that must not miss a result
+  should also poll.
+* Callback URLs must be https and resolve only to public addresses, checked
+  when the job is enqueued and again before every delivery attempt, so
+  users cannot point the worker at loopback, private, link-local or cloud
+  metadata addresses. Redirects are not followed. A host could still change
+  its DNS answer between the check and the connection; set an allowlist of
+  callback hosts where that matters.
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import random
+import socket
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+JOB_FIELDS = {"_id": 0, "id": 1, "status": 1, "attempts": 1, "result": 1, "error": 1, "created_at": 1, "updated_at": 1, "finished_at": 1}
+
+
+class RetryableJobError(Exception):
+    """The job may succeed if run again later (timeouts, overload)"""
+
+    def __init__(self, message: str, status: int = 503):
+        super().__init__(message)
+        self.status = status
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+def validate_callback_url(url: str, allowed_hosts: Optional[Set[str]] = None) -> str:
+    """Raise ValueError unless ``url`` is an https URL (on an allowed host, if any are set)"""
+    parts = urlsplit(url)
+    if parts.scheme != "https" or not parts.hostname:
+        raise ValueError("callback_url must be an https URL")
+    if allowed_hosts and parts.hostname.lower() not in allowed_hosts:
+        raise ValueError("callback_url host is not allowed")
+    return url
+
+
+def _is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def check_callback_url(url: str, allowed_hosts: Optional[Set[str]] = None) -> str:
+    """``validate_callback_url``, plus a ValueError unless every address the
+    host resolves to is public"""
+    validate_callback_url(url, allowed_hosts)
+    parts = urlsplit(url)
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(parts.hostname, parts.port or 443, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError):
+        raise ValueError("callback_url host does not resolve")
+    if not infos or not all(_is_public_address(info[4][0]) for info in infos):
+        raise ValueError("callback_url must resolve to a public address")
+    return url
+
+
+def sign_payload(body: bytes, secret: str) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class JobQueue:
+    def __init__(
+        self,
+        collection,
+        handler: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        workers: int = 4,
+        timeout: float = 150,
+        max_attempts: int = 3,
+        retry_base_seconds: float = 5,
+        poll_interval: float = 1.0,
+        max_queued: int = 10000,
+        retention_seconds: int = 24 * 60 * 60,
+        webhook_secret: str = "",
+        webhook_timeout: float = 5.0,
+        webhook_attempts: int = 3,
+        callback_hosts: Optional[Set[str]] = None,
+    ):
+        self.collection = collection
+        self.handler = handler
+        self.workers = workers
+        self.timeout = timeout
+        # Long enough that a live worker always finishes (or times out) first
+        self.lease_seconds = timeout + 30
+        self.max_attempts = max_attempts
+        self.retry_base_seconds = retry_base_seconds
+        self.poll_interval = poll_interval
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self.webhook_secret = webhook_secret
+        self.webhook_timeout = webhook_timeout
+        self.webhook_attempts = webhook_attempts
+        # Empty allows any host that resolves to public addresses
+        self.callback_hosts = {host.lower() for host in callback_hosts or ()}
+
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._tasks: list = []
+        self._webhooks: Set[asyncio.Task] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._running = 0
+        self._stats = {"enqueued": 0, "succeeded": 0, "failed": 0, "retried": 0, "reclaimed": 0, "webhooks_delivered": 0, "webhooks_failed": 0}
+
+    async def start(self):
+        if self._tasks or self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        self._client = httpx.AsyncClient(timeout=self.webhook_timeout, follow_redirects=False)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        # Whatever this process was running goes back to the queue for other workers
+        await self.collection.update_many(
+            {"status": "running", "worker_id": self.worker_id},
+            {"$set": {"status": "queued", "run_after": datetime.now(timezone.utc)}, "$inc": {"attempts": -1}},
+        )
+        if self._webhooks:
+            await asyncio.wait(list(self._webhooks), timeout=self.webhook_timeout)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def enqueue(self, payload: Dict[str, Any], user_id: Optional[str] = None, callback_url: Optional[str] = None) -> Dict[str, Any]:
+        if self.max_queued and await self.collection.count_documents({"status": "queued"}, limit=self.max_queued) >= self.max_queued:
+            raise JobQueueFull()
+        now = datetime.now(timezone.utc)
+        job = {
+            "id": str(uuid.uuid4()),
+            "status": "queued",
+            "payload": payload,
+            "user_id": user_id,
+            "callback_url": callback_url,
+            "attempts": 0,
+            "created_at": now,
+            "updated_at": now,
+            "run_after": now,
+        }
+        await self.collection.insert_one(dict(job))
+        self._stats["enqueued"] += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.collection.find_one({"id": job_id}, {**JOB_FIELDS, "user_id": 1})
+
+    async def counts(self) -> Dict[str, int]:
+        counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        async for row in self.collection.aggregate([{"$group": {"_id": "$status", "n": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["n"]
+        return counts
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "workers": len(self._tasks), "running_here": self._running, "worker_id": self.worker_id}
+
+    # ---- internals ----
+
+    async def _claim(self) -> Optional[Dict[str, Any]]:
+        now = datetime.now(timezone.utc)
+        return await self.collection.find_one_and_update(
+            {"$or": [
+                {"status": "queued", "run_after": {"$lte": now}},
+                # The worker holding it died or hung past its lease
+                {"status": "running", "lease_until": {"$lt": now}},
+            ]},
+            {
+                "$set": {
+                    "status": "running",
+                    "worker_id": self.worker_id,
+                    "lease_until": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("run_after", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _work(self):
+        while True:
+            try:
+                job = await self._claim()
+            except Exception as e:
+                logger.error(f"Job claim failed: {e}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    # Woken early by jobs enqueued in this process; others are picked up by polling
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval * (0.5 + random.random()))
+                except (asyncio.TimeoutError, TimeoutError):
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except Exception:
+                # Recording the outcome failed (Mongo down); the job is
+                # claimed again once its lease runs out
+                logger.exception(f"Job {job['id']} could not be completed")
+
+    async def _run(self, job: Dict[str, Any]):
+        if job["attempts"] > 1:
+            self._stats["reclaimed" if job.get("error") is None else "retried"] += 1
+        self._running += 1
+        try:
+            result = await asyncio.wait_for(self.handler(job), timeout=self.timeout)
+        except RetryableJobError as e:
+            await self._failed(job, e.status, str(e), retryable=True)
+        except (asyncio.TimeoutError, TimeoutError):
+            await self._failed(job, 504, "The job took too long", retryable=True)
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}", exc_info=True)
+            await self._failed(job, 500, "The job failed", retryable=False)
+        else:
+            await self._finish(job, {"status": "succeeded", "result": result})
+            self._stats["succeeded"] += 1
+        finally:
+            self._running -= 1
+
+    async def _failed(self, job: Dict[str, Any], status: int, detail: str, retryable: bool):
+        error = {"status": status, "detail": detail}
+        if retryable and job["attempts"] < self.max_attempts:
+            delay = self.retry_base_seconds * 2 ** (job["attempts"] - 1)
+            now = datetime.now(timezone.utc)
+            await self.collection.update_one(
+                {"id": job["id"], "worker_id": self.worker_id, "attempts": job["attempts"]},
+                {"$set": {"status": "queued", "error": error, "run_after": now + timedelta(seconds=delay), "updated_at": now}},
+            )
+            return
+        await self._finish(job, {"status": "failed", "error": error})
+        self._stats["failed"] += 1
+
+    async def _finish(self, job: Dict[str, Any], fields: Dict[str, Any]):
+        now = datetime.now(timezone.utc)
+        fields = {**fields, "updated_at": now, "finished_at": now, "expires_at": now + timedelta(seconds=self.retention_seconds)}
+        if fields["status"] == "succeeded":
+            fields["error"] = None
+        # Conditional on still holding the job: if the lease ran out and
+        # another worker took it over, that worker's outcome stands
+        updated = await self.collection.find_one_and_update(
+            {"id": job["id"], "worker_id": self.worker_id, "attempts": job["attempts"]},
+            {"$set": fields},
+            projection={**JOB_FIELDS, "callback_url": 1},
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated and updated.get("callback_url"):
+            task = asyncio.create_task(self._deliver(updated))
+            self._webhooks.add(task)
+            task.add_done_callback(self._webhooks.discard)
+
+    async def _deliver(self, job: Dict[str, Any]):
+        url = job.pop("callback_url")
+        body = json.dumps(job, default=lambda value: value.isoformat()).encode()
+        headers = {"Content-Type": "application/json", "X-Adhikaar-Job": job["id"]}
+        if self.webhook_secret:
+            headers["X-Adhikaar-Signature"] = sign_payload(body, self.webhook_secret)
+
+        last_status = None
+        for attempt in range(self.webhook_attempts):
+            try:
+                # Checked again at delivery: DNS may have changed since enqueue
+                await check_callback_url(url, self.callback_hosts)
+                response = await self._client.post(url, content=body, headers=headers)
+                last_status = response.status_code
+                if response.status_code < 300:
+                    self._stats["webhooks_delivered"] += 1
+                    await self.collection.update_one(
+                        {"id": job["id"]},
+                        {"$set": {"webhook": {"delivered_at": datetime.now(timezone.utc), "attempts": attempt + 1}}},
+                    )
+                    return
+            except httpx.HTTPError as e:
+                last_status = type(e).__name__
+            except ValueError as e:
+                last_status = str(e)
+            await asyncio.sleep(2 ** attempt)
+
+        self._stats["webhooks_failed"] += 1
+        logger.warning(f"Webhook for job {job['id']} failed after {self.webhook_attempts} attempts: {last_status}")
+        await self.collection.update_one(
+            {"id": job["id"]},
+            {"$set": {"webhook": {"failed_at": datetime.now(timezone.utc), "attempts": self.webhook_attempts, "last_status": str(last_status)}}},
+        )
+
+
+async def _main() -> int:
+    """Run job workers without serving HTTP; configured like the server"""
+    import signal
+
+    import server
+
+    queue = server.ask_jobs
+    if queue.workers <= 0:
+        queue.workers = int(os.environ.get('ASK_JOB_PROCESS_WORKERS', 8))
+    # The server's startup hooks start the LLM clients and the queue itself
+    for hook in server.app.router.on_startup:
+        await hook()
+    logger.info(f"Job worker {queue.worker_id} running {queue.workers} workers")
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    await stopped.wait()
+
+    for hook in server.app.router.on_shutdown:
+        await hook()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(asyncio.run(_main()))
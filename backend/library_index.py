@@ -0,0 +1,317 @@
+"""Full-text search over the legal library (acts, sections, rules).
+
+The index is an inverted index with BM25 scoring, precomputed per posting at
+build time, so a query is a handful of NumPy gathers and adds. Everything is
+stored as flat ``.npy`` arrays that ``LibraryIndex.load`` memory-maps, so a
+worker can open a 100k-section index without parsing it.
+
+On-disk layout (one directory):
+
+    meta.json          counts, BM25 parameters, tag names
+    terms.npy          UTF-8 bytes of all sorted terms, concatenated
+    term_offsets.npy   int64 [n_terms + 1] byte offsets into terms.npy
+    post_offsets.npy   int64 [n_terms + 1] offsets into the posting arrays
+    post_docs.npy      int32 document ids, grouped by term
+    post_weights.npy   float32 BM25 weight of the term in that document
+    tag_offsets.npy    int64 [n_tags + 1] offsets into tag_docs.npy
+    tag_docs.npy       int32 document ids, grouped by tag
+    docs.npy           UTF-8 JSON of each document's display fields
+    doc_offsets.npy    int64 [n_docs + 1] byte offsets into docs.npy
+
+Build from a JSONL corpus (one object per section with id, title, text or
+snippet, url, source_type and tags):
+
+    python library_index.py build corpus.jsonl /path/to/index
+"""
+import json
+import math
+import os
+import re
+import sys
+import unicodedata
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Latin word characters plus the Indic script blocks (Devanagari .. Malayalam);
+# \w alone splits Devanagari words at vowel signs and viramas.
+_TOKEN = re.compile(r"[\w\u0900-\u0d7f]+", re.UNICODE)
+
+STOPWORDS = frozenset(
+    # English
+    "a an and are as at be by for from in is it of on or the to with under "
+    "shall any such this that which"
+    # Hindi
+    " का की के को में है हैं और से पर एक यह वह भी या"
+    .split()
+)
+
+_DISPLAY_FIELDS = ("id", "title", "snippet", "url", "source_type", "tags")
+
+_ARRAYS = ("terms", "term_offsets", "post_offsets", "post_docs", "post_weights",
+           "tag_offsets", "tag_docs", "docs", "doc_offsets")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, NFC-normalized tokens for mixed Hindi/English text"""
+    text = unicodedata.normalize("NFC", text).lower()
+    return [t for t in _TOKEN.findall(text) if t not in STOPWORDS and t != "_"]
+
+
+class LibraryIndex:
+    TITLE_BOOST = 3
+
+    def __init__(self, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]):
+        self.meta = meta
+        self.n_docs = meta["n_docs"]
+        self.tag_names: List[str] = meta["tags"]
+        self._tag_ids = {tag: i for i, tag in enumerate(self.tag_names)}
+        self._terms = arrays["terms"]
+        self._term_offsets = arrays["term_offsets"]
+        self._post_offsets = arrays["post_offsets"]
+        self._post_docs = arrays["post_docs"]
+        self._post_weights = arrays["post_weights"]
+        self._tag_offsets = arrays["tag_offsets"]
+        self._tag_docs = arrays["tag_docs"]
+        self._docs = arrays["docs"]
+        self._doc_offsets = arrays["doc_offsets"]
+        self.n_terms = len(self._term_offsets) - 1
+
+    # ---- building ----
+
+    @classmethod
+    def build(cls, documents: Iterable[Dict[str, Any]], k1: float = 1.2, b: float = 0.75) -> "LibraryIndex":
+        postings: Dict[str, List[tuple]] = defaultdict(list)
+        tag_docs: Dict[str, List[int]] = defaultdict(list)
+        doc_lengths: List[int] = []
+        doc_blobs: List[bytes] = []
+
+        for doc_id, doc in enumerate(documents):
+            body = doc.get("text") or doc.get("snippet") or ""
+            tokens = tokenize(doc.get("title", "")) * cls.TITLE_BOOST + tokenize(body)
+            for term, tf in Counter(tokens).items():
+                postings[term].append((doc_id, tf))
+            doc_lengths.append(len(tokens))
+            for tag in doc.get("tags", []):
+                tag_docs[tag].append(doc_id)
+
+            display = {field: doc.get(field) for field in _DISPLAY_FIELDS}
+            display["id"] = str(display["id"] if display["id"] is not None else doc_id)
+            display["snippet"] = display["snippet"] or body[:300]
+            display["tags"] = display["tags"] or []
+            doc_blobs.append(json.dumps(display, ensure_ascii=False).encode("utf-8"))
+
+        n_docs = len(doc_lengths)
+        lengths = np.asarray(doc_lengths, dtype=np.float32)
+        avgdl = float(lengths.mean()) if n_docs else 0.0
+
+        terms = sorted(postings)
+        term_bytes = [t.encode("utf-8") for t in terms]
+        post_docs, post_weights, post_offsets = [], [], [0]
+        for term in terms:
+            plist = postings[term]
+            ids = np.fromiter((d for d, _ in plist), dtype=np.int32, count=len(plist))
+            tf = np.fromiter((f for _, f in plist), dtype=np.float32, count=len(plist))
+            idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            norm = k1 * (1 - b + b * lengths[ids] / avgdl)
+            post_docs.append(ids)
+            post_weights.append((idf * tf * (k1 + 1) / (tf + norm)).astype(np.float32))
+            post_offsets.append(post_offsets[-1] + len(plist))
+
+        tags = sorted(tag_docs)
+        tag_offsets = [0]
+        for tag in tags:
+            tag_offsets.append(tag_offsets[-1] + len(tag_docs[tag]))
+
+        arrays = {
+            "terms": np.frombuffer(b"".join(term_bytes), dtype=np.uint8),
+            "term_offsets": np.cumsum([0] + [len(t) for t in term_bytes], dtype=np.int64),
+            "post_offsets": np.asarray(post_offsets, dtype=np.int64),
+            "post_docs": np.concatenate(post_docs) if post_docs else np.zeros(0, np.int32),
+            "post_weights": np.concatenate(post_weights) if post_weights else np.zeros(0, np.float32),
+            "tag_offsets": np.asarray(tag_offsets, dtype=np.int64),
+            "tag_docs": np.asarray([d for tag in tags for d in tag_docs[tag]], dtype=np.int32),
+            "docs": np.frombuffer(b"".join(doc_blobs), dtype=np.uint8),
+            "doc_offsets": np.cumsum([0] + [len(blob) for blob in doc_blobs], dtype=np.int64),
+        }
+        meta = {"version": 1, "n_docs": n_docs, "avgdl": avgdl, "k1": k1, "b": b, "tags": tags}
+        return cls(arrays, meta)
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        for name in _ARRAYS:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, f"_{name}"))
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str) -> "LibraryIndex":
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r")
+            for name in _ARRAYS
+        }
+        return cls(arrays, meta)
+
+    # ---- term dictionary ----
+
+    def _term(self, i: int) -> str:
+        start, end = self._term_offsets[i], self._term_offsets[i + 1]
+        return self._terms[start:end].tobytes().decode("utf-8")
+
+    def _lower_bound(self, term: str) -> int:
+        lo, hi = 0, self.n_terms
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _term_id(self, term: str) -> Optional[int]:
+        i = self._lower_bound(term)
+        if i < self.n_terms and self._term(i) == term:
+            return i
+        return None
+
+    def _prefix_ids(self, prefix: str, limit: int) -> List[int]:
+        ids = []
+        i = self._lower_bound(prefix)
+        while i < self.n_terms and len(ids) < limit and self._term(i).startswith(prefix):
+            ids.append(i)
+            i += 1
+        return ids
+
+    def _doc_freq(self, term_id: int) -> int:
+        return int(self._post_offsets[term_id + 1] - self._post_offsets[term_id])
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Complete the last word of ``prefix`` with indexed terms, most common first"""
+        tokens = tokenize(prefix)
+        if not tokens:
+            return []
+        ids = self._prefix_ids(tokens[-1], limit=500)
+        ids.sort(key=self._doc_freq, reverse=True)
+        return [self._term(i) for i in ids[:limit]]
+
+    # ---- search ----
+
+    def document(self, doc_id: int) -> Dict[str, Any]:
+        start, end = self._doc_offsets[doc_id], self._doc_offsets[doc_id + 1]
+        return json.loads(self._docs[start:end].tobytes().decode("utf-8"))
+
+    def _scores(self, tokens: List[str], prefix: bool = False) -> np.ndarray:
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        term_ids = [self._term_id(t) for t in tokens[:-1]]
+        if prefix:
+            term_ids.extend(self._prefix_ids(tokens[-1], limit=50))
+        else:
+            term_ids.append(self._term_id(tokens[-1]))
+        for term_id in term_ids:
+            if term_id is None:
+                continue
+            start, end = self._post_offsets[term_id], self._post_offsets[term_id + 1]
+            # Document ids are unique within a posting list, so a fancy-index add is safe
+            scores[self._post_docs[start:end]] += self._post_weights[start:end]
+        return scores
+
+    def rank(self, query: str, limit: int = 10) -> List[Tuple[int, float]]:
+        """Top (doc_id, score) pairs for ``query`` without decoding documents"""
+        tokens = tokenize(query)
+        if not tokens or not self.n_docs:
+            return []
+        scores = self._scores(tokens)
+        matched = np.flatnonzero(scores)
+        if len(matched) > limit:
+            matched = matched[np.argpartition(-scores[matched], limit - 1)[:limit]]
+        matched = matched[np.argsort(-scores[matched], kind="stable")]
+        return [(int(i), float(scores[i])) for i in matched]
+
+    def search(
+        self,
+        query: str,
+        tags: Optional[List[str]] = None,
+        page: int = 1,
+        page_size: int = 10,
+        prefix: bool = False,
+    ) -> Dict[str, Any]:
+        """BM25 search with optional tag filter, tag facets and pagination.
+
+        With ``prefix`` the last query word also matches longer terms, for
+        search-as-you-type. An empty query lists documents in corpus order.
+        """
+        tokens = tokenize(query)
+        mask = None
+
+        if tokens:
+            scores = self._scores(tokens, prefix)
+            mask = scores > 0
+        else:
+            scores = None
+
+        for tag in tags or []:
+            tag_mask = np.zeros(self.n_docs, dtype=bool)
+            tag_id = self._tag_ids.get(tag)
+            if tag_id is not None:
+                tag_mask[self._tag_docs[self._tag_offsets[tag_id]:self._tag_offsets[tag_id + 1]]] = True
+            mask = tag_mask if mask is None else mask & tag_mask
+
+        if mask is None:
+            mask = np.ones(self.n_docs, dtype=bool)
+
+        matched = np.flatnonzero(mask)
+        total = len(matched)
+
+        facets = {}
+        for tag_id, tag in enumerate(self.tag_names):
+            count = int(np.count_nonzero(mask[self._tag_docs[self._tag_offsets[tag_id]:self._tag_offsets[tag_id + 1]]]))
+            if count:
+                facets[tag] = count
+
+        page = max(page, 1)
+        offset = (page - 1) * page_size
+        if scores is not None and total:
+            wanted = min(offset + page_size, total)
+            matched_scores = scores[matched]
+            if wanted < total:
+                top = np.argpartition(-matched_scores, wanted - 1)[:wanted]
+            else:
+                top = np.arange(total)
+            top = top[np.argsort(-matched_scores[top], kind="stable")]
+            page_ids = matched[top[offset:wanted]]
+        else:
+            page_ids = matched[offset:offset + page_size]
+
+        results = []
+        for doc_id in page_ids:
+            doc = self.document(int(doc_id))
+            if scores is not None:
+                doc["score"] = round(float(scores[doc_id]), 4)
+            results.append(doc)
+
+        return {
+            "results": results,
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "facets": {"tags": facets},
+        }
+
+
+def read_jsonl(path: str):
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "build":
+        print("usage: python library_index.py build <corpus.jsonl> <index_dir>", file=sys.stderr)
+        sys.exit(2)
+    index = LibraryIndex.build(read_jsonl(sys.argv[2]))
+    index.save(sys.argv[3])
+    print(f"Indexed {index.n_docs} documents, {index.n_terms} terms -> {sys.argv[3]}")
@@ -0,0 +1,311 @@
+"""Long-lived LLM clients behind a bounded, deadline-aware queue.
+
+``LLMPool`` owns one provider for the life of the process and limits how
+many requests are in flight upstream at once; callers beyond that wait in a
+bounded queue and give up when their deadline passes. Every request sends
+the same system prompt first, byte for byte, so providers that cache prompt
+prefixes can reuse it.
+
+Providers:
+
+* ``emergent``: the emergentintegrations ``LlmChat`` client (default). It is
+  not pooled: ``LlmChat`` keeps conversation history on the instance, so
+  each request builds a new one, and whatever HTTP client it uses internally
+  is its own business. The pool still bounds concurrency and queueing;
+* ``openai``: any OpenAI-compatible ``/chat/completions`` endpoint over one
+  pooled keep-alive ``httpx.AsyncClient``, with token streaming;
+* ``mock``: canned replies after an optional delay, for tests and benchmarks.
+"""
+import asyncio
+import json
+import time
+import uuid
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Union
+
+import httpx
+
+
+class LLMOverloaded(Exception):
+    """Raised when the queue for a provider is already full"""
+
+
+class EmergentProvider:
+    """One fresh ``LlmChat`` per request; see the module docstring"""
+    name = "emergent"
+
+    def __init__(self, api_key: str, provider: str = "openai", model: str = "gpt-4o-mini"):
+        from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+        self._chat_cls = LlmChat
+        self._message_cls = UserMessage
+        self.api_key = api_key
+        self.provider = provider
+        self.model = model
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def complete(self, system: str, prompt: str) -> str:
+        # LlmChat keeps the conversation history on the instance, so a chat is
+        # only used for one exchange. Use the openai provider for pooled
+        # keep-alive connections.
+        chat = self._chat_cls(
+            api_key=self.api_key,
+            session_id=str(uuid.uuid4()),
+            system_message=system,
+        ).with_model(self.provider, self.model)
+        reply = await chat.send_message(self._message_cls(text=prompt))
+        return reply if isinstance(reply, str) else str(reply)
+
+    async def stream(self, system: str, prompt: str) -> AsyncIterator[str]:
+        # LlmChat only returns complete replies
+        yield await self.complete(system, prompt)
+
+
+class OpenAICompatibleProvider:
+    name = "openai"
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        model: str = "gpt-4o-mini",
+        timeout: float = 30.0,
+        max_connections: int = 20,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _payload(self, system: str, prompt: str, stream: bool) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            # Static system prompt first so the prefix is identical across requests
+            "messages": [
+                {"role": "system", "content": system},
+                {"role": "user", "content": prompt},
+            ],
+            "stream": stream,
+        }
+
+    async def complete(self, system: str, prompt: str) -> str:
+        await self.start()
+        response = await self._client.post("/chat/completions", json=self._payload(system, prompt, False))
+        response.raise_for_status()
+        return response.json()["choices"][0]["message"]["content"] or ""
+
+    async def stream(self, system: str, prompt: str) -> AsyncIterator[str]:
+        await self.start()
+        async with self._client.stream(
+            "POST", "/chat/completions", json=self._payload(system, prompt, True)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[5:].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or [{}]
+                content = choices[0].get("delta", {}).get("content")
+                if content:
+                    yield content
+
+
+class MockProvider:
+    name = "mock"
+
+    DEFAULT_REPLY = json.dumps({
+        "title": "Your rights in this situation",
+        "summary": "This is a canned answer from the mock LLM provider.",
+        "steps": ["Write down what happened", "Keep copies of all documents", "Contact the relevant authority"],
+        "template": None,
+    })
+
+    def __init__(
+        self,
+        reply: Optional[str] = None,
+        delay: Union[float, Callable[[], float]] = 0.0,
+        chunk_size: int = 16,
+        model: str = "mock",
+    ):
+        # ``delay`` may be a callable to inject a latency distribution
+        self.model = model
+        self.reply = reply or self.DEFAULT_REPLY
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.calls = 0
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def complete(self, system: str, prompt: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        return self.reply
+
+    async def stream(self, system: str, prompt: str) -> AsyncIterator[str]:
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        for i in range(0, len(self.reply), self.chunk_size):
+            yield self.reply[i:i + self.chunk_size]
+            await asyncio.sleep(0)
+
+    def _delay(self) -> float:
+        return self.delay() if callable(self.delay) else self.delay
+
+
+def make_provider(name: str, api_key: str, model: str, base_url: str = "", timeout: float = 30.0):
+    if name == "emergent":
+        return EmergentProvider(api_key, model=model)
+    if name == "openai":
+        return OpenAICompatibleProvider(base_url or "https://api.openai.com/v1", api_key, model, timeout)
+    if name == "mock":
+        return MockProvider()
+    raise ValueError(f"Unknown LLM provider: {name}")
+
+
+class LLMPool:
+    def __init__(
+        self,
+        provider,
+        system_prompt: str,
+        max_concurrency: int = 16,
+        max_queue: int = 200,
+        name: Optional[str] = None,
+    ):
+        self.provider = provider
+        self.name = name or f"{provider.name}:{getattr(provider, 'model', 'default')}"
+        self.system_prompt = system_prompt
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._active = 0
+
+        self._completed = 0
+        self._failed = 0
+        self._timeouts = 0
+        self._rejected = 0
+        self._queued = 0
+        self._queue_ms_total = 0.0
+        self._queue_ms_max = 0.0
+
+    async def start(self):
+        await self.provider.start()
+
+    async def close(self):
+        await self.provider.close()
+
+    async def complete(self, prompt: str, timeout: float) -> str:
+        """One reply within ``timeout`` seconds, queueing included.
+
+        Raises asyncio.TimeoutError when the deadline passes and
+        LLMOverloaded when the queue is full.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        await self._acquire(deadline)
+        try:
+            reply = await asyncio.wait_for(
+                self.provider.complete(self.system_prompt, prompt),
+                timeout=max(deadline - loop.time(), 0),
+            )
+        except (asyncio.TimeoutError, TimeoutError):
+            self._timeouts += 1
+            raise
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._release()
+        self._completed += 1
+        return reply
+
+    async def stream(self, prompt: str, queue_timeout: float) -> AsyncIterator[str]:
+        """Yield reply chunks; the slot is held until the generator finishes or is closed"""
+        loop = asyncio.get_running_loop()
+        await self._acquire(loop.time() + queue_timeout)
+        try:
+            async for chunk in self.provider.stream(self.system_prompt, prompt):
+                yield chunk
+            self._completed += 1
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timeouts": self._timeouts,
+            "rejected": self._rejected,
+            "queued": self._queued,
+            "queue_ms_avg": round(self._queue_ms_total / self._queued, 2) if self._queued else 0.0,
+            "queue_ms_max": round(self._queue_ms_max, 2),
+        }
+
+    # ---- internals ----
+
+    async def _acquire(self, deadline: float):
+        if not self._slots.locked():
+            # A free slot is taken without waiting
+            await self._slots.acquire()
+            self._active += 1
+            return
+        if self._waiting >= self.max_queue:
+            self._rejected += 1
+            raise LLMOverloaded(f"{self._waiting} requests already waiting for the LLM")
+
+        started = time.perf_counter()
+        self._waiting += 1
+        try:
+            remaining = deadline - asyncio.get_running_loop().time()
+            await asyncio.wait_for(self._slots.acquire(), timeout=max(remaining, 0))
+        except (asyncio.TimeoutError, TimeoutError):
+            self._timeouts += 1
+            raise
+        finally:
+            self._waiting -= 1
+
+        waited = (time.perf_counter() - started) * 1000
+        self._queued += 1
+        self._queue_ms_total += waited
+        self._queue_ms_max = max(self._queue_ms_max, waited)
+        self._active += 1
+
+    def _release(self):
+        self._active -= 1
+        self._slots.release()
@@ -0,0 +1,217 @@
+"""Latency-aware routing, hedging and fallback across LLM pools.
+
+Each route is an ``LLMPool`` (one provider/model with its own concurrency
+limit). ``LLMRouter`` keeps a rolling window of successful latencies per
+route and, depending on the policy:
+
+* ``off``: always use the first route;
+* ``fallback``: use the fastest route (by rolling p50) and, if it fails,
+  retry on the next one within the same deadline;
+* ``hedge``: as ``fallback``, but if the first request has not answered
+  after that route's p95 a duplicate is sent to the next route; whichever
+  answers first wins and the other is cancelled.
+
+The hedge delay is clamped to [hedge_min_ms, hedge_max_ms] and uses
+hedge_max_ms until a route has ``min_samples`` latencies. Only completed
+requests are recorded, so cancelled hedge losers do not count.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from llm_client import LLMOverloaded, LLMPool
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ("off", "fallback", "hedge")
+
+
+class LatencyTracker:
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+
+    def record(self, ms: float):
+        self._samples.append(ms)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class _Route:
+    def __init__(self, pool: LLMPool, window: int):
+        self.pool = pool
+        self.latency = LatencyTracker(window)
+        self.requests = 0
+        self.wins = 0
+        self.failures = 0
+        self.cancelled = 0
+
+
+class LLMRouter:
+    def __init__(
+        self,
+        pools: List[LLMPool],
+        policy: str = "hedge",
+        hedge_min_ms: float = 500,
+        hedge_max_ms: float = 8000,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown LLM routing policy: {policy}")
+        if not pools:
+            raise ValueError("LLMRouter needs at least one pool")
+        self.routes = [_Route(pool, window) for pool in pools]
+        self.policy = policy if len(pools) > 1 else "off"
+        self.hedge_min_ms = hedge_min_ms
+        self.hedge_max_ms = hedge_max_ms
+        self.min_samples = min_samples
+        self._hedges = 0
+        self._fallbacks = 0
+
+    async def start(self):
+        for route in self.routes:
+            await route.pool.start()
+
+    async def close(self):
+        for route in self.routes:
+            await route.pool.close()
+
+    def ordered_routes(self) -> List[_Route]:
+        """Routes to try, fastest rolling p50 first once there is enough data"""
+        if self.policy == "off":
+            return self.routes
+
+        def p50(route: _Route) -> float:
+            if len(route.latency) < self.min_samples:
+                return float("inf")
+            return route.latency.percentile(50)
+
+        # Stable sort keeps the configured order among routes without data
+        return sorted(self.routes, key=p50)
+
+    def hedge_delay(self, route: _Route) -> float:
+        if len(route.latency) < self.min_samples:
+            return self.hedge_max_ms / 1000
+        p95 = route.latency.percentile(95)
+        return min(max(p95, self.hedge_min_ms), self.hedge_max_ms) / 1000
+
+    async def complete(self, prompt: str, timeout: float) -> str:
+        """Reply from whichever route answers first within ``timeout`` seconds.
+
+        Raises asyncio.TimeoutError when the deadline passes; if every route
+        failed, the last route's error is raised.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        pending = list(self.ordered_routes())
+        running: Dict[asyncio.Task, _Route] = {}
+        last_error: Optional[BaseException] = None
+
+        def launch():
+            route = pending.pop(0)
+            route.requests += 1
+            remaining = max(deadline - loop.time(), 0)
+            task = asyncio.create_task(self._timed(route, prompt, remaining))
+            running[task] = route
+
+        launch()
+        try:
+            while running:
+                wait_for = max(deadline - loop.time(), 0)
+                if self.policy == "hedge" and pending and len(running) == 1:
+                    wait_for = min(wait_for, self.hedge_delay(next(iter(running.values()))))
+
+                done, _ = await asyncio.wait(list(running), timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if loop.time() >= deadline:
+                        raise asyncio.TimeoutError()
+                    # The first request is slower than its route's p95: hedge
+                    self._hedges += 1
+                    launch()
+                    continue
+
+                for task in done:
+                    route = running.pop(task)
+                    if task.exception() is None:
+                        route.wins += 1
+                        return task.result()
+                    route.failures += 1
+                    last_error = task.exception()
+                    if not isinstance(last_error, (asyncio.TimeoutError, TimeoutError, LLMOverloaded)):
+                        logger.warning(f"LLM route {route.pool.name} failed: {type(last_error).__name__}")
+
+                if not running and pending and self.policy != "off" and loop.time() < deadline:
+                    self._fallbacks += 1
+                    launch()
+
+            raise last_error
+        finally:
+            for task, route in running.items():
+                task.cancel()
+                route.cancelled += 1
+
+    async def stream(self, prompt: str, queue_timeout: float) -> AsyncIterator[str]:
+        """Stream from the fastest route, falling back to the next one if a
+        route fails before its first chunk"""
+        routes = self.ordered_routes() if self.policy != "off" else self.routes[:1]
+        for i, route in enumerate(routes):
+            route.requests += 1
+            started = time.perf_counter()
+            yielded = False
+            chunks = route.pool.stream(prompt, queue_timeout)
+            try:
+                async for chunk in chunks:
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                route.failures += 1
+                if yielded or i == len(routes) - 1:
+                    raise
+                logger.warning(f"LLM route {route.pool.name} failed before streaming: {type(e).__name__}")
+                self._fallbacks += 1
+                continue
+            finally:
+                await chunks.aclose()
+            route.wins += 1
+            route.latency.record((time.perf_counter() - started) * 1000)
+            return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "hedges": self._hedges,
+            "fallbacks": self._fallbacks,
+            "routes": [
+                {
+                    "name": route.pool.name,
+                    "samples": len(route.latency),
+                    "p50_ms": round(route.latency.percentile(50) or 0, 1),
+                    "p95_ms": round(route.latency.percentile(95) or 0, 1),
+                    "hedge_delay_ms": round(self.hedge_delay(route) * 1000, 1),
+                    "requests": route.requests,
+                    "wins": route.wins,
+                    "failures": route.failures,
+                    "cancelled": route.cancelled,
+                    "pool": route.pool.stats(),
+                }
+                for route in self.routes
+            ],
+        }
+
+    # ---- internals ----
+
+    async def _timed(self, route: _Route, prompt: str, timeout: float) -> str:
+        started = time.perf_counter()
+        reply = await route.pool.complete(prompt, timeout)
+        route.latency.record((time.perf_counter() - started) * 1000)
+        return reply
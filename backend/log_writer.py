@@ -0,0 +1,182 @@
+"""Write-behind batching for append-only collections such as ask_logs.
+
+Request handlers hand documents to ``BatchedLogWriter.put`` and return
+immediately; a background task drains the queue and writes with
+``insert_many(ordered=False)`` whenever ``batch_size`` documents are waiting
+or ``flush_interval_ms`` has passed since the first one arrived.
+
+The queue is bounded. With ``overflow="drop"`` a full queue drops the new
+document; with ``overflow="block"`` the caller waits up to ``block_timeout``
+seconds for space before dropping. ``stop`` flushes what is queued.
+
+Each flush is timed into the ``adhikaar_log_flush_duration_seconds``
+histogram, labelled with the collection and whether it was written in full
+(``ok``), in part (``partial``) or not at all (``error``).
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class BatchedLogWriter:
+    def __init__(
+        self,
+        collection,
+        batch_size: int = 100,
+        flush_interval_ms: int = 250,
+        max_queue: int = 10000,
+        overflow: str = "drop",
+        block_timeout: float = 0.05,
+        name: Optional[str] = None,
+    ):
+        if overflow not in ("drop", "block"):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.collection = collection
+        self.name = name or getattr(collection, "name", "logs")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self._enqueued = 0
+        self._dropped = 0
+        self._written = 0
+        self._failed = 0
+        self._flushes = 0
+        self._flush_ms_total = 0.0
+        self._flush_ms_max = 0.0
+        self._flush_ms_last = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            self._batch_full = asyncio.Event()
+            self._closed = False
+            self._task = asyncio.create_task(self._run())
+
+    async def put(self, doc: Dict[str, Any]) -> bool:
+        """Queue a document for writing; returns False if it was dropped"""
+        if self._closed:
+            self._drop()
+            return False
+        self.start()
+
+        if self.overflow == "block":
+            try:
+                await asyncio.wait_for(self._queue.put(doc), timeout=self.block_timeout)
+            except (asyncio.TimeoutError, TimeoutError):
+                self._drop()
+                return False
+        else:
+            try:
+                self._queue.put_nowait(doc)
+            except asyncio.QueueFull:
+                self._drop()
+                return False
+
+        self._enqueued += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_full.set()
+        return True
+
+    async def stop(self, timeout: float = 10.0):
+        """Flush everything queued, then stop the background task"""
+        if self._task is None:
+            return
+        self._closed = True
+        self._batch_full.set()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except (asyncio.TimeoutError, TimeoutError):
+            logger.warning(f"Log writer stopped with {self._queue.qsize()} documents unflushed")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "max_queue": self.max_queue,
+            "overflow": self.overflow,
+            "enqueued": self._enqueued,
+            "dropped": self._dropped,
+            "written": self._written,
+            "failed": self._failed,
+            "flushes": self._flushes,
+            "flush_ms_last": round(self._flush_ms_last, 2),
+            "flush_ms_avg": round(self._flush_ms_total / self._flushes, 2) if self._flushes else 0.0,
+            "flush_ms_max": round(self._flush_ms_max, 2),
+        }
+
+    # ---- internals ----
+
+    def _drop(self):
+        self._dropped += 1
+        # One warning per thousand drops is enough to notice without flooding
+        if self._dropped % 1000 == 1:
+            logger.warning(f"Log writer queue full; {self._dropped} documents dropped so far")
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+
+            self._batch_full.clear()
+            if self._queue.qsize() + 1 < self.batch_size and not self._closed:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), timeout=self.flush_interval)
+                except (asyncio.TimeoutError, TimeoutError):
+                    pass
+
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        started = time.perf_counter()
+        outcome = "ok"
+        try:
+            result = await self.collection.insert_many(batch, ordered=False)
+            self._written += len(result.inserted_ids)
+        except BulkWriteError as e:
+            outcome = "partial"
+            inserted = e.details.get("nInserted", 0)
+            self._written += inserted
+            self._failed += len(batch) - inserted
+            logger.error(f"Log writer flush partially failed: {len(batch) - inserted} of {len(batch)} documents")
+        except Exception as e:
+            outcome = "error"
+            self._failed += len(batch)
+            logger.error(f"Log writer flush failed for {len(batch)} documents: {e}")
+        finally:
+            elapsed = (time.perf_counter() - started) * 1000
+            self._flushes += 1
+            self._flush_ms_total += elapsed
+            self._flush_ms_last = elapsed
+            self._flush_ms_max = max(self._flush_ms_max, elapsed)
+            if metrics.enabled:
+                metrics.log_flush_duration.labels(self.name, outcome).observe(elapsed / 1000)
@@ -0,0 +1,280 @@
+"""Request timing, per-stage spans and Prometheus metrics.
+
+``TimingMiddleware`` gives every HTTP request a timings dict. Code on the
+request path wraps its stages in ``span("llm")`` and similar; each span adds
+its duration to that dict and to the ``adhikaar_stage_duration_seconds``
+histogram. When the response starts, the middleware sends the dict as a
+``Server-Timing`` header, with ``total`` up to that point. When the request
+finishes, the middleware records ``adhikaar_http_request_duration_seconds``
+by method, route template and status. ``MongoCommandMetrics`` is a pymongo
+command listener that records Mongo command latency by command name, and
+log_writer records each batch flush in ``adhikaar_log_flush_duration_seconds``.
+``Registry.render`` produces the Prometheus text format served on /metrics.
+
+A span costs a couple of microseconds. With ``enabled = False``, ``span()``
+returns a shared no-op, the middleware passes requests straight through and
+no listener is installed.
+
+Spans started in a task created during the request (``asyncio.create_task``
+copies the context) record into the same request. Mongo commands run on
+motor's executor threads, so they only reach the histogram, not the
+request's ``Server-Timing``.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+enabled = True
+
+# Seconds; stages range from a cache lookup to an LLM call
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_counts", "_sum", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        # Mongo listeners observe from motor's executor threads
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str) -> _HistogramChild:
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, _HistogramChild(self.buckets))
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, child in sorted(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, values, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, values)} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Read from ``fn`` at scrape time, for state the app already tracks.
+
+    ``fn`` returns a number, or a dict of label-value tuples to numbers.
+    Totals that only go up (cache hits, ...) use ``kind="counter"``.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        fn: Callable[[], Any],
+        labelnames: Sequence[str] = (),
+        kind: str = "gauge",
+    ):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        value = self.fn()
+        samples = value.items() if isinstance(value, dict) else [((), value)]
+        for values, sample in samples:
+            lines.append(f"{self.name}{_labels(self.labelnames, values)} {float(sample)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Any] = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    "adhikaar_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+))
+stage_duration = registry.register(Histogram(
+    "adhikaar_stage_duration_seconds",
+    "Latency of request stages (session, search, prompt, llm, parse, log, ...)",
+    ("stage",),
+))
+mongo_duration = registry.register(Histogram(
+    "adhikaar_mongo_command_duration_seconds",
+    "MongoDB command latency",
+    ("command", "outcome"),
+    MONGO_BUCKETS,
+))
+log_flush_duration = registry.register(Histogram(
+    "adhikaar_log_flush_duration_seconds",
+    "Write-behind batch flush latency by collection and outcome (ok, partial, error)",
+    ("collection", "outcome"),
+    MONGO_BUCKETS,
+))
+
+
+# ====== Spans ======
+
+class _Span:
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        stage_duration.labels(self.name).observe(seconds)
+        timings = _timings.get()
+        if timings is not None:
+            # A stage that runs more than once in a request accumulates
+            timings[self.name] = timings.get(self.name, 0.0) + seconds * 1000
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str):
+    """Time a block as stage ``name`` of the current request"""
+    return _Span(name) if enabled else _NOOP
+
+
+def record(name: str, ms: float):
+    """Record a stage measured elsewhere, e.g. time spent waiting on another request"""
+    if not enabled:
+        return
+    stage_duration.labels(name).observe(ms / 1000)
+    timings = _timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + ms
+
+
+def current_timings() -> Dict[str, float]:
+    return dict(_timings.get() or {})
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{stage};dur={dur:.1f}" for stage, dur in timings.items())
+
+
+# ====== Middleware ======
+
+class TimingMiddleware:
+    """ASGI middleware (rather than BaseHTTPMiddleware, so streaming
+    responses are not buffered) that sets up request timings"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not enabled or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings["total"] = (time.perf_counter() - started) * 1000
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing_header(timings).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            route = scope.get("route")
+            # Unmatched paths share one label so scanners cannot grow the series count
+            path = getattr(route, "path", None) or "unmatched"
+            request_duration.labels(scope["method"], path, str(status)).observe(time.perf_counter() - started)
+
+
+# ====== Mongo ======
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        mongo_duration.labels(event.command_name, "ok").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        mongo_duration.labels(event.command_name, "error").observe(event.duration_micros / 1e6)
@@ -0,0 +1,190 @@
+"""Rewrite ISO-string timestamps as native BSON dates.
+
+Older documents store ``created_at``/``expires_at``/... as ISO strings. This
+command converts them in place while the API keeps running:
+
+* documents are visited in ``_id`` order in batches of ``--batch-size``;
+  only documents that still have a string in one of the fields are read;
+* each update is conditional on the string it replaces, so a document
+  changed by the API in the meantime is left alone rather than overwritten;
+* progress (the last ``_id`` handled and the counts) is checkpointed in the
+  ``migrations`` collection after every batch, so an interrupted run picks
+  up where it stopped, and a rerun after the rollout only visits documents
+  written since (``--restart`` starts from the beginning);
+* ``--sleep-ms`` pauses between batches and ``--max-rate`` caps documents
+  per second, to keep the load on the primary down.
+
+Once ``sessions.expires_at`` and ``answer_cache.expires_at`` are dates the
+TTL indexes from indexes.py remove expired documents on their own.
+
+    MONGO_URL=... DB_NAME=... python migrate_dates.py [--dry-run] [--collections sessions,ask_logs]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+DATE_FIELDS: Dict[str, List[str]] = {
+    "sessions": ["created_at", "expires_at"],
+    "users": ["created_at"],
+    "wallet_docs": ["created_at"],
+    "themes": ["created_at", "updated_at", "deleted_at"],
+    "ask_logs": ["created_at"],
+    "answer_cache": ["expires_at"],
+}
+
+CHECKPOINTS = "migrations"
+
+
+def parse_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+
+class DateMigration:
+    def __init__(
+        self,
+        db,
+        batch_size: int = 500,
+        sleep_ms: int = 0,
+        max_rate: float = 0,
+        dry_run: bool = False,
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.sleep = sleep_ms / 1000
+        self.max_rate = max_rate
+        self.dry_run = dry_run
+
+    async def run(self, collections: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {name: await self.migrate(name, DATE_FIELDS[name]) for name in collections}
+
+    async def migrate(self, name: str, fields: List[str]) -> Dict[str, Any]:
+        collection = self.db[name]
+        checkpoint_id = f"dates:{name}"
+        checkpoint = await self.db[CHECKPOINTS].find_one({"_id": checkpoint_id}) or {}
+
+        string_filter = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        remaining = await collection.count_documents(string_filter)
+        progress = {k: checkpoint.get(k, 0) for k in ("scanned", "updated", "invalid")}
+        last_id = checkpoint.get("last_id")
+        logger.info(f"{name}: {remaining} documents to convert" + (f", resuming after {last_id}" if last_id else ""))
+
+        started = time.monotonic()
+        handled = 0
+        while True:
+            query = string_filter
+            if last_id is not None:
+                query = {"$and": [string_filter, {"_id": {"$gt": last_id}}]}
+            cursor = collection.find(query, {field: 1 for field in fields}).sort("_id", 1).limit(self.batch_size)
+            batch = await cursor.to_list(self.batch_size)
+            if not batch:
+                break
+
+            operations = []
+            for doc in batch:
+                original = {}
+                converted = {}
+                for field in fields:
+                    value = doc.get(field)
+                    if not isinstance(value, str):
+                        continue
+                    parsed = parse_date(value)
+                    if parsed is None:
+                        progress["invalid"] += 1
+                        continue
+                    original[field] = value
+                    converted[field] = parsed
+                if converted:
+                    operations.append(UpdateOne({"_id": doc["_id"], **original}, {"$set": converted}))
+
+            if operations and not self.dry_run:
+                result = await collection.bulk_write(operations, ordered=False)
+                progress["updated"] += result.modified_count
+            elif self.dry_run:
+                progress["updated"] += len(operations)
+            progress["scanned"] += len(batch)
+            last_id = batch[-1]["_id"]
+            handled += len(batch)
+
+            if not self.dry_run:
+                await self.db[CHECKPOINTS].update_one(
+                    {"_id": checkpoint_id},
+                    {"$set": {"last_id": last_id, **progress, "updated_at": datetime.now(timezone.utc)}},
+                    upsert=True,
+                )
+
+            elapsed = time.monotonic() - started
+            rate = handled / elapsed if elapsed else 0.0
+            logger.info(
+                f"{name}: {handled}/{remaining} scanned, {progress['updated']} updated, "
+                f"{progress['invalid']} unparseable, {rate:.0f} docs/s"
+            )
+            await self._throttle(handled, started)
+
+        if not self.dry_run:
+            await self.db[CHECKPOINTS].update_one(
+                {"_id": checkpoint_id},
+                {"$set": {"done": True, **progress, "updated_at": datetime.now(timezone.utc)}},
+                upsert=True,
+            )
+        logger.info(f"{name}: done ({progress['updated']} updated, {progress['invalid']} unparseable)")
+        return progress
+
+    async def _throttle(self, handled: int, started: float):
+        delay = self.sleep
+        if self.max_rate:
+            # Sleep long enough that the average stays at or below max_rate
+            ahead = handled / self.max_rate - (time.monotonic() - started)
+            delay = max(delay, ahead)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Convert ISO-string timestamps to BSON dates")
+    parser.add_argument("--collections", default=",".join(DATE_FIELDS), help="comma-separated collection names")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--sleep-ms", type=int, default=0, help="pause between batches")
+    parser.add_argument("--max-rate", type=float, default=0, help="documents per second, 0 for no limit")
+    parser.add_argument("--dry-run", action="store_true", help="count what would change without writing")
+    parser.add_argument("--restart", action="store_true", help="ignore saved progress and start over")
+    args = parser.parse_args(argv)
+
+    collections = [name.strip() for name in args.collections.split(",") if name.strip()]
+    unknown = [name for name in collections if name not in DATE_FIELDS]
+    if unknown:
+        print(f"Unknown collections: {', '.join(unknown)}", file=sys.stderr)
+        return 2
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"), tz_aware=True)
+    db = client.get_database(os.environ.get("DB_NAME", "adhikaar"))
+    try:
+        if args.restart:
+            await db[CHECKPOINTS].delete_many({"_id": {"$in": [f"dates:{name}" for name in collections]}})
+        migration = DateMigration(db, args.batch_size, args.sleep_ms, args.max_rate, args.dry_run)
+        for name, progress in (await migration.run(collections)).items():
+            print(f"{name:14} scanned={progress['scanned']} updated={progress['updated']} unparseable={progress['invalid']}")
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,273 @@
+"""Sliding-window rate limiting shared across workers.
+
+Counters live in a shared store (Mongo or a Redis-compatible server) so a
+limit of 10/minute means 10/minute per key across every uvicorn worker, not
+10 per worker. Each window is a pair of fixed buckets; the estimate is the
+current bucket plus the previous bucket weighted by how much of it still
+overlaps the sliding window.
+
+Most requests never reach the store:
+
+* a key that was refused is refused locally until its retry time;
+* with ``lease > 1`` a worker reserves several hits per store round trip and
+  spends them locally for the rest of the bucket;
+* the previous bucket's count is fetched once per bucket and kept locally.
+
+If the store fails, the limiter falls back to in-process counters (the limit
+is then enforced per worker) until a circuit breaker lets it retry.
+"""
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from cachetools import TTLCache
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from web_search import CircuitBreaker
+
+logger = logging.getLogger(__name__)
+
+_PERIODS = {"second": 1, "minute": 60, "hour": 60 * 60, "day": 24 * 60 * 60}
+
+
+def parse_rate(rate: str) -> Tuple[int, int]:
+    """Parse "10/minute" (or "100/5 minutes") into (limit, window_seconds)"""
+    try:
+        count, period = rate.strip().split("/", 1)
+        parts = period.split()
+        multiplier = int(parts[0]) if len(parts) == 2 else 1
+        window = _PERIODS[parts[-1].rstrip("s")] * multiplier
+        return int(count), window
+    except (ValueError, KeyError, IndexError):
+        raise ValueError(f"Invalid rate: {rate!r}")
+
+
+@dataclass
+class RateLimitDecision:
+    allowed: bool
+    limit: int
+    retry_after: int = 0
+
+
+class LocalWindowStore:
+    """In-process bucket counters; used on its own or as the fallback"""
+
+    name = "local"
+
+    def __init__(self, max_keys: int = 100000):
+        self._buckets: Dict[str, TTLCache] = {}
+        self.max_keys = max_keys
+
+    def _counters(self, window: int) -> TTLCache:
+        counters = self._buckets.get(window)
+        if counters is None:
+            counters = self._buckets[window] = TTLCache(maxsize=self.max_keys, ttl=2 * window)
+        return counters
+
+    async def incr(self, key: str, bucket: int, amount: int, window: int, with_previous: bool = True) -> Tuple[int, int]:
+        counters = self._counters(window)
+        current = counters.get((key, bucket), 0) + amount
+        counters[(key, bucket)] = current
+        return current, counters.get((key, bucket - 1), 0)
+
+    async def decr(self, key: str, bucket: int, amount: int, window: int):
+        counters = self._counters(window)
+        if (key, bucket) in counters:
+            counters[(key, bucket)] -= amount
+
+
+class MongoWindowStore:
+    """Bucket counters as documents updated with $inc; expired by a TTL index"""
+
+    name = "mongo"
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def incr(self, key: str, bucket: int, amount: int, window: int, with_previous: bool = True) -> Tuple[int, int]:
+        current = self._incr(f"{key}|{bucket}", amount, (bucket + 2) * window)
+        if not with_previous:
+            return (await current)["count"], 0
+        current_doc, previous_doc = await asyncio.gather(
+            current,
+            self.collection.find_one({"_id": f"{key}|{bucket - 1}"}, {"count": 1}),
+        )
+        return current_doc["count"], (previous_doc or {}).get("count", 0)
+
+    async def decr(self, key: str, bucket: int, amount: int, window: int):
+        await self.collection.update_one({"_id": f"{key}|{bucket}"}, {"$inc": {"count": -amount}})
+
+    async def _incr(self, doc_id: str, amount: int, expires_ts: int) -> Dict[str, Any]:
+        update = {
+            "$inc": {"count": amount},
+            "$setOnInsert": {"expires_at": datetime.fromtimestamp(expires_ts, timezone.utc)},
+        }
+        try:
+            return await self.collection.find_one_and_update(
+                {"_id": doc_id}, update, upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Two workers upserted the same new bucket; the document exists now
+            return await self.collection.find_one_and_update(
+                {"_id": doc_id}, update, return_document=ReturnDocument.AFTER
+            )
+
+
+class RedisWindowStore:
+    """Bucket counters in a Redis-compatible server (needs the redis package)"""
+
+    name = "redis"
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            raise RuntimeError("The redis rate limit backend needs the redis package")
+        self._redis = redis.from_url(url)
+
+    async def incr(self, key: str, bucket: int, amount: int, window: int, with_previous: bool = True) -> Tuple[int, int]:
+        current_key = f"ratelimit:{key}:{bucket}"
+        pipe = self._redis.pipeline(transaction=False)
+        pipe.incrby(current_key, amount)
+        pipe.expire(current_key, 2 * window)
+        if with_previous:
+            pipe.get(f"ratelimit:{key}:{bucket - 1}")
+        results = await pipe.execute()
+        return int(results[0]), int(results[2] or 0) if with_previous else 0
+
+    async def decr(self, key: str, bucket: int, amount: int, window: int):
+        await self._redis.decrby(f"ratelimit:{key}:{bucket}", amount)
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+class _KeyState:
+    __slots__ = ("bucket", "tokens", "previous", "blocked_until")
+
+    def __init__(self, bucket: int):
+        self.bucket = bucket
+        self.tokens = 0
+        self.previous: Optional[int] = None
+        self.blocked_until = 0.0
+
+
+class SlidingWindowLimiter:
+    def __init__(
+        self,
+        rate: str,
+        store=None,
+        lease: int = 1,
+        max_keys: int = 100000,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.limit, self.window = parse_rate(rate)
+        self.rate = rate
+        self.store = store or LocalWindowStore(max_keys)
+        self.fallback = self.store if isinstance(self.store, LocalWindowStore) else LocalWindowStore(max_keys)
+        self.lease = max(1, min(lease, self.limit))
+        self.breaker = breaker or CircuitBreaker(failure_threshold=3, reset_timeout=10.0, name="Rate limit store")
+        self._keys: TTLCache = TTLCache(maxsize=max_keys, ttl=2 * self.window)
+
+        self._allowed = 0
+        self._refused = 0
+        self._local = 0
+        self._store_calls = 0
+        self._fallbacks = 0
+
+    async def hit(self, key: str) -> RateLimitDecision:
+        """Count one hit for ``key`` and decide whether it is allowed"""
+        now = time.time()
+        bucket = int(now // self.window)
+
+        state = self._keys.get(key)
+        if state is None or state.bucket != bucket:
+            state = self._keys[key] = _KeyState(bucket)
+
+        # Local pre-checks: a known refusal, or a hit already leased from the store
+        if state.blocked_until > now:
+            self._local += 1
+            return self._refuse(math.ceil(state.blocked_until - now))
+        if state.tokens > 0:
+            state.tokens -= 1
+            self._local += 1
+            self._allowed += 1
+            return RateLimitDecision(True, self.limit)
+
+        store = self.store if self.breaker.allow() else self.fallback
+        try:
+            current, previous = await store.incr(key, bucket, self.lease, self.window, state.previous is None)
+            if store is not self.fallback:
+                self.breaker.record_success()
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            self._fallbacks += 1
+            if self._fallbacks % 100 == 1:
+                logger.warning(f"Rate limit store ({store.name}) failed, using local counters: {type(e).__name__}")
+            store = self.fallback
+            current, previous = await store.incr(key, bucket, self.lease, self.window)
+        self._store_calls += 1
+
+        if state.previous is None:
+            state.previous = previous
+        weight = 1 - (now % self.window) / self.window
+        used_before = state.previous * weight + current - self.lease
+        granted = max(0, min(self.lease, math.floor(self.limit - used_before)))
+
+        if granted < self.lease:
+            # Hand back what was reserved but not granted so other workers can use it
+            try:
+                await store.decr(key, bucket, self.lease - granted, self.window)
+            except Exception as e:
+                logger.warning(f"Rate limit store ({store.name}) decrement failed: {type(e).__name__}")
+
+        if granted == 0:
+            retry_after = self._retry_after(now, state.previous, current - self.lease)
+            state.blocked_until = now + retry_after
+            return self._refuse(math.ceil(retry_after))
+
+        state.tokens = granted - 1
+        self._allowed += 1
+        return RateLimitDecision(True, self.limit)
+
+    async def close(self):
+        close = getattr(self.store, "close", None)
+        if close is not None:
+            await close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "store": self.store.name,
+            "breaker": self.breaker.state,
+            "lease": self.lease,
+            "keys": len(self._keys),
+            "allowed": self._allowed,
+            "refused": self._refused,
+            "decided_locally": self._local,
+            "store_calls": self._store_calls,
+            "fallbacks": self._fallbacks,
+        }
+
+    # ---- internals ----
+
+    def _refuse(self, retry_after: int) -> RateLimitDecision:
+        self._refused += 1
+        return RateLimitDecision(False, self.limit, max(1, retry_after))
+
+    def _retry_after(self, now: float, previous: int, current: int) -> float:
+        """Seconds until the weighted count drops below the limit"""
+        bucket_end = (now // self.window + 1) * self.window
+        if current >= self.limit or previous <= 0:
+            return bucket_end - now
+        # previous * (1 - elapsed / window) + current < limit
+        elapsed_needed = (1 - (self.limit - current) / previous) * self.window
+        return max(elapsed_needed - now % self.window, 1.0)
@@ -1,8 +1,10 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Cookie
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, HTTPException, Request, Response, Cookie, Query
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from cachetools import TLRUCache
 import os
 import logging
 from pathlib import Path
@@ -11,20 +13,45 @@ from typing import List, Optional, Dict, Any
 import uuid
 from datetime import datetime, timezone, timedelta
 import hashlib
+import base64
 import asyncio
 import json
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from googleapiclient.discovery import build
+import time
+from answer_cache import AnswerCache, cache_key, normalize_query
+from incremental_json import IncrementalAnswerParser
+from answer_parser import parse_answer
+from answer_packs import AnswerPacks
+from translation import Translator, TranslationCache, TRANSLATION_SYSTEM_PROMPT, answer_language
+from job_queue import JobQueue, JobQueueFull, RetryableJobError, check_callback_url
+from wallet_bulk import WalletBulkWriter, BulkRequestError
+from wallet_blobs import WalletBlobs
+from theme_cache import ThemeCache, ANY_OWNER, etag_matches
+from web_search import GoogleSearchClient, CircuitBreaker, DEFAULT_CSE_ENDPOINT
+from indexes import ensure_indexes, verify_query_plans
+from log_writer import BatchedLogWriter
+from library_index import LibraryIndex
+from statute_retrieval import StatuteIndex
+from single_flight import SingleFlight
+from llm_client import LLMPool, LLMOverloaded, make_provider
+from llm_router import LLMRouter
+from rate_limit import SlidingWindowLimiter, LocalWindowStore, MongoWindowStore, RedisWindowStore
+import metrics
+from metrics import span, Gauge, MongoCommandMetrics, TimingMiddleware
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Spans, Server-Timing and /metrics; cheap enough to leave on in production
+metrics.enabled = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+# tz_aware: dates come back as UTC-aware datetimes and serialize with their offset
+client = AsyncIOMotorClient(
+    mongo_url,
+    tz_aware=True,
+    event_listeners=[MongoCommandMetrics()] if metrics.enabled else [],
+)
 db = client.get_database(os.environ.get('DB_NAME', 'adhikaar'))
 
 # Get API keys
@@ -32,13 +59,66 @@ EMERGENT_LLM_KEY = os.environ.get('EMERGENT_LLM_KEY', 'sk-emergent-61cC33511Fd39
 GOOGLE_API_KEY = os.environ.get('GOOGLE_API_KEY', '')
 GOOGLE_CSE_ID = os.environ.get('GOOGLE_CSE_ID', '')
 
-# Create the main app
-app = FastAPI()
+# Google Custom Search client (pooled connections, result cache, circuit breaker)
+search_client = GoogleSearchClient(
+    api_key=GOOGLE_API_KEY,
+    cse_id=GOOGLE_CSE_ID,
+    endpoint=os.environ.get('GOOGLE_CSE_ENDPOINT', DEFAULT_CSE_ENDPOINT),
+    timeout=float(os.environ.get('GOOGLE_CSE_TIMEOUT_SECONDS', 2.5)),
+    cache_ttl=int(os.environ.get('SEARCH_CACHE_TTL_SECONDS', 60 * 60)),
+    negative_ttl=int(os.environ.get('SEARCH_NEGATIVE_CACHE_TTL_SECONDS', 60)),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.environ.get('SEARCH_BREAKER_FAILURES', 5)),
+        reset_timeout=float(os.environ.get('SEARCH_BREAKER_RESET_SECONDS', 30)),
+    ),
+)
+
+# Answer cache for /ask (exact + similarity tiers, optional Mongo mirror)
+answer_cache = AnswerCache(
+    ttl_seconds=int(os.environ.get('ANSWER_CACHE_TTL_SECONDS', 6 * 60 * 60)),
+    max_entries=int(os.environ.get('ANSWER_CACHE_MAX_ENTRIES', 2000)),
+    similarity_threshold=float(os.environ.get('ANSWER_CACHE_SIMILARITY_THRESHOLD', 0.85)),
+    collection=db.answer_cache if os.environ.get('ANSWER_CACHE_MONGO', 'false').lower() == 'true' else None,
+)
+
+# Concurrent identical /ask questions share one search + LLM computation
+ask_flights = SingleFlight()
+
+# Reviewed answers for the canonical use-case questions, built by answer_packs.py
+answer_packs = AnswerPacks(
+    db.answer_packs,
+    similarity_threshold=float(os.environ.get('ANSWER_PACKS_SIMILARITY_THRESHOLD', 0.85)),
+)
+ANSWER_PACKS_RELOAD_SECONDS = float(os.environ.get('ANSWER_PACKS_RELOAD_SECONDS', 300))
+
+# ask_logs are written behind the request in batches
+ask_log_writer = BatchedLogWriter(
+    db.ask_logs,
+    batch_size=int(os.environ.get('ASK_LOG_BATCH_SIZE', 100)),
+    flush_interval_ms=int(os.environ.get('ASK_LOG_FLUSH_MS', 250)),
+    max_queue=int(os.environ.get('ASK_LOG_MAX_QUEUE', 10000)),
+    overflow=os.environ.get('ASK_LOG_OVERFLOW', 'drop'),
+)
+
+# Rate limits are counted in a shared store so they hold across uvicorn workers
+def make_rate_limit_store():
+    backend = os.environ.get('RATE_LIMIT_BACKEND', 'mongo')
+    if backend == 'mongo':
+        return MongoWindowStore(db.rate_limits)
+    if backend == 'redis':
+        return RedisWindowStore(os.environ.get('RATE_LIMIT_REDIS_URL', 'redis://localhost:6379/0'))
+    return LocalWindowStore()
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+ask_limiter = SlidingWindowLimiter(
+    os.environ.get('ASK_RATE_LIMIT', '10/minute'),
+    store=make_rate_limit_store(),
+    lease=int(os.environ.get('RATE_LIMIT_LEASE', 1)),
+)
+
+# Create the main app
+# orjson serializes datetimes natively; routes that return ORJSONResponse
+# themselves also skip FastAPI's jsonable_encoder pass
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create routers
 api_router = APIRouter(prefix="/api")
@@ -72,6 +152,10 @@ class AskRequest(BaseModel):
     lang: str = "en"
     context: Dict[str, Any] = {}
 
+class AskJobRequest(AskRequest):
+    # Finished jobs are POSTed here (https only)
+    callback_url: Optional[str] = None
+
 class AskResponse(BaseModel):
     title: str
     summary: str
@@ -79,6 +163,7 @@ class AskResponse(BaseModel):
     sources: List[Dict[str, str]]
     template: Optional[str] = None
     updated: str = "Updated: Today"
+    lang: str = "en"
 
 class WalletSaveRequest(BaseModel):
     title: str
@@ -105,78 +190,168 @@ class SessionCreateRequest(BaseModel):
 def hash_token(token: str) -> str:
     return hashlib.sha256(token.encode()).hexdigest()
 
+def as_utc_datetime(value) -> datetime:
+    """Accept a datetime, or an ISO string not yet rewritten by migrate_dates.py"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+# token_hash -> (User, session expiry as a UNIX timestamp). Entries live for
+# SESSION_CACHE_TTL_SECONDS but never past the session's own expiry. Logout and
+# session creation invalidate locally; other workers catch up within the TTL.
+SESSION_CACHE_TTL_SECONDS = int(os.environ.get('SESSION_CACHE_TTL_SECONDS', 60))
+session_cache = TLRUCache(
+    maxsize=int(os.environ.get('SESSION_CACHE_MAX_ENTRIES', 10000)),
+    ttu=lambda _key, value, now: min(now + SESSION_CACHE_TTL_SECONDS, value[1]),
+    timer=time.time,
+)
+
+async def load_session_user(token_hash: str):
+    """Resolve a session and its user in one round-trip.
+
+    Returns (User, expires_at) or None if the session or user does not exist.
+    """
+    pipeline = [
+        {"$match": {"token_hash": token_hash}},
+        {"$limit": 1},
+        {"$lookup": {"from": "users", "localField": "user_id", "foreignField": "id", "as": "user"}},
+        {"$project": {"_id": 0, "expires_at": 1, "user": {"$arrayElemAt": ["$user", 0]}}},
+    ]
+    docs = await db.sessions.aggregate(pipeline).to_list(1)
+    if not docs or not docs[0].get('user'):
+        return None
+    
+    return User(**docs[0]['user']), as_utc_datetime(docs[0]['expires_at'])
+
 async def get_user_from_cookie(request: Request) -> Optional[User]:
     session_token = request.cookies.get("session_token")
     if not session_token:
         return None
     
     token_hash = hash_token(session_token)
-    session_doc = await db.sessions.find_one({"token_hash": token_hash})
+    cached = session_cache.get(token_hash)
+    if cached is not None:
+        return cached[0]
     
-    if not session_doc:
+    with span("session"):
+        resolved = await load_session_user(token_hash)
+    if not resolved:
         return None
     
-    if datetime.fromisoformat(session_doc['expires_at']) < datetime.now(timezone.utc):
+    user, expires_at = resolved
+    if expires_at < datetime.now(timezone.utc):
         return None
     
-    user_doc = await db.users.find_one({"id": session_doc['user_id']}, {"_id": 0})
-    if user_doc:
-        # Convert datetime strings
-        if isinstance(user_doc.get('created_at'), str):
-            user_doc['created_at'] = datetime.fromisoformat(user_doc['created_at'])
-        return User(**user_doc)
-    return None
+    session_cache[token_hash] = (user, expires_at.timestamp())
+    return user
+
+def rate_limit_key(request: Request, user: Optional[User]) -> str:
+    """Signed-in users are limited per account, everyone else per client address"""
+    if user:
+        return f"user:{user.id}"
+    return f"ip:{request.client.host if request.client else '127.0.0.1'}"
+
+async def enforce_rate_limit(limiter: SlidingWindowLimiter, request: Request, user: Optional[User]):
+    with span("rate_limit"):
+        decision = await limiter.hit(rate_limit_key(request, user))
+    if not decision.allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded: {limiter.rate}",
+            headers={"Retry-After": str(decision.retry_after)},
+        )
+
+# Google CSE search is only worth waiting for this long once the LLM answer is ready
+SEARCH_DEADLINE_SECONDS = float(os.environ.get('SEARCH_DEADLINE_SECONDS', 3.0))
+
+GENERAL_LEGAL_SOURCES = [
+    {"title": "India Code - Central Acts", "url": "https://www.indiacode.nic.in/", "type": "General Resource"},
+    {"title": "Ministry of Law & Justice", "url": "https://lawmin.gov.in/", "type": "General Resource"},
+    {"title": "Supreme Court of India", "url": "https://main.sci.gov.in/", "type": "General Resource"},
+]
+
+USE_CASE_SOURCES = {
+    "traffic": {"title": "Motor Vehicles Act, 1988", "url": "https://www.indiacode.nic.in/", "type": "General Resource"},
+    "consumer": {"title": "Consumer Protection Act, 2019", "url": "https://consumeraffairs.nic.in/", "type": "General Resource"},
+    "police": {"title": "Code of Criminal Procedure, 1973", "url": "https://www.indiacode.nic.in/", "type": "General Resource"},
+}
+
+def default_legal_sources(use_case: Optional[str] = None) -> List[Dict[str, str]]:
+    """General legal resources, plus the primary act for known use cases"""
+    sources = [dict(s) for s in GENERAL_LEGAL_SOURCES]
+    if use_case in USE_CASE_SOURCES:
+        sources.append(dict(USE_CASE_SOURCES[use_case]))
+    return sources
 
 async def search_web_for_legal_info(query: str, use_case: Optional[str] = None) -> List[Dict[str, str]]:
     """Search for legal information using Google Custom Search or return general resources"""
     
-    # General legal resources (fallback)
-    general_sources = [
-        {"title": "India Code - Central Acts", "url": "https://www.indiacode.nic.in/", "type": "General Resource"},
-        {"title": "Ministry of Law & Justice", "url": "https://lawmin.gov.in/", "type": "General Resource"},
-        {"title": "Supreme Court of India", "url": "https://main.sci.gov.in/", "type": "General Resource"},
-    ]
-    
     # If Google API key is configured, perform real search
-    if GOOGLE_API_KEY and GOOGLE_CSE_ID:
-        try:
-            service = build("customsearch", "v1", developerKey=GOOGLE_API_KEY)
-            
-            # Add India legal context to search
-            search_query = f"{query} India law legal"
-            
-            result = service.cse().list(
-                q=search_query,
-                cx=GOOGLE_CSE_ID,
-                num=5
-            ).execute()
-            
-            if 'items' in result:
-                sources = []
-                for item in result['items'][:5]:
-                    sources.append({
-                        "title": item.get('title', 'Untitled'),
-                        "url": item.get('link', ''),
-                        "type": "Search Result",
-                        "snippet": item.get('snippet', '')[:200]
-                    })
-                
-                # Add general sources at the end
-                sources.extend(general_sources[:2])
-                return sources
-        except Exception as e:
-            logger.error(f"Google search error: {e}")
-            # Fall through to return general sources
+    if search_client.enabled:
+        sources = await search_client.search(query)
+        if sources:
+            # Add general sources at the end
+            sources.extend(default_legal_sources()[:2])
+            return sources
     
     # Return general resources with appropriate context
-    if use_case == "traffic":
-        general_sources.append({"title": "Motor Vehicles Act, 1988", "url": "https://www.indiacode.nic.in/", "type": "General Resource"})
-    elif use_case == "consumer":
-        general_sources.append({"title": "Consumer Protection Act, 2019", "url": "https://consumeraffairs.nic.in/", "type": "General Resource"})
-    elif use_case == "police":
-        general_sources.append({"title": "Code of Criminal Procedure, 1973", "url": "https://www.indiacode.nic.in/", "type": "General Resource"})
-    
-    return general_sources
+    return default_legal_sources(use_case)
+
+# Local statute index used to ground answers (replaces web search when present)
+RAG_TOP_K = int(os.environ.get('RAG_TOP_K', 4))
+# Passages need a BM25 score above this (i.e. a query term), or a cosine
+# similarity of at least RAG_MIN_COSINE when that is set
+RAG_MIN_BM25 = float(os.environ.get('RAG_MIN_BM25', 0.0))
+RAG_MIN_COSINE = float(os.environ['RAG_MIN_COSINE']) if os.environ.get('RAG_MIN_COSINE') else None
+
+def load_statute_index() -> Optional[StatuteIndex]:
+    index_dir = os.environ.get('STATUTE_INDEX_DIR')
+    if not index_dir:
+        return None
+    if not os.path.exists(os.path.join(index_dir, "meta.json")):
+        logger.warning(f"No statute index at {index_dir}; falling back to web search")
+        return None
+    index = StatuteIndex.load(index_dir)
+    logger.info(f"Loaded statute index from {index_dir}: {index.n_chunks} passages")
+    return index
+
+statute_index = load_statute_index()
+
+async def retrieve_statute_passages(query: str) -> List[Dict[str, Any]]:
+    """Relevant passages for ``query``; [] means answer without them"""
+    if statute_index is None:
+        return []
+    # Scoring takes a few milliseconds of NumPy; keep it off the event loop
+    return await asyncio.to_thread(
+        statute_index.search, query, k=RAG_TOP_K, min_bm25=RAG_MIN_BM25, min_cosine=RAG_MIN_COSINE
+    )
+
+def passages_to_sources(passages: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    sources, seen = [], set()
+    for passage in passages:
+        if passage['title'] in seen:
+            continue
+        seen.add(passage['title'])
+        sources.append({
+            "title": passage['title'],
+            "url": passage['url'],
+            "type": "Statute",
+            "snippet": passage['text'][:200]
+        })
+    return sources
+
+async def log_ask_query(ask_request: AskRequest, user: Optional[User]):
+    log_doc = {
+        "id": str(uuid.uuid4()),
+        "user_id": user.id if user else None,
+        "query": ask_request.query,
+        "lang": ask_request.lang,
+        "use_case": ask_request.context.get('useCase'),
+        "created_at": datetime.now(timezone.utc)
+    }
+    await ask_log_writer.put(log_doc)
 
 # ====== Auth Routes ======
 
@@ -192,20 +367,16 @@ async def create_session(request: SessionCreateRequest, response: Response):
         else:
             # Create new user
             user = User(email=request.email, name=request.name, picture=request.picture)
-            doc = user.model_dump()
-            doc['created_at'] = doc['created_at'].isoformat()
-            await db.users.insert_one(doc)
+            await db.users.insert_one(user.model_dump())
         
         # Create session
         token_hash = hash_token(request.session_token)
         expires_at = datetime.now(timezone.utc) + timedelta(days=7)
         
         session = Session(user_id=user.id, token_hash=token_hash, expires_at=expires_at)
-        session_doc = session.model_dump()
-        session_doc['created_at'] = session_doc['created_at'].isoformat()
-        session_doc['expires_at'] = session_doc['expires_at'].isoformat()
-        
-        await db.sessions.insert_one(session_doc)
+        # expires_at is a BSON date so the TTL index can expire it
+        await db.sessions.insert_one(session.model_dump())
+        session_cache.pop(token_hash, None)
         
         # Set cookie
         response.set_cookie(
@@ -237,32 +408,15 @@ async def logout(request: Request, response: Response):
     session_token = request.cookies.get("session_token")
     if session_token:
         token_hash = hash_token(session_token)
+        session_cache.pop(token_hash, None)
         await db.sessions.delete_one({"token_hash": token_hash})
     
     response.delete_cookie("session_token", path="/")
     return {"message": "Logged out"}
 
-# ====== AI Q&A Routes ======
+# ====== AI Q&A Helpers ======
 
-@v1_router.post("/ask", response_model=AskResponse)
-@limiter.limit("10/minute")
-async def ask_question(request: Request, ask_request: AskRequest):
-    """AI-powered legal Q&A with citations (Rate limited: 10 requests/minute)"""
-    try:
-        user = await get_user_from_cookie(request)
-        
-        # Validate input
-        if not ask_request.query or len(ask_request.query.strip()) == 0:
-            raise HTTPException(status_code=400, detail="Query cannot be empty")
-        
-        if len(ask_request.query) > 1000:
-            raise HTTPException(status_code=400, detail="Query too long (max 1000 characters)")
-        
-        # Search for relevant sources
-        sources = await search_web_for_legal_info(ask_request.query, ask_request.context.get('useCase'))
-        
-        # Prepare system prompt with JSON output instruction
-        system_prompt = """You are Adhikaar.ai, an AI legal assistant for India. Your role is to:
+ASK_SYSTEM_PROMPT = """You are Adhikaar.ai, an AI legal assistant for India. Your role is to:
 1. Provide accurate, cited legal guidance based on Indian laws
 2. Use simple, accessible language
 3. Structure answers clearly with title, summary, and actionable steps
@@ -277,23 +431,99 @@ IMPORTANT: You must respond with a valid JSON object with this exact structure:
   "steps": ["Step 1", "Step 2", "Step 3"],
   "template": "Optional template with [placeholders] or null"
 }"""
-        
-        # Create LLM chat instance
-        chat = LlmChat(
-            api_key=EMERGENT_LLM_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message=system_prompt
-        ).with_model("openai", "gpt-4o-mini")
-        
-        # Create user message with context
-        sources_text = "\n".join([f"- {s['title']}" for s in sources[:3]])
-        prompt = f"""Question: {ask_request.query}
+
+DEFAULT_STEPS = [
+    "Review the relevant laws and regulations",
+    "Gather all necessary documentation",
+    "Consult with appropriate authorities if needed",
+    "Follow prescribed legal procedures"
+]
+
+LLM_TIMEOUT_DETAIL = "The AI is taking longer than expected. Please try again with a simpler question."
+LLM_OVERLOADED_DETAIL = "The AI is handling too many questions right now. Please try again in a moment."
+
+# Deadline for an answer, including time spent queued for an LLM slot
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', 20.0))
+# Queued jobs have no client waiting on the connection, so they can take longer
+ASK_JOB_LLM_TIMEOUT_SECONDS = float(os.environ.get('ASK_JOB_LLM_TIMEOUT_SECONDS', 120.0))
+
+# One long-lived LLM client per provider, each with bounded upstream concurrency
+def make_llm_pool(
+    prefix: str,
+    default_provider: str,
+    default_model: str,
+    system_prompt: str = ASK_SYSTEM_PROMPT,
+) -> LLMPool:
+    return LLMPool(
+        make_provider(
+            os.environ.get(f'{prefix}_PROVIDER', default_provider),
+            api_key=os.environ.get(f'{prefix}_API_KEY', os.environ.get('LLM_API_KEY', EMERGENT_LLM_KEY)),
+            model=os.environ.get(f'{prefix}_MODEL', default_model),
+            base_url=os.environ.get(f'{prefix}_BASE_URL', os.environ.get('LLM_BASE_URL', '')),
+            # Per-call deadlines are enforced by the router; this only has to outlast the longest
+            timeout=max(LLM_TIMEOUT_SECONDS, ASK_JOB_LLM_TIMEOUT_SECONDS),
+        ),
+        system_prompt=system_prompt,
+        max_concurrency=int(os.environ.get(f'{prefix}_MAX_CONCURRENCY', os.environ.get('LLM_MAX_CONCURRENCY', 16))),
+        max_queue=int(os.environ.get('LLM_MAX_QUEUE', 200)),
+    )
+
+llm_pools = [make_llm_pool('LLM', 'emergent', 'gpt-4o-mini')]
+if os.environ.get('LLM_FALLBACK_PROVIDER'):
+    llm_pools.append(make_llm_pool('LLM_FALLBACK', 'emergent', 'gpt-4o-mini'))
+
+# Hedge slow calls to the second model after the first one's p95, or fall back on errors
+llm_router = LLMRouter(
+    llm_pools,
+    policy=os.environ.get('LLM_ROUTING_POLICY', 'hedge'),
+    hedge_min_ms=float(os.environ.get('LLM_HEDGE_MIN_MS', 500)),
+    hedge_max_ms=float(os.environ.get('LLM_HEDGE_MAX_MS', 8000)),
+)
+
+# Answers are generated in English and translated; translations get their own
+# pool so they cannot take slots from answer generation
+translation_pool = make_llm_pool(
+    'TRANSLATION_LLM',
+    os.environ.get('LLM_PROVIDER', 'emergent'),
+    os.environ.get('LLM_MODEL', 'gpt-4o-mini'),
+    system_prompt=TRANSLATION_SYSTEM_PROMPT,
+)
+TRANSLATION_TIMEOUT_SECONDS = float(os.environ.get('TRANSLATION_TIMEOUT_SECONDS', 10.0))
+translator = Translator(
+    lambda prompt: translation_pool.complete(prompt, timeout=TRANSLATION_TIMEOUT_SECONDS),
+    TranslationCache(
+        max_entries=int(os.environ.get('TRANSLATION_CACHE_MAX_ENTRIES', 20000)),
+        collection=db.translations if os.environ.get('TRANSLATION_CACHE_MONGO', 'true').lower() == 'true' else None,
+    ),
+)
+
+def validate_ask_request(ask_request: AskRequest):
+    if not ask_request.query or len(ask_request.query.strip()) == 0:
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    
+    if len(ask_request.query) > 1000:
+        raise HTTPException(status_code=400, detail="Query too long (max 1000 characters)")
+
+def build_ask_prompt(
+    ask_request: AskRequest,
+    sources: List[Dict[str, str]],
+    passages: Optional[List[Dict[str, Any]]] = None
+) -> str:
+    sources_text = "\n".join([f"- {s['title']}" for s in sources[:3]])
+    law_text = ""
+    if passages:
+        excerpts = "\n\n".join(f"[{i}] {p['title']}\n{p['text'][:700]}" for i, p in enumerate(passages, 1))
+        law_text = f"""
+Relevant law (base the answer on these excerpts and cite them):
+{excerpts}
+"""
+    return f"""Question: {ask_request.query}
 
 Use Case: {ask_request.context.get('useCase', 'general')}
 
 Reference sources available:
 {sources_text}
-
+{law_text}
 Provide a JSON response with:
 1. A clear title (max 80 chars)
 2. A summary (2-3 sentences explaining the legal guidance)
@@ -301,102 +531,181 @@ Provide a JSON response with:
 4. A template if applicable (with [placeholders] for user to fill in), otherwise null
 
 Respond ONLY with the JSON object, no additional text."""
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def build_ask_response(response_text: str, ask_request: AskRequest, sources: List[Dict[str, str]]):
+    """Parse raw LLM output into an AskResponse.
+
+    Returns (response, cacheable); cacheable is False unless the reply was
+    well-formed JSON with every field, so repaired or text answers are not
+    served again from the cache.
+    """
+    parsed = parse_answer(response_text)
+    if parsed.status != "json":
+        logger.warning(f"LLM reply was not well-formed JSON; parsed as {parsed.status}")
+    
+    title = parsed.title
+    if not title:
+        title = ask_request.query if len(ask_request.query) <= 80 else ask_request.query[:77] + "..."
+    
+    result = AskResponse(
+        title=title[:80],
+        summary=parsed.summary or "",
+        steps=parsed.steps or list(DEFAULT_STEPS),
+        sources=sources,
+        template=parsed.template
+    )
+    return result, parsed.complete
+
+async def generate_answer_text(prompt: str, llm_timeout: float = LLM_TIMEOUT_SECONDS) -> str:
+    """Single LLM call with the /ask timeout; raises the 504 used by /ask"""
+    try:
+        with span("llm"):
+            return await llm_router.complete(prompt, timeout=llm_timeout)
+    except (asyncio.TimeoutError, TimeoutError):
+        raise HTTPException(status_code=504, detail=LLM_TIMEOUT_DETAIL)
+    except LLMOverloaded:
+        raise HTTPException(status_code=503, detail=LLM_OVERLOADED_DETAIL)
+
+def timed_ask_prompt(
+    ask_request: AskRequest,
+    sources: List[Dict[str, str]],
+    passages: Optional[List[Dict[str, Any]]] = None
+) -> str:
+    with span("prompt"):
+        return build_ask_prompt(ask_request, sources, passages)
+
+async def run_ask_pipeline(ask_request: AskRequest, use_case: Optional[str], llm_timeout: float = LLM_TIMEOUT_SECONDS):
+    """Gather sources and generate the answer; returns (response_text, sources).
+
+    With a statute index the top passages are retrieved locally and put in
+    the prompt, and web search is skipped. Otherwise (or when no passage is
+    relevant enough) web search and the LLM
+    call run concurrently: the LLM starts straight away with the use-case
+    default sources in its prompt, and once the answer is back we wait for
+    the search only until SEARCH_DEADLINE_SECONDS after the start, then fall
+    back to the default sources.
+    """
+    if statute_index is not None:
+        with span("retrieval"):
+            passages = await retrieve_statute_passages(ask_request.query)
+        if passages:
+            sources = passages_to_sources(passages) + default_legal_sources()[:2]
+            response_text = await generate_answer_text(timed_ask_prompt(ask_request, sources, passages), llm_timeout)
+            return response_text, sources
+    
+    loop = asyncio.get_running_loop()
+    pipeline_started = loop.time()
+    fallback_sources = default_legal_sources(use_case)
+    
+    async def timed_search():
+        with span("search"):
+            return await search_web_for_legal_info(ask_request.query, use_case)
+    
+    search_task = asyncio.create_task(timed_search())
+    
+    try:
+        response_text = await generate_answer_text(timed_ask_prompt(ask_request, fallback_sources), llm_timeout)
+    except BaseException:
+        search_task.cancel()
+        raise
+    
+    remaining = SEARCH_DEADLINE_SECONDS - (loop.time() - pipeline_started)
+    try:
+        sources = await asyncio.wait_for(search_task, timeout=max(remaining, 0))
+    except (asyncio.TimeoutError, TimeoutError):
+        logger.info("Web search missed its deadline; using default sources")
+        sources = fallback_sources
+    
+    return response_text, sources
+
+def ask_flight_key(ask_request: AskRequest, use_case: Optional[str], llm_timeout: float = LLM_TIMEOUT_SECONDS) -> str:
+    """Requests that would share an answer cache entry also share an in-flight
+    answer, if they have the same LLM deadline: a /ask waiter must not sit out
+    a job's longer deadline, nor a job be cut off at the /ask one"""
+    return f"{cache_key(normalize_query(ask_request.query), ask_request.lang, use_case)}:{llm_timeout:g}"
+
+async def answer_ask_request(
+    ask_request: AskRequest,
+    use_case: Optional[str],
+    llm_timeout: float = LLM_TIMEOUT_SECONDS,
+) -> AskResponse:
+    """Search, generate, parse and cache one answer"""
+    # Search and generate concurrently
+    response_text, sources = await run_ask_pipeline(ask_request, use_case, llm_timeout)
+    
+    # Parse response
+    with span("parse"):
+        result, cacheable = build_ask_response(response_text, ask_request, sources)
+    
+    # Only cache cleanly parsed answers; fallback parses are not worth repeating
+    if cacheable:
+        await answer_cache.set(ask_request.query, ask_request.lang, use_case, result.model_dump())
+    
+    return result
+
+async def english_answer(
+    english_request: AskRequest,
+    use_case: Optional[str],
+    llm_timeout: float = LLM_TIMEOUT_SECONDS,
+) -> AskResponse:
+    """Pre-generated, cached or newly generated answer for a request with lang "en" """
+    # Canonical use-case questions have a pre-generated, reviewed answer;
+    # otherwise serve repeated / near-identical questions from the answer cache
+    with span("packs"):
+        cached = answer_packs.get(english_request.query, english_request.lang, use_case)
+    if cached is None:
+        with span("cache"):
+            cached = await answer_cache.get(english_request.query, english_request.lang, use_case)
+    if cached is not None:
+        return AskResponse(**cached)
+    
+    # Identical questions already being answered wait for that answer instead.
+    # The stages of a shared answer are recorded by the request that started it
+    stage_started = time.perf_counter()
+    result, shared = await ask_flights.do(
+        ask_flight_key(english_request, use_case, llm_timeout),
+        lambda: answer_ask_request(english_request, use_case, llm_timeout),
+    )
+    if shared:
+        metrics.record("coalesced", (time.perf_counter() - stage_started) * 1000)
+    return result
+
+async def translate_response(result: AskResponse, lang: str) -> AskResponse:
+    """``result`` translated into ``lang``, or left in English if that fails"""
+    try:
+        with span("translate"):
+            return AskResponse(**await translator.translate_answer(result.model_dump(), lang))
+    except Exception as e:
+        logger.warning(f"Translation to {lang} failed ({type(e).__name__}); answering in English")
+        return result
+
+# ====== AI Q&A Routes ======
+
+@v1_router.post("/ask", response_model=AskResponse)
+async def ask_question(request: Request, ask_request: AskRequest):
+    """AI-powered legal Q&A with citations (Rate limited: 10 requests/minute)"""
+    try:
+        user = await get_user_from_cookie(request)
+        await enforce_rate_limit(ask_limiter, request, user)
         
-        user_message = UserMessage(text=prompt)
-        
-        # Get AI response with timeout
-        try:
-            ai_response = await asyncio.wait_for(chat.send_message(user_message), timeout=20.0)
-        except (asyncio.TimeoutError, TimeoutError):
-            raise HTTPException(
-                status_code=504, 
-                detail="The AI is taking longer than expected. Please try again with a simpler question."
-            )
-        
-        # Parse response
-        response_text = ai_response if isinstance(ai_response, str) else str(ai_response)
+        # Validate input
+        validate_ask_request(ask_request)
         
-        # Try to parse as JSON
-        try:
-            # Extract JSON if wrapped in markdown code blocks
-            if '```json' in response_text:
-                json_start = response_text.find('```json') + 7
-                json_end = response_text.find('```', json_start)
-                response_text = response_text[json_start:json_end].strip()
-            elif '```' in response_text:
-                json_start = response_text.find('```') + 3
-                json_end = response_text.find('```', json_start)
-                response_text = response_text[json_start:json_end].strip()
-            
-            parsed_data = json.loads(response_text)
-            
-            # Validate required fields
-            title = parsed_data.get('title', ask_request.query[:80])
-            summary = parsed_data.get('summary', '')
-            steps = parsed_data.get('steps', [])
-            template = parsed_data.get('template')
-            
-            # Ensure we have steps
-            if not steps or len(steps) == 0:
-                steps = [
-                    "Review the relevant laws and regulations",
-                    "Gather all necessary documentation",
-                    "Consult with appropriate authorities if needed",
-                    "Follow prescribed legal procedures"
-                ]
-            
-        except (json.JSONDecodeError, KeyError) as e:
-            logger.warning(f"Failed to parse JSON response: {e}. Using fallback parsing.")
-            
-            # Fallback: Basic text parsing
-            lines = response_text.split('\n')
-            title = ask_request.query[:80] if len(ask_request.query) <= 80 else ask_request.query[:77] + "..."
-            
-            # Extract summary (first paragraph)
-            summary_lines = []
-            for line in lines:
-                cleaned = line.strip()
-                if cleaned and not cleaned.startswith(('#', '-', '1.', '2.', '3.', '4.', '5.')):
-                    summary_lines.append(cleaned)
-                    if len(' '.join(summary_lines)) > 150:
-                        break
-            summary = ' '.join(summary_lines[:3]) if summary_lines else response_text[:200]
-            
-            # Extract steps
-            steps = []
-            for line in lines:
-                cleaned = line.strip()
-                if cleaned.startswith(('1.', '2.', '3.', '4.', '5.', '-', '•')):
-                    steps.append(cleaned.lstrip('123456789.-•').strip())
-            
-            if not steps:
-                steps = [
-                    "Review the relevant laws and regulations",
-                    "Gather all necessary documentation",
-                    "Consult with appropriate authorities if needed",
-                    "Follow prescribed legal procedures"
-                ]
-            
-            template = None
+        use_case = ask_request.context.get('useCase')
+        lang = answer_language(ask_request.lang)
         
-        result = AskResponse(
-            title=title[:80],
-            summary=summary,
-            steps=steps[:5],
-            sources=sources,
-            template=template
-        )
+        # One English answer per question, whatever the language; other
+        # languages are translated from it
+        result = await english_answer(ask_request.model_copy(update={"lang": "en"}), use_case)
+        if lang != "en":
+            result = await translate_response(result, lang)
         
         # Log the query
-        log_doc = {
-            "id": str(uuid.uuid4()),
-            "user_id": user.id if user else None,
-            "query": ask_request.query,
-            "lang": ask_request.lang,
-            "use_case": ask_request.context.get('useCase'),
-            "created_at": datetime.now(timezone.utc).isoformat()
-        }
-        await db.ask_logs.insert_one(log_doc)
+        with span("log"):
+            await log_ask_query(ask_request, user)
         
         return result
         
@@ -409,8 +718,255 @@ Respond ONLY with the JSON object, no additional text."""
             detail="An error occurred while processing your question. Please try again."
         )
 
+@v1_router.post("/ask/stream")
+async def ask_question_stream(request: Request, ask_request: AskRequest):
+    """Streaming variant of /ask using Server-Sent Events.
+
+    Emits `sources` first, then `title`, `summary`, `step` and `template` as
+    each field of the model's JSON completes, and finally `answer` carrying
+    the full AskResponse. Answers in languages other than English are
+    translated once complete, so they arrive as `sources` and `answer` only.
+    Failures after the stream starts are sent as an `error` event with the
+    status code /ask would have returned.
+    """
+    user = await get_user_from_cookie(request)
+    await enforce_rate_limit(ask_limiter, request, user)
+    validate_ask_request(ask_request)
+    use_case = ask_request.context.get('useCase')
+    lang = answer_language(ask_request.lang)
+    english_request = ask_request.model_copy(update={"lang": "en"})
+    
+    async def event_stream():
+        try:
+            if lang != "en":
+                result = (await translate_response(await english_answer(english_request, use_case), lang)).model_dump()
+                yield sse_event("sources", result["sources"])
+                yield sse_event("answer", result)
+                await log_ask_query(ask_request, user)
+                return
+            
+            with span("packs"):
+                cached = answer_packs.get(english_request.query, english_request.lang, use_case)
+            if cached is None:
+                with span("cache"):
+                    cached = await answer_cache.get(english_request.query, english_request.lang, use_case)
+            if cached is not None:
+                yield sse_event("sources", cached["sources"])
+                yield sse_event("answer", cached)
+                await log_ask_query(ask_request, user)
+                return
+            
+            # /ask is already answering this question; stream its answer once ready
+            found, flight_result = await ask_flights.join(ask_flight_key(english_request, use_case))
+            if found:
+                result = flight_result.model_dump()
+                yield sse_event("sources", result["sources"])
+                yield sse_event("answer", result)
+                await log_ask_query(ask_request, user)
+                return
+            
+            with span("retrieval"):
+                passages = await retrieve_statute_passages(ask_request.query)
+            if passages:
+                sources = passages_to_sources(passages) + default_legal_sources()[:2]
+            else:
+                with span("search"):
+                    sources = await search_web_for_legal_info(ask_request.query, use_case)
+            yield sse_event("sources", sources)
+            
+            prompt = timed_ask_prompt(ask_request, sources, passages)
+            parser = IncrementalAnswerParser()
+            chunks = []
+            step_count = 0
+            
+            loop = asyncio.get_running_loop()
+            llm_started = loop.time()
+            deadline = llm_started + LLM_TIMEOUT_SECONDS
+            stream = llm_router.stream(prompt, queue_timeout=LLM_TIMEOUT_SECONDS)
+            try:
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(deadline - loop.time(), 0))
+                    except StopAsyncIteration:
+                        break
+                    chunks.append(chunk)
+                    for kind, key, value in parser.feed(chunk):
+                        if kind == "item" and key == "steps" and isinstance(value, str) and step_count < 5:
+                            yield sse_event("step", {"index": step_count, "text": value})
+                            step_count += 1
+                        elif kind == "field" and key == "title" and isinstance(value, str):
+                            yield sse_event("title", value[:80])
+                        elif kind == "field" and key in ("summary", "template"):
+                            yield sse_event(key, value)
+            except (asyncio.TimeoutError, TimeoutError):
+                yield sse_event("error", {"status": 504, "detail": LLM_TIMEOUT_DETAIL})
+                return
+            except LLMOverloaded:
+                yield sse_event("error", {"status": 503, "detail": LLM_OVERLOADED_DETAIL})
+                return
+            finally:
+                # Give the pool slot back even when the stream stopped early
+                await stream.aclose()
+                # Spans cannot wrap a block that yields to the client, so this is measured by hand
+                metrics.record("llm", (loop.time() - llm_started) * 1000)
+            
+            with span("parse"):
+                result, cacheable = build_ask_response("".join(chunks), ask_request, sources)
+            if cacheable:
+                await answer_cache.set(english_request.query, english_request.lang, use_case, result.model_dump())
+            with span("log"):
+                await log_ask_query(ask_request, user)
+            
+            yield sse_event("answer", result.model_dump())
+        except HTTPException as e:
+            yield sse_event("error", {"status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logger.error(f"Ask stream error: {e}", exc_info=True)
+            yield sse_event("error", {
+                "status": 500,
+                "detail": "An error occurred while processing your question. Please try again."
+            })
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ====== Ask Jobs ======
+
+async def run_ask_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Answer a queued question like /ask, with the longer job deadline"""
+    ask_request = AskRequest(**job["payload"])
+    use_case = ask_request.context.get('useCase')
+    lang = answer_language(ask_request.lang)
+    try:
+        result = await english_answer(
+            ask_request.model_copy(update={"lang": "en"}),
+            use_case,
+            llm_timeout=ASK_JOB_LLM_TIMEOUT_SECONDS,
+        )
+    except HTTPException as e:
+        # Timeouts and overload are worth another attempt after a backoff
+        if e.status_code in (503, 504):
+            raise RetryableJobError(e.detail, e.status_code)
+        raise
+    if lang != "en":
+        result = await translate_response(result, lang)
+    return result.model_dump()
+
+ask_jobs = JobQueue(
+    db.ask_jobs,
+    run_ask_job,
+    # 0 leaves the queue to separate `python job_queue.py` worker processes
+    workers=int(os.environ.get('ASK_JOB_WORKERS', 4)),
+    timeout=ASK_JOB_LLM_TIMEOUT_SECONDS + SEARCH_DEADLINE_SECONDS + 10,
+    max_attempts=int(os.environ.get('ASK_JOB_MAX_ATTEMPTS', 3)),
+    max_queued=int(os.environ.get('ASK_JOB_MAX_QUEUED', 10000)),
+    retention_seconds=int(float(os.environ.get('ASK_JOB_RETENTION_HOURS', 24)) * 3600),
+    webhook_secret=os.environ.get('ASK_JOB_WEBHOOK_SECRET', ''),
+    callback_hosts={h.strip() for h in os.environ.get('ASK_JOB_CALLBACK_HOSTS', '').split(',') if h.strip()},
+)
+
+@v1_router.post("/ask/jobs", status_code=202)
+async def create_ask_job(request: Request, job_request: AskJobRequest):
+    """Queue a question to be answered in the background.
+
+    Returns the job id; poll GET /ask/jobs/{id}, or pass an https
+    callback_url to have the finished job POSTed to it.
+    """
+    user = await get_user_from_cookie(request)
+    await enforce_rate_limit(ask_limiter, request, user)
+    validate_ask_request(job_request)
+    if job_request.callback_url:
+        try:
+            await check_callback_url(job_request.callback_url, ask_jobs.callback_hosts)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        job = await ask_jobs.enqueue(
+            job_request.model_dump(exclude={"callback_url"}),
+            user_id=user.id if user else None,
+            callback_url=job_request.callback_url,
+        )
+    except JobQueueFull:
+        raise HTTPException(status_code=503, detail=LLM_OVERLOADED_DETAIL, headers={"Retry-After": "30"})
+    await log_ask_query(job_request, user)
+    
+    poll_url = f"/api/v1/ask/jobs/{job['id']}"
+    return ORJSONResponse(
+        {"id": job["id"], "status": job["status"], "poll_url": poll_url},
+        status_code=202,
+        headers={"Location": poll_url},
+    )
+
+@v1_router.get("/ask/jobs/stats")
+async def ask_job_stats():
+    """Jobs by status, and this process's workers"""
+    return {**ask_jobs.stats(), "jobs": await ask_jobs.counts()}
+
+@v1_router.get("/ask/jobs/{job_id}")
+async def get_ask_job(job_id: str, request: Request):
+    """Job status, with the AskResponse once it has succeeded"""
+    job = await ask_jobs.get(job_id)
+    owner_id = job.pop("user_id", None) if job else None
+    if job and owner_id:
+        # A signed-in user's jobs are only visible to them
+        user = await get_user_from_cookie(request)
+        if not user or user.id != owner_id:
+            job = None
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    headers = {"Retry-After": "2"} if job["status"] in ("queued", "running") else None
+    return ORJSONResponse(job, headers=headers)
+
+@v1_router.get("/ask/cache/stats")
+async def ask_cache_stats():
+    """Answer cache hit/miss/similarity statistics"""
+    return answer_cache.stats()
+
+@v1_router.get("/ask/logs/stats")
+async def ask_log_writer_stats():
+    """ask_logs write-behind queue depth and flush latency"""
+    return ask_log_writer.stats()
+
+@v1_router.get("/ask/limits/stats")
+async def ask_rate_limit_stats():
+    """Rate limiter counters and how many decisions were made without the store"""
+    return ask_limiter.stats()
+
+@v1_router.get("/ask/llm/stats")
+async def ask_llm_stats():
+    """Per-route LLM latency percentiles, hedges, fallbacks and pool queues"""
+    return llm_router.stats()
+
+@v1_router.get("/ask/flights/stats")
+async def ask_flight_stats():
+    """In-flight /ask computations and how many requests joined one"""
+    return ask_flights.stats()
+
+@v1_router.get("/ask/translations/stats")
+async def ask_translation_stats():
+    """Translation cache hit rate and LLM calls made for translations"""
+    return {**translator.stats(), "pool": translation_pool.stats()}
+
+@v1_router.get("/ask/packs/stats")
+async def ask_pack_stats():
+    """Pre-generated answers loaded and how often /ask served one"""
+    return answer_packs.stats()
+
 # ====== Wallet Routes ======
 
+# Document bodies are stored once per distinct content in wallet_blobs
+wallet_blobs = WalletBlobs(
+    db.wallet_blobs,
+    compress_min_bytes=int(os.environ.get('WALLET_BLOB_COMPRESS_MIN_BYTES', 1024)),
+    codec=os.environ.get('WALLET_BLOB_CODEC', 'zlib'),
+    cache_entries=int(os.environ.get('WALLET_BLOB_CACHE_ENTRIES', 1000)),
+)
+
 @v1_router.post("/wallet/save")
 async def save_to_wallet(request: WalletSaveRequest, req: Request):
     """Save document to wallet"""
@@ -421,65 +977,210 @@ async def save_to_wallet(request: WalletSaveRequest, req: Request):
         title=request.title,
         content=request.content,
         tags=request.tags
-    )
+    ).model_dump()
+    
+    [(doc["content_hash"], doc["content_size"])] = await wallet_blobs.acquire([doc.pop("content")])
+    try:
+        await db.wallet_docs.insert_one(doc)
+    except Exception:
+        await wallet_blobs.release([doc["content_hash"]])
+        raise
+    return {"id": doc["id"], "message": "Saved to wallet"}
+
+def make_wallet_doc(item: Dict[str, Any], user_id: Optional[str]) -> Dict[str, Any]:
+    save = WalletSaveRequest(**item)
+    return WalletDocument(user_id=user_id, title=save.title, content=save.content, tags=save.tags).model_dump()
+
+wallet_bulk = WalletBulkWriter(
+    db.wallet_docs,
+    make_wallet_doc,
+    wallet_blobs,
+    max_items=int(os.environ.get('WALLET_BULK_MAX_ITEMS', 1000)),
+    max_bytes=int(os.environ.get('WALLET_BULK_MAX_BYTES', 10 * 1024 * 1024)),
+    batch_size=int(os.environ.get('WALLET_BULK_BATCH_SIZE', 200)),
+)
+
+@v1_router.post("/wallet/bulk")
+async def bulk_wallet_ops(req: Request):
+    """Insert, delete and re-tag many wallet documents in one request.
+
+    Send `application/x-ndjson` (one operation per line, parsed as it
+    arrives) or JSON `{"operations": [...]}`. Each operation gets a result
+    with its own status; see wallet_bulk for the operation shapes.
+
+    The body limit is enforced differently for the two formats. A
+    Content-Length over the limit is a 413 either way, as is a JSON body
+    that grows past it, since nothing has been applied yet. An NDJSON body
+    that grows past it (chunked, or without a Content-Length) has already
+    had its earlier operations applied, so it gets a 200 with the results
+    so far and `truncated` set; the client resends from the first
+    operation without a result.
+    """
+    user = await get_user_from_cookie(req)
     
-    doc_dict = doc.model_dump()
-    doc_dict['created_at'] = doc_dict['created_at'].isoformat()
+    content_length = req.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > wallet_bulk.max_bytes:
+        raise HTTPException(status_code=413, detail=f"Request body is larger than {wallet_bulk.max_bytes} bytes")
+    content_type = req.headers.get("content-type", "").split(";")[0].strip().lower()
     
-    await db.wallet_docs.insert_one(doc_dict)
-    return {"id": doc.id, "message": "Saved to wallet"}
+    try:
+        with span("wallet_bulk"):
+            result = await wallet_bulk.run(user.id if user else None, req.stream(), content_type)
+    except BulkRequestError as e:
+        raise HTTPException(status_code=e.status, detail=str(e))
+    return ORJSONResponse(result)
+
+@v1_router.get("/wallet/bulk/stats")
+async def wallet_bulk_stats():
+    """Bulk wallet requests, operations applied and limits"""
+    return wallet_bulk.stats()
+
+@v1_router.get("/wallet/blobs/stats")
+async def wallet_blob_stats():
+    """Wallet bodies stored, bytes saved by deduplication and compression"""
+    return wallet_blobs.stats()
+
+WALLET_SUMMARY_PROJECTION = {"_id": 0, "content": 0, "content_hash": 0, "content_size": 0}
+
+def encode_cursor(created_at: Any, doc_id: str) -> str:
+    data = {"c": created_at, "i": doc_id}
+    if isinstance(created_at, datetime):
+        # Keep the type so the next page compares date to date
+        data.update(c=created_at.isoformat(), d=1)
+    raw = json.dumps(data)
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        created_at = datetime.fromisoformat(data["c"]) if data.get("d") else data["c"]
+        return {"created_at": created_at, "id": data["i"]}
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @v1_router.get("/wallet/list")
-async def list_wallet_docs(req: Request):
-    """List wallet documents"""
+async def list_wallet_docs(
+    req: Request,
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    tags: List[str] = Query(default=[]),
+    include_content: bool = False
+):
+    """List wallet documents, newest first.
+
+    Keyset-paginated on (created_at, id): pass `next_cursor` from the previous
+    page as `cursor`. Bodies are omitted unless `include_content` is set; use
+    GET /wallet/{doc_id} to fetch one document in full.
+    """
+    user = await get_user_from_cookie(req)
+    
+    query: Dict[str, Any] = {"user_id": user.id if user else None}
+    if tags:
+        query["tags"] = {"$all": tags}
+    if cursor:
+        after = decode_cursor(cursor)
+        query["$or"] = [
+            {"created_at": {"$lt": after["created_at"]}},
+            {"created_at": after["created_at"], "id": {"$lt": after["id"]}},
+        ]
+        if isinstance(after["created_at"], datetime):
+            # $lt only compares within a BSON type, and entries not yet
+            # migrated to dates (migrate_dates.py) hold ISO strings, which
+            # sort after every date in this descending order
+            query["$or"].append({"created_at": {"$type": "string"}})
+    
+    projection = {"_id": 0} if include_content else WALLET_SUMMARY_PROJECTION
+    docs = await db.wallet_docs.find(query, projection).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["created_at"], docs[-1]["id"])
+    if include_content:
+        await wallet_blobs.inline(docs)
+    
+    return ORJSONResponse({"documents": docs, "next_cursor": next_cursor})
+
+@v1_router.get("/wallet/{doc_id}")
+async def get_wallet_doc(doc_id: str, req: Request):
+    """Fetch a single wallet document including its content"""
     user = await get_user_from_cookie(req)
     
-    query = {"user_id": user.id} if user else {}
-    docs = await db.wallet_docs.find(query, {"_id": 0}).to_list(100)
+    doc = await db.wallet_docs.find_one({"id": doc_id, "user_id": user.id if user else None}, {"_id": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Document not found")
+    await wallet_blobs.inline([doc])
     
-    return {"documents": docs}
+    return ORJSONResponse({"document": doc})
 
 @v1_router.delete("/wallet/{doc_id}")
 async def delete_wallet_doc(doc_id: str, req: Request):
     """Delete wallet document"""
     user = await get_user_from_cookie(req)
     
-    result = await db.wallet_docs.delete_one({"id": doc_id, "user_id": user.id if user else None})
+    doc = await db.wallet_docs.find_one_and_delete(
+        {"id": doc_id, "user_id": user.id if user else None},
+        projection={"_id": 0, "content_hash": 1},
+    )
     
-    if result.deleted_count == 0:
+    if doc is None:
         raise HTTPException(status_code=404, detail="Document not found")
+    if doc.get("content_hash"):
+        await wallet_blobs.release([doc["content_hash"]])
     
     return {"message": "Document deleted"}
 
 # ====== Library Routes ======
 
+# Served when no built index is configured (LIBRARY_INDEX_DIR)
+SEED_LIBRARY_ITEMS = [
+    {
+        "id": "1",
+        "title": "Motor Vehicles Act, 1988",
+        "snippet": "The Motor Vehicles Act regulates all aspects of road transport vehicles...",
+        "url": "https://www.indiacode.nic.in/",
+        "source_type": "Act",
+        "tags": ["traffic", "transport"]
+    },
+    {
+        "id": "2",
+        "title": "Consumer Protection Act, 2019",
+        "snippet": "An Act to provide for protection of the interests of consumers...",
+        "url": "https://consumeraffairs.nic.in/",
+        "source_type": "Act",
+        "tags": ["consumer", "rights"]
+    }
+]
+
+def load_library_index() -> LibraryIndex:
+    index_dir = os.environ.get('LIBRARY_INDEX_DIR')
+    if index_dir and os.path.exists(os.path.join(index_dir, "meta.json")):
+        index = LibraryIndex.load(index_dir)
+        logger.info(f"Loaded library index from {index_dir}: {index.n_docs} documents")
+        return index
+    if index_dir:
+        logger.warning(f"No library index at {index_dir}; serving seed items only")
+    return LibraryIndex.build(SEED_LIBRARY_ITEMS)
+
+library_index = load_library_index()
+
 @v1_router.get("/library/search")
-async def search_library(q: str = ""):
-    """Search legal library"""
-    # Mock implementation
-    items = [
-        {
-            "id": "1",
-            "title": "Motor Vehicles Act, 1988",
-            "snippet": "The Motor Vehicles Act regulates all aspects of road transport vehicles...",
-            "url": "https://www.indiacode.nic.in/",
-            "source_type": "Act",
-            "tags": ["traffic", "transport"]
-        },
-        {
-            "id": "2",
-            "title": "Consumer Protection Act, 2019",
-            "snippet": "An Act to provide for protection of the interests of consumers...",
-            "url": "https://consumeraffairs.nic.in/",
-            "source_type": "Act",
-            "tags": ["consumer", "rights"]
-        }
-    ]
-    
-    if q:
-        items = [item for item in items if q.lower() in item['title'].lower() or q.lower() in item['snippet'].lower()]
-    
-    return {"results": items}
+async def search_library(
+    q: str = "",
+    tags: List[str] = Query(default=[]),
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=10, ge=1, le=50),
+    prefix: bool = False
+):
+    """Search legal library (BM25 ranking, tag facets and filters, pagination)"""
+    return library_index.search(q, tags=tags, page=page, page_size=page_size, prefix=prefix)
+
+@v1_router.get("/library/suggest")
+async def suggest_library(q: str = "", limit: int = Query(default=10, ge=1, le=25)):
+    """Autocomplete the last word of a library query"""
+    return {"suggestions": library_index.suggest(q, limit=limit)}
 
 # ====== Theme Routes ======
 
@@ -506,18 +1207,45 @@ class Theme(BaseModel):
     deleted_at: Optional[datetime] = None
     version: str = "1.0.0"
 
+theme_cache = ThemeCache(
+    db.theme_versions,
+    max_entries=int(os.environ.get('THEME_CACHE_MAX_ENTRIES', 10000)),
+    body_ttl=float(os.environ.get('THEME_CACHE_TTL_SECONDS', 300)),
+    version_ttl=float(os.environ.get('THEME_VERSION_TTL_SECONDS', 5)),
+)
+
+# Browsers keep the body but revalidate it on every use
+THEME_CACHE_CONTROL = "private, no-cache"
+
 @v1_router.get("/themes")
 async def get_themes(req: Request, scope: str = "user"):
-    """Get all themes for user"""
+    """Get all themes for user.
+
+    Responses carry an ETag; send it back as If-None-Match to get a 304
+    while the user's themes are unchanged.
+    """
     user = await get_user_from_cookie(req)
+    owner = user.id if user else ANY_OWNER
     
-    query = {"scope": scope, "status": {"$ne": "deleted"}}
-    if user:
-        query["owner_id"] = user.id
+    with span("theme_cache"):
+        version = await theme_cache.version(owner)
+    etag = theme_cache.etag(owner, scope, version)
+    headers = {"ETag": etag, "Cache-Control": THEME_CACHE_CONTROL}
+    if etag_matches(req.headers.get("if-none-match"), etag):
+        theme_cache.not_modified()
+        return Response(status_code=304, headers=headers)
     
-    themes = await db.themes.find(query, {"_id": 0}).to_list(100)
+    body = theme_cache.get(owner, scope, version)
+    if body is None:
+        query = {"scope": scope, "status": {"$ne": "deleted"}}
+        if user:
+            query["owner_id"] = user.id
+        
+        themes = await db.themes.find(query, {"_id": 0}).to_list(100)
+        body = ORJSONResponse({"themes": themes}).body
+        theme_cache.put(owner, scope, version, body)
     
-    return {"themes": themes}
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @v1_router.post("/themes")
 async def create_theme(request: ThemeCreateRequest, req: Request):
@@ -532,12 +1260,11 @@ async def create_theme(request: ThemeCreateRequest, req: Request):
     )
     
     theme_dict = theme.model_dump()
-    theme_dict['created_at'] = theme_dict['created_at'].isoformat()
-    theme_dict['updated_at'] = theme_dict['updated_at'].isoformat()
-    
-    await db.themes.insert_one(theme_dict)
+    # insert_one adds _id to the dict it is given
+    await db.themes.insert_one(dict(theme_dict))
+    await theme_cache.bump(theme.owner_id)
     
-    return {"theme": theme.model_dump()}
+    return ORJSONResponse({"theme": theme_dict})
 
 @v1_router.put("/themes/{theme_id}")
 async def update_theme(theme_id: str, request: ThemeUpdateRequest, req: Request):
@@ -549,36 +1276,41 @@ async def update_theme(theme_id: str, request: ThemeUpdateRequest, req: Request)
         update_data['name'] = request.name
     if request.tokens:
         update_data['tokens'] = request.tokens
-    update_data['updated_at'] = datetime.now(timezone.utc).isoformat()
+    update_data['updated_at'] = datetime.now(timezone.utc)
     
-    result = await db.themes.update_one(
-        {"id": theme_id, "owner_id": user.id if user else None},
-        {"$set": update_data}
+    owner_id = user.id if user else None
+    theme = await db.themes.find_one_and_update(
+        {"id": theme_id, "owner_id": owner_id},
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
     )
     
-    if result.modified_count == 0:
+    if theme is None:
         raise HTTPException(status_code=404, detail="Theme not found")
+    await theme_cache.bump(owner_id)
     
-    theme = await db.themes.find_one({"id": theme_id}, {"_id": 0})
-    return {"theme": theme}
+    return ORJSONResponse({"theme": theme})
 
 @v1_router.delete("/themes/{theme_id}")
 async def delete_theme_api(theme_id: str, req: Request):
     """Soft delete theme"""
     user = await get_user_from_cookie(req)
     
+    owner_id = user.id if user else None
     result = await db.themes.update_one(
-        {"id": theme_id, "owner_id": user.id if user else None},
+        {"id": theme_id, "owner_id": owner_id},
         {
             "$set": {
                 "status": "deleted",
-                "deleted_at": datetime.now(timezone.utc).isoformat()
+                "deleted_at": datetime.now(timezone.utc)
             }
         }
     )
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Theme not found")
+    await theme_cache.bump(owner_id)
     
     return {"ok": True}
 
@@ -587,27 +1319,83 @@ async def restore_theme_api(theme_id: str, req: Request):
     """Restore deleted theme"""
     user = await get_user_from_cookie(req)
     
-    result = await db.themes.update_one(
-        {"id": theme_id, "owner_id": user.id if user else None},
+    owner_id = user.id if user else None
+    # Only a theme that is not already published is restored (404 otherwise)
+    theme = await db.themes.find_one_and_update(
+        {"id": theme_id, "owner_id": owner_id, "status": {"$ne": "published"}},
         {
             "$set": {
                 "status": "published",
                 "deleted_at": None
             }
-        }
+        },
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER,
     )
     
-    if result.modified_count == 0:
+    if theme is None:
         raise HTTPException(status_code=404, detail="Theme not found")
+    await theme_cache.bump(owner_id)
     
-    theme = await db.themes.find_one({"id": theme_id}, {"_id": 0})
-    return {"theme": theme}
+    return ORJSONResponse({"theme": theme})
+
+@v1_router.get("/themes/cache/stats")
+async def theme_cache_stats():
+    """GET /themes cache hits, 304s and version reads"""
+    return theme_cache.stats()
 
 # Include routers
 api_router.include_router(v1_router)
 api_router.include_router(auth_router)
 app.include_router(api_router)
 
+# ====== Metrics ======
+
+def llm_pool_requests() -> Dict[tuple, int]:
+    samples = {}
+    for route in llm_router.routes:
+        stats = route.pool.stats()
+        samples[(stats["name"], "active")] = stats["active"]
+        samples[(stats["name"], "waiting")] = stats["waiting"]
+    return samples
+
+def answer_cache_lookups() -> Dict[tuple, int]:
+    stats = answer_cache.stats()
+    return {(outcome,): stats[outcome] for outcome in ("exact_hits", "similar_hits", "mongo_hits", "misses")}
+
+metrics.registry.register(Gauge(
+    "adhikaar_llm_pool_requests",
+    "LLM calls in progress or waiting for a slot, per pool",
+    llm_pool_requests,
+    ("pool", "state"),
+))
+metrics.registry.register(Gauge(
+    "adhikaar_answer_cache_lookups_total",
+    "Answer cache lookups by outcome",
+    answer_cache_lookups,
+    ("outcome",),
+    kind="counter",
+))
+metrics.registry.register(Gauge(
+    "adhikaar_ask_log_queue_depth",
+    "ask_logs documents waiting to be written",
+    lambda: ask_log_writer.stats()["queue_depth"],
+))
+metrics.registry.register(Gauge(
+    "adhikaar_ask_log_documents_total",
+    "ask_logs documents by outcome (enqueued, written, dropped when the queue was full, failed to write)",
+    lambda: {(outcome,): ask_log_writer.stats()[outcome] for outcome in ("enqueued", "written", "dropped", "failed")},
+    ("outcome",),
+    kind="counter",
+))
+
+# Served at the root rather than under /api, so the ingress does not expose it
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    if not metrics.enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -616,7 +1404,44 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it is outermost and its timings include the other middleware
+app.add_middleware(TimingMiddleware)
+
+@app.on_event("startup")
+async def start_search_client():
+    await search_client.start()
+
+@app.on_event("startup")
+async def start_llm_router():
+    await llm_router.start()
+    await translation_pool.start()
+
+@app.on_event("startup")
+async def start_ask_jobs():
+    await ask_jobs.start()
+
+@app.on_event("startup")
+async def start_log_writer():
+    ask_log_writer.start()
+
+@app.on_event("startup")
+async def load_answer_packs():
+    await answer_packs.start(ANSWER_PACKS_RELOAD_SECONDS)
+
+@app.on_event("startup")
+async def ensure_db_indexes():
+    await ensure_indexes(db)
+    if os.environ.get('VERIFY_QUERY_PLANS', 'false').lower() == 'true':
+        # Refuse to start if a route query would scan a whole collection
+        await verify_query_plans(db)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await ask_jobs.stop()
+    await ask_log_writer.stop()
+    await answer_packs.stop()
+    await search_client.close()
+    await llm_router.close()
+    await translation_pool.close()
+    await ask_limiter.close()
     client.close()
\ No newline at end of file
@@ -0,0 +1,76 @@
+"""Coalesce concurrent identical requests into one computation.
+
+``SingleFlight.do(key, fn)`` runs ``fn()`` once per key at a time; callers
+that arrive while it is running wait for the same result (or exception)
+instead of starting their own. The computation runs as its own task, so
+the caller that started it can go away without failing the others: it is
+only cancelled once every caller waiting on it has been cancelled.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+        self._started = 0
+        self._joined = 0
+        self._abandoned = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, shared); ``shared`` is True if another caller started the work"""
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = self._flights[key] = _Flight(asyncio.create_task(fn()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self._started += 1
+        else:
+            self._joined += 1
+        return await self._wait(key, flight), shared
+
+    async def join(self, key: str) -> Tuple[bool, Any]:
+        """Wait for an in-flight computation if there is one; returns (found, result)"""
+        flight = self._flights.get(key)
+        if flight is None:
+            return False, None
+        self._joined += 1
+        return True, await self._wait(key, flight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._flights),
+            "started": self._started,
+            "joined": self._joined,
+            "abandoned": self._abandoned,
+        }
+
+    # ---- internals ----
+
+    async def _wait(self, key: str, flight: _Flight) -> Any:
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.task.cancelled():
+                raise
+            # This caller went away; stop the work only if nobody else wants it
+            if flight.waiters == 1 and not flight.task.done():
+                self._abandoned += 1
+                flight.task.cancel()
+                self._forget(key, flight)
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
@@ -0,0 +1,322 @@
+"""Local retrieval over statute text for grounding /ask answers.
+
+Statutes are split into overlapping word windows, embedded offline and stored
+as a float16 matrix. Nearest-neighbour search uses an inverted-file (IVF)
+index: chunks are clustered with spherical k-means, and a query only scores
+the chunks in its ``nprobe`` closest clusters.
+
+Short keyword queries ("FIR refused") are matched poorly by dense vectors of
+long passages, so the same chunks are also kept in a BM25 ``LibraryIndex``
+and the two candidate lists are merged with reciprocal-rank fusion. Fusion
+ranks whatever it is given, so a passage is only returned if it shares a
+query term (BM25 above ``min_bm25``) or, when ``min_cosine`` is set, is
+that close to the query embedding; a query with nothing relevant gets no
+passages rather than the least bad ones.
+
+The default embedder is TF-IDF over words and word bigrams, hashed into a
+fixed number of dimensions. It needs only NumPy and embeds a query in well
+under a millisecond. Setting ``embedder`` to a
+sentence-transformers model name uses that model instead, when the package is
+installed. Queries are always embedded with the embedder recorded in the
+index.
+
+Build from the same JSONL corpus as the library index:
+
+    python statute_retrieval.py build corpus.jsonl /path/to/index [embedder]
+"""
+import json
+import os
+import sys
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from library_index import LibraryIndex, read_jsonl, tokenize
+
+HASHING_EMBEDDER = "hashing-v1"
+
+# Reciprocal-rank fusion constant; 60 is the usual choice
+RRF_K = 60
+
+# The hashing embedder is a much weaker signal than BM25, so its ranks count
+# for less in the fusion; a real sentence model gets equal weight.
+DENSE_WEIGHTS = {HASHING_EMBEDDER: 0.5}
+
+
+class HashingEmbedder:
+    """TF-IDF over words and word bigrams, hashed down to ``dim`` dimensions.
+
+    IDF is kept per feature in a 2**20-slot table (hashed, so rare collisions
+    only), which lets rare legal terms dominate the vector the way they would
+    in a plain TF-IDF model.
+    """
+    name = HASHING_EMBEDDER
+    IDF_SLOTS = 1 << 20
+
+    def __init__(self, dim: int = 768, idf: Optional[np.ndarray] = None):
+        self.dim = dim
+        self.idf = idf
+
+    def _hashed_features(self, text: str) -> Counter:
+        tokens = tokenize(text)
+        features = Counter(tokens)
+        features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+        return Counter({zlib.crc32(f.encode("utf-8")): c for f, c in features.items()})
+
+    def _vector(self, hashed: Counter) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        if not hashed:
+            return vec
+        keys = np.fromiter(hashed.keys(), dtype=np.uint32, count=len(hashed))
+        tf = 1.0 + np.log(np.fromiter(hashed.values(), dtype=np.float32, count=len(hashed)))
+        weights = tf * (self.idf[keys % self.IDF_SLOTS] if self.idf is not None else 1.0)
+        signs = np.where(keys & 0x80000000, 1.0, -1.0).astype(np.float32)
+        np.add.at(vec, keys % self.dim, signs * weights)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm > 0 else vec
+
+    def fit_embed(self, texts: List[str]) -> np.ndarray:
+        """Learn feature IDF from the corpus and embed it"""
+        hashed = [self._hashed_features(t) for t in texts]
+        df = np.zeros(self.IDF_SLOTS, dtype=np.float32)
+        for features in hashed:
+            keys = np.fromiter(features.keys(), dtype=np.uint32, count=len(features))
+            np.add.at(df, keys % self.IDF_SLOTS, 1)
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1.0).astype(np.float16)
+        return np.stack([self._vector(h) for h in hashed])
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), np.float32)
+        return np.stack([self._vector(self._hashed_features(t)) for t in texts])
+
+
+class SentenceTransformerEmbedder:
+    def __init__(self, name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise RuntimeError(f"Embedder {name!r} needs the sentence-transformers package")
+        self.name = name
+        self._model = SentenceTransformer(name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+
+    def fit_embed(self, texts: List[str]) -> np.ndarray:
+        return self.embed(texts)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def make_embedder(name: str, dim: int = 768, idf: Optional[np.ndarray] = None):
+    if name == HASHING_EMBEDDER:
+        return HashingEmbedder(dim=dim, idf=idf)
+    return SentenceTransformerEmbedder(name)
+
+
+def chunk_document(doc: Dict[str, Any], words: int = 100, overlap: int = 25) -> List[Dict[str, Any]]:
+    """Split a statute into overlapping windows of ``words`` words"""
+    text = doc.get("text") or doc.get("snippet") or ""
+    tokens = text.split()
+    step = max(words - overlap, 1)
+    chunks = []
+    for start in range(0, max(len(tokens) - overlap, 1), step):
+        chunks.append({
+            "doc_id": str(doc.get("id", "")),
+            "title": doc.get("title", ""),
+            "url": doc.get("url", ""),
+            "text": " ".join(tokens[start:start + words]),
+        })
+    return chunks
+
+
+def _spherical_kmeans(vectors: np.ndarray, k: int, iters: int = 10, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].astype(np.float32)
+    for _ in range(iters):
+        assign = _nearest_centroid(vectors, centroids)
+        counts = np.bincount(assign, minlength=k)
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(vectors[np.argsort(assign, kind="stable")], starts[~empty])
+        if empty.any():
+            # Reseed empty clusters from random points
+            sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+def _nearest_centroid(vectors: np.ndarray, centroids: np.ndarray, batch: int = 8192) -> np.ndarray:
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch):
+        out[start:start + batch] = np.argmax(vectors[start:start + batch] @ centroids.T, axis=1)
+    return out
+
+
+class StatuteIndex:
+    def __init__(self, embedder, lexical, centroids, list_offsets, vectors, chunk_ids, chunks_blob, chunk_offsets, meta):
+        self.embedder = embedder
+        self.lexical = lexical
+        self.meta = meta
+        self._centroids = centroids
+        self._list_offsets = list_offsets
+        self._vectors = vectors
+        self._chunk_ids = chunk_ids
+        self._chunks_blob = chunks_blob
+        self._chunk_offsets = chunk_offsets
+        self.n_chunks = len(chunk_offsets) - 1
+
+    @classmethod
+    def build(cls, documents: Iterable[Dict[str, Any]], embedder_name: str = HASHING_EMBEDDER,
+              nlist: Optional[int] = None) -> "StatuteIndex":
+        chunks = [chunk for doc in documents for chunk in chunk_document(doc)]
+        if not chunks:
+            raise ValueError("Corpus produced no chunks")
+        texts = [f"{c['title']}. {c['text']}" for c in chunks]
+
+        embedder = make_embedder(embedder_name)
+        vectors = embedder.fit_embed(texts)
+
+        nlist = nlist or max(1, int(np.sqrt(len(chunks))))
+        nlist = min(nlist, len(chunks))
+        centroids = _spherical_kmeans(vectors, nlist)
+        assign = _nearest_centroid(vectors, centroids)
+
+        order = np.argsort(assign, kind="stable").astype(np.int32)
+        list_offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))]).astype(np.int64)
+
+        lexical = LibraryIndex.build(
+            {"id": str(i), "title": c["title"], "text": c["text"], "snippet": " "}
+            for i, c in enumerate(chunks)
+        )
+
+        blobs = [json.dumps(c, ensure_ascii=False).encode("utf-8") for c in chunks]
+        meta = {"version": 1, "embedder": embedder.name, "dim": int(vectors.shape[1]), "nlist": nlist}
+        return cls(
+            embedder,
+            lexical,
+            centroids.astype(np.float32),
+            list_offsets,
+            vectors[order].astype(np.float16),
+            order,
+            np.frombuffer(b"".join(blobs), dtype=np.uint8),
+            np.cumsum([0] + [len(b) for b in blobs], dtype=np.int64),
+            meta,
+        )
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        arrays = {
+            "centroids": self._centroids,
+            "list_offsets": self._list_offsets,
+            "vectors": self._vectors,
+            "chunk_ids": self._chunk_ids,
+            "chunks": self._chunks_blob,
+            "chunk_offsets": self._chunk_offsets,
+        }
+        if getattr(self.embedder, "idf", None) is not None:
+            arrays["idf"] = self.embedder.idf
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        self.lexical.save(os.path.join(directory, "lexical"))
+        with open(os.path.join(directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "StatuteIndex":
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+
+        def arr(name, mmap=True):
+            return np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None)
+
+        idf_path = os.path.join(directory, "idf.npy")
+        idf = np.load(idf_path) if os.path.exists(idf_path) else None
+        embedder = make_embedder(meta["embedder"], dim=meta["dim"], idf=idf)
+        return cls(
+            embedder,
+            LibraryIndex.load(os.path.join(directory, "lexical")),
+            arr("centroids", mmap=False),
+            arr("list_offsets", mmap=False),
+            arr("vectors"),
+            arr("chunk_ids"),
+            arr("chunks"),
+            arr("chunk_offsets"),
+            meta,
+        )
+
+    def _chunk(self, chunk_id: int) -> Dict[str, Any]:
+        start, end = self._chunk_offsets[chunk_id], self._chunk_offsets[chunk_id + 1]
+        return json.loads(self._chunks_blob[start:end].tobytes().decode("utf-8"))
+
+    def dense_search(self, query: str, limit: int, nprobe: int = 8) -> List[Tuple[int, float]]:
+        """(chunk_id, cosine) pairs nearest to the query embedding, best first"""
+        q = self.embedder.embed([query])[0]
+        nprobe = min(nprobe, len(self._centroids))
+        probe = np.argpartition(-(self._centroids @ q), nprobe - 1)[:nprobe]
+
+        positions, scores = [], []
+        for list_id in probe:
+            start, end = self._list_offsets[list_id], self._list_offsets[list_id + 1]
+            if start == end:
+                continue
+            positions.append(np.arange(start, end))
+            # float16 has no BLAS path; upcasting the probed lists is cheaper
+            scores.append(self._vectors[start:end].astype(np.float32) @ q)
+        if not positions:
+            return []
+        positions = np.concatenate(positions)
+        scores = np.concatenate(scores)
+
+        limit = min(limit, len(scores))
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top])]
+        return [(int(self._chunk_ids[positions[i]]), float(scores[i])) for i in top]
+
+    def search(
+        self,
+        query: str,
+        k: int = 4,
+        nprobe: int = 8,
+        min_bm25: float = 0.0,
+        min_cosine: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """Top-k relevant passages for ``query``, each with title, url, text and
+        score; empty if none passes the relevance cutoff"""
+        candidates = 4 * k
+        dense_weight = DENSE_WEIGHTS.get(self.embedder.name, 1.0)
+        fused: Dict[int, float] = {}
+        dense = self.dense_search(query, candidates, nprobe)
+        lexical = self.lexical.rank(query, candidates)
+        for rank, (chunk_id, _) in enumerate(dense):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + dense_weight / (RRF_K + rank)
+        for rank, (chunk_id, _) in enumerate(lexical):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (RRF_K + rank)
+
+        bm25 = dict(lexical)
+        cosine = dict(dense)
+        passages = []
+        for chunk_id, score in sorted(fused.items(), key=lambda item: -item[1]):
+            relevant = bm25.get(chunk_id, 0.0) > min_bm25 or (
+                min_cosine is not None and cosine.get(chunk_id, -1.0) >= min_cosine
+            )
+            if not relevant:
+                continue
+            chunk = self._chunk(chunk_id)
+            chunk["score"] = round(score, 5)
+            passages.append(chunk)
+            if len(passages) == k:
+                break
+        return passages
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (4, 5) or sys.argv[1] != "build":
+        print("usage: python statute_retrieval.py build <corpus.jsonl> <index_dir> [embedder]", file=sys.stderr)
+        sys.exit(2)
+    index = StatuteIndex.build(read_jsonl(sys.argv[2]), *sys.argv[4:5])
+    index.save(sys.argv[3])
+    print(f"Indexed {index.n_chunks} chunks in {index.meta['nlist']} lists -> {sys.argv[3]}")
@@ -0,0 +1,140 @@
+"""Cached GET /themes responses with version-based invalidation.
+
+Every write to an owner's themes replaces the owner's version token in the
+``theme_versions`` collection (``bump``). A cached response is stored with
+the version it was built from and is only served while that is still the
+owner's version. The ETag is derived from the owner, scope and version, so
+a client revalidating with ``If-None-Match`` gets a 304 without the themes
+being read at all.
+
+Versions are read from Mongo at most once per ``version_ttl`` per owner and
+process: the process that made a write sees it at once, other workers
+within ``version_ttl``. ``bump`` runs after the theme write has been
+applied, so it never fails the request. A version that could not be stored
+is kept as pending: this process serves it, and stores it again on the next
+lookup at most every ``retry_interval`` seconds; other workers see it
+``version_ttl`` after that succeeds. Since the ETag depends on nothing but
+the version, themes edited outside the API are only picked up with the next
+bump; ``body_ttl`` just keeps idle bodies from holding memory.
+
+Anonymous requests list themes of every owner, so they are cached under
+``ANY_OWNER``, whose version is bumped by every write.
+"""
+import hashlib
+import logging
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from cachetools import TTLCache
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+ANY_OWNER = "*"
+INITIAL_VERSION = "0"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches ``etag`` (weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == bare for candidate in if_none_match.split(","))
+
+
+class ThemeCache:
+    def __init__(
+        self,
+        versions,
+        max_entries: int = 10000,
+        body_ttl: float = 300,
+        version_ttl: float = 5,
+        retry_interval: float = 1.0,
+    ):
+        self.versions = versions
+        self.retry_interval = retry_interval
+        # (owner, scope) -> (version, ETag, rendered body)
+        self._bodies: TTLCache = TTLCache(maxsize=max_entries, ttl=body_ttl)
+        self._versions: TTLCache = TTLCache(maxsize=max_entries, ttl=version_ttl)
+        # owner -> version this process uses but could not store yet
+        self._pending: Dict[str, str] = {}
+        self._retry_at = 0.0
+        self._stats = {"hits": 0, "misses": 0, "not_modified": 0, "version_reads": 0, "bumps": 0, "bump_failures": 0}
+
+    async def version(self, owner: str) -> str:
+        if self._pending:
+            if time.monotonic() >= self._retry_at:
+                await self._store_pending()
+            if owner in self._pending:
+                return self._pending[owner]
+        version = self._versions.get(owner)
+        if version is None:
+            self._stats["version_reads"] += 1
+            doc = await self.versions.find_one({"_id": owner}, {"v": 1})
+            version = doc["v"] if doc else INITIAL_VERSION
+            self._versions[owner] = version
+        return version
+
+    @staticmethod
+    def etag(owner: str, scope: str, version: str) -> str:
+        digest = hashlib.sha256(f"{owner}\x00{scope}\x00{version}".encode()).hexdigest()[:20]
+        return f'W/"{digest}"'
+
+    def get(self, owner: str, scope: str, version: str) -> Optional[bytes]:
+        cached = self._bodies.get((owner, scope))
+        if cached is not None and cached[0] == version:
+            self._stats["hits"] += 1
+            return cached[2]
+        self._stats["misses"] += 1
+        return None
+
+    def put(self, owner: str, scope: str, version: str, body: bytes) -> None:
+        self._bodies[(owner, scope)] = (version, self.etag(owner, scope, version), body)
+
+    def not_modified(self) -> None:
+        self._stats["not_modified"] += 1
+
+    async def bump(self, owner: Optional[str]) -> None:
+        """Invalidate ``owner``'s themes (and the anonymous listing) everywhere.
+
+        Does not raise: a version that cannot be stored is retried later.
+        """
+        owners = [ANY_OWNER] if owner is None else [owner, ANY_OWNER]
+        version = uuid.uuid4().hex
+        for key in owners:
+            # Known here straight away; other workers read it within version_ttl
+            self._versions[key] = version
+            self._pending[key] = version
+        self._stats["bumps"] += 1
+        await self._store_pending()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "size": len(self._bodies),
+            "pending_bumps": len(self._pending),
+        }
+
+    async def _store_pending(self):
+        pending = dict(self._pending)
+        try:
+            await self.versions.bulk_write(
+                [UpdateOne({"_id": key}, {"$set": {"v": version}}, upsert=True) for key, version in pending.items()],
+                ordered=False,
+            )
+        except Exception as e:
+            # The theme write itself went through; other workers keep the
+            # old version until this is stored
+            self._stats["bump_failures"] += 1
+            self._retry_at = time.monotonic() + self.retry_interval
+            logger.error(f"Theme version bump failed for {', '.join(pending)}: {e}")
+            return
+        for key, version in pending.items():
+            # A newer bump may have replaced it in the meantime
+            if self._pending.get(key) == version:
+                del self._pending[key]
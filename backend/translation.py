@@ -0,0 +1,212 @@
+"""Translate English /ask answers into the requested language.
+
+Answers are generated (and cached) once, in English. For any other
+language ``Translator.translate_answer`` translates the title, summary,
+steps and template. Each string is looked up in ``TranslationCache`` under
+a hash of (language, text); whatever is missing goes to the LLM in one
+request, as a JSON array. Steps and titles recur across answers, so most
+strings are cache hits after a while and a new language costs one LLM call
+per answer at most. Sources (Act names and URLs) are left as they are.
+
+The cache is an in-process LRU, optionally mirrored to a Mongo collection
+so translations survive restarts and are shared between workers. Mongo
+entries are keyed by ``_id`` and expire through the ``created_at`` TTL
+index declared in indexes.py.
+Concurrent requests needing the same strings share one LLM call.
+"""
+import hashlib
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+LANGUAGES = {
+    "en": "English",
+    "hi": "Hindi",
+    "bn": "Bengali",
+    "ta": "Tamil",
+    "te": "Telugu",
+    "mr": "Marathi",
+    "gu": "Gujarati",
+    "kn": "Kannada",
+    "ml": "Malayalam",
+    "pa": "Punjabi",
+    "or": "Odia",
+    "ur": "Urdu",
+}
+
+TRANSLATION_SYSTEM_PROMPT = """You translate short pieces of legal guidance for Indian citizens from English.
+
+Rules:
+1. Translate each string in the JSON array you are given into the requested language
+2. Use simple, everyday words rather than formal legal vocabulary
+3. Keep names of Acts, section numbers, URLs, phone numbers and anything in [square brackets] unchanged
+4. Reply with a JSON array of the translated strings, in the same order and of the same length, and nothing else"""
+
+
+class TranslationError(Exception):
+    pass
+
+
+def answer_language(lang: Optional[str]) -> str:
+    """Supported language code for a requested ``lang`` (``hi-IN`` -> ``hi``); English otherwise"""
+    code = (lang or "en").strip().lower().replace("_", "-").split("-")[0]
+    return code if code in LANGUAGES else "en"
+
+
+def translation_key(text: str, lang: str) -> str:
+    return hashlib.sha256(f"{lang}\x00{text}".encode()).hexdigest()
+
+
+class TranslationCache:
+    def __init__(self, max_entries: int = 20000, collection=None):
+        self.max_entries = max_entries
+        self.collection = collection
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._stats = {"hits": 0, "mongo_hits": 0, "misses": 0, "stores": 0}
+
+    async def get_many(self, texts: List[str], lang: str) -> Dict[str, str]:
+        """Cached translations of ``texts``, as {text: translation}"""
+        found: Dict[str, str] = {}
+        missing: Dict[str, str] = {}
+        for text in texts:
+            key = translation_key(text, lang)
+            translated = self._entries.get(key)
+            if translated is not None:
+                self._entries.move_to_end(key)
+                found[text] = translated
+                self._stats["hits"] += 1
+            else:
+                missing[key] = text
+
+        if missing and self.collection is not None:
+            try:
+                async for doc in self.collection.find({"_id": {"$in": list(missing)}}, {"translation": 1}):
+                    text = missing.pop(doc["_id"])
+                    found[text] = doc["translation"]
+                    self._put(doc["_id"], doc["translation"])
+                    self._stats["mongo_hits"] += 1
+            except Exception as e:
+                logger.warning(f"Translation cache read failed: {e}")
+
+        self._stats["misses"] += len(missing)
+        return found
+
+    async def set_many(self, translations: Dict[str, str], lang: str) -> None:
+        keyed = {translation_key(text, lang): translated for text, translated in translations.items()}
+        for key, translated in keyed.items():
+            self._put(key, translated)
+        self._stats["stores"] += len(keyed)
+
+        if self.collection is not None and keyed:
+            from pymongo import UpdateOne
+
+            now = datetime.now(timezone.utc)
+            try:
+                await self.collection.bulk_write(
+                    [
+                        UpdateOne(
+                            {"_id": key},
+                            {"$set": {"lang": lang, "translation": translated, "created_at": now}},
+                            upsert=True,
+                        )
+                        for key, translated in keyed.items()
+                    ],
+                    ordered=False,
+                )
+            except Exception as e:
+                logger.warning(f"Translation cache write failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self._stats["hits"] + self._stats["mongo_hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": round((lookups - self._stats["misses"]) / lookups, 4) if lookups else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+            "mongo_enabled": self.collection is not None,
+        }
+
+    def _put(self, key: str, translated: str):
+        self._entries[key] = translated
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+def _parse_translations(reply: str, expected: int) -> List[str]:
+    start, end = reply.find("["), reply.rfind("]")
+    if start < 0 or end < start:
+        raise TranslationError("reply has no JSON array")
+    try:
+        items = json.loads(reply[start:end + 1])
+    except ValueError:
+        raise TranslationError("reply is not valid JSON")
+    if not isinstance(items, list) or len(items) != expected or not all(isinstance(i, str) and i.strip() for i in items):
+        raise TranslationError(f"expected {expected} strings")
+    return [item.strip() for item in items]
+
+
+class Translator:
+    def __init__(self, complete: Callable[[str], Awaitable[str]], cache: TranslationCache):
+        # ``complete`` sends a prompt to an LLM set up with TRANSLATION_SYSTEM_PROMPT
+        self.complete = complete
+        self.cache = cache
+        self._flights = SingleFlight()
+        self._stats = {"answers": 0, "llm_calls": 0, "strings_translated": 0, "failures": 0}
+
+    async def translate_texts(self, texts: List[str], lang: str) -> List[str]:
+        """Translations of ``texts`` in order; raises TranslationError (or the
+        LLM's timeout/overload errors) if they cannot all be translated"""
+        unique = list(dict.fromkeys(texts))
+        found = await self.cache.get_many(unique, lang)
+        missing = [text for text in unique if text not in found]
+        if missing:
+            key = translation_key("\x00".join(missing), lang)
+            translated, _ = await self._flights.do(key, lambda: self._translate_missing(missing, lang))
+            found.update(translated)
+        return [found[text] for text in texts]
+
+    async def translate_answer(self, answer: Dict[str, Any], lang: str) -> Dict[str, Any]:
+        """An AskResponse dict with its text fields in ``lang``"""
+        if lang == "en":
+            return answer
+        self._stats["answers"] += 1
+        texts = [answer["title"], answer["summary"], *answer["steps"]]
+        if answer.get("template"):
+            texts.append(answer["template"])
+        translated = await self.translate_texts([t for t in texts if t], lang)
+
+        it = iter(translated)
+        result = dict(answer)
+        result["title"] = next(it) if answer["title"] else answer["title"]
+        result["summary"] = next(it) if answer["summary"] else answer["summary"]
+        result["steps"] = [next(it) if step else step for step in answer["steps"]]
+        if answer.get("template"):
+            result["template"] = next(it)
+        result["lang"] = lang
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "cache": self.cache.stats()}
+
+    async def _translate_missing(self, texts: List[str], lang: str) -> Dict[str, str]:
+        prompt = (
+            f"Translate into {LANGUAGES[lang]}:\n"
+            f"{json.dumps(texts, ensure_ascii=False)}"
+        )
+        self._stats["llm_calls"] += 1
+        try:
+            translated = _parse_translations(await self.complete(prompt), len(texts))
+        except Exception:
+            self._stats["failures"] += 1
+            raise
+        pairs = dict(zip(texts, translated))
+        await self.cache.set_many(pairs, lang)
+        self._stats["strings_translated"] += len(pairs)
+        return pairs
@@ -0,0 +1,285 @@
+"""Content-addressed storage for wallet document bodies.
+
+Users save the same generated templates again and again, so wallet_docs
+entries no longer carry their ``content``. Each body is stored once in the
+``wallet_blobs`` collection under the SHA-256 of its text, and the entry
+keeps ``content_hash`` and ``content_size``. Bodies of at least
+``compress_min_bytes`` are stored compressed (zlib, or zstd when the
+zstandard package is installed and ``codec="zstd"``), if that makes them
+smaller.
+
+Each blob counts the entries referring to it in ``refs``.
+``acquire`` increments the count (creating the blob if needed) *before*
+the entry is written, and ``release`` decrements it after the entry is
+deleted and removes the blob once nothing refers to it. A failure between
+the two steps can only leave a count too high, which wastes a blob but
+never loses one that is still referenced.
+
+Blobs never change once written, so decoded bodies are kept in a small
+in-process LRU. Entries written before this module still have ``content``
+inline; ``inline`` serves both, and ``python wallet_blobs.py migrate``
+moves the old bodies into blobs.
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+import os
+import sys
+import zlib
+from collections import Counter, OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Tuple
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+CODECS = ("zlib", "zstd")
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class WalletBlobs:
+    def __init__(
+        self,
+        collection,
+        compress_min_bytes: int = 1024,
+        codec: str = "zlib",
+        cache_entries: int = 1000,
+    ):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown wallet blob codec {codec!r}")
+        if codec == "zstd":
+            try:
+                import zstandard
+            except ImportError:
+                raise RuntimeError("The zstd wallet blob codec needs the zstandard package")
+            self._zstd_compressor = zstandard.ZstdCompressor(level=3)
+        self.collection = collection
+        self.compress_min_bytes = compress_min_bytes
+        self.codec = codec
+        self.cache_entries = cache_entries
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._stats = {
+            "acquired": 0, "released": 0, "blobs_deleted": 0,
+            "bytes_in": 0, "bytes_stored": 0, "cache_hits": 0, "cache_misses": 0,
+        }
+
+    def encode(self, content: str) -> Dict[str, Any]:
+        """Fields stored for a new blob"""
+        raw = content.encode("utf-8")
+        fields: Dict[str, Any] = {"encoding": "raw", "data": content, "size": len(raw)}
+        if len(raw) >= self.compress_min_bytes:
+            if self.codec == "zstd":
+                compressed = self._zstd_compressor.compress(raw)
+            else:
+                compressed = zlib.compress(raw, 6)
+            if len(compressed) < len(raw):
+                fields.update(encoding=self.codec, data=compressed)
+        return fields
+
+    @staticmethod
+    def decode(blob: Dict[str, Any]) -> str:
+        encoding = blob.get("encoding", "raw")
+        data = blob["data"]
+        if encoding == "raw":
+            return data
+        if encoding == "zlib":
+            return zlib.decompress(data).decode("utf-8")
+        if encoding == "zstd":
+            import zstandard
+
+            return zstandard.ZstdDecompressor().decompress(data).decode("utf-8")
+        raise ValueError(f"Unknown wallet blob encoding {encoding!r}")
+
+    async def acquire(self, contents: List[str]) -> List[Tuple[str, int]]:
+        """Take a reference on the blob of each body, creating blobs as needed.
+
+        Returns (content_hash, content_size) per body, in order.
+        """
+        keyed = [(content_hash(content), content) for content in contents]
+        refs = Counter(key for key, _ in keyed)
+        bodies = dict(keyed)
+        encoded = {key: self.encode(body) for key, body in bodies.items()}
+        now = datetime.now(timezone.utc)
+        result = await self.collection.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": key},
+                    {"$setOnInsert": {**encoded[key], "created_at": now}, "$inc": {"refs": count}},
+                    upsert=True,
+                )
+                for key, count in refs.items()
+            ],
+            ordered=False,
+        )
+        sizes = {key: fields["size"] for key, fields in encoded.items()}
+        self._stats["acquired"] += len(keyed)
+        self._stats["bytes_in"] += sum(sizes[key] for key, _ in keyed)
+        # Only blobs this call created add to what is stored
+        self._stats["bytes_stored"] += sum(_stored_size(encoded[key]) for key in result.upserted_ids.values())
+        for key, body in bodies.items():
+            self._put(key, body)
+        return [(key, sizes[key]) for key, _ in keyed]
+
+    async def release(self, hashes: Iterable[str]) -> None:
+        """Drop one reference per hash, deleting blobs nothing refers to"""
+        refs = Counter(hashes)
+        if not refs:
+            return
+        await self.collection.bulk_write(
+            [UpdateOne({"_id": key}, {"$inc": {"refs": -count}}) for key, count in refs.items()],
+            ordered=False,
+        )
+        # Conditional on the count, so a blob re-acquired in the meantime stays
+        result = await self.collection.delete_many({"_id": {"$in": list(refs)}, "refs": {"$lte": 0}})
+        self._stats["released"] += sum(refs.values())
+        self._stats["blobs_deleted"] += result.deleted_count
+        for key in refs:
+            self._cache.pop(key, None)
+
+    async def fetch(self, hashes: Iterable[str]) -> Dict[str, str]:
+        """Bodies by hash; hashes with no blob are left out"""
+        found: Dict[str, str] = {}
+        missing = []
+        for key in set(hashes):
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                found[key] = body
+                self._stats["cache_hits"] += 1
+            else:
+                missing.append(key)
+        if missing:
+            self._stats["cache_misses"] += len(missing)
+            async for blob in self.collection.find({"_id": {"$in": missing}}, {"refs": 0, "created_at": 0}):
+                body = self.decode(blob)
+                found[blob["_id"]] = body
+                self._put(blob["_id"], body)
+        return found
+
+    async def inline(self, docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Put ``content`` back into wallet entries in place of ``content_hash``"""
+        bodies = await self.fetch(doc["content_hash"] for doc in docs if doc.get("content_hash"))
+        for doc in docs:
+            key = doc.pop("content_hash", None)
+            doc.pop("content_size", None)
+            if key is not None:
+                if key not in bodies:
+                    logger.error(f"Wallet document {doc.get('id')} refers to missing blob {key}")
+                doc["content"] = bodies.get(key, "")
+        return docs
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self._stats,
+            "codec": self.codec,
+            "compress_min_bytes": self.compress_min_bytes,
+            "cache_size": len(self._cache),
+        }
+
+    async def storage(self) -> Dict[str, Any]:
+        """Blob count and stored vs referenced bytes, computed in Mongo"""
+        rows = await self.collection.aggregate([
+            {"$group": {
+                "_id": None,
+                "blobs": {"$sum": 1},
+                "refs": {"$sum": "$refs"},
+                "size": {"$sum": "$size"},
+                "stored_size": {"$sum": {"$cond": [{"$eq": ["$encoding", "raw"]}, "$size", {"$binarySize": "$data"}]}},
+                "referenced_size": {"$sum": {"$multiply": ["$size", "$refs"]}},
+            }},
+        ]).to_list(1)
+        return {key: value for key, value in (rows[0] if rows else {}).items() if key != "_id"}
+
+    def _put(self, key: str, body: str):
+        if self.cache_entries <= 0:
+            return
+        self._cache[key] = body
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+
+
+def _stored_size(fields: Dict[str, Any]) -> int:
+    data = fields["data"]
+    return len(data) if isinstance(data, bytes) else fields["size"]
+
+
+# ====== Migration ======
+
+async def migrate(db, blobs: WalletBlobs, batch_size: int = 200, dry_run: bool = False) -> Dict[str, int]:
+    """Move inline ``content`` of older wallet entries into blobs.
+
+    Safe while the API runs: each entry is updated only if its content is
+    still inline, and the reference taken for an entry that was deleted or
+    migrated in the meantime is released again.
+    """
+    progress = {"scanned": 0, "migrated": 0, "skipped": 0}
+    inline_filter = {"content": {"$type": "string"}}
+    last_id = None
+    while True:
+        query = inline_filter if last_id is None else {**inline_filter, "_id": {"$gt": last_id}}
+        batch = await db.wallet_docs.find(query, {"content": 1}).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not batch:
+            break
+        last_id = batch[-1]["_id"]
+        progress["scanned"] += len(batch)
+        if dry_run:
+            continue
+
+        refs = await blobs.acquire([doc["content"] for doc in batch])
+        results = await asyncio.gather(*[
+            db.wallet_docs.update_one(
+                {"_id": doc["_id"], "content": doc["content"]},
+                {"$set": {"content_hash": key, "content_size": size}, "$unset": {"content": ""}},
+            )
+            for doc, (key, size) in zip(batch, refs)
+        ])
+        unused = [key for (key, _), result in zip(refs, results) if result.modified_count == 0]
+        await blobs.release(unused)
+        progress["migrated"] += len(batch) - len(unused)
+        progress["skipped"] += len(unused)
+        logger.info(f"wallet_docs: {progress['scanned']} scanned, {progress['migrated']} moved to blobs")
+    return progress
+
+
+async def _main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Wallet blob storage")
+    commands = parser.add_subparsers(dest="command", required=True)
+    migrate_cmd = commands.add_parser("migrate", help="move inline wallet document bodies into blobs")
+    migrate_cmd.add_argument("--batch-size", type=int, default=200)
+    migrate_cmd.add_argument("--dry-run", action="store_true", help="count documents without writing")
+    commands.add_parser("stats", help="blob count and bytes saved")
+    args = parser.parse_args(argv)
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(os.environ.get("MONGO_URL", "mongodb://localhost:27017"), tz_aware=True)
+    db = client.get_database(os.environ.get("DB_NAME", "adhikaar"))
+    blobs = WalletBlobs(
+        db.wallet_blobs,
+        compress_min_bytes=int(os.environ.get("WALLET_BLOB_COMPRESS_MIN_BYTES", 1024)),
+        codec=os.environ.get("WALLET_BLOB_CODEC", "zlib"),
+    )
+    try:
+        if args.command == "migrate":
+            progress = await migrate(db, blobs, args.batch_size, args.dry_run)
+            print(f"scanned={progress['scanned']} migrated={progress['migrated']} skipped={progress['skipped']}")
+        else:
+            storage = await blobs.storage()
+            inline = await db.wallet_docs.count_documents({"content": {"$type": "string"}})
+            print(f"blobs={storage.get('blobs', 0)} refs={storage.get('refs', 0)} "
+                  f"size={storage.get('size', 0)} stored_size={storage.get('stored_size', 0)} referenced_size={storage.get('referenced_size', 0)} "
+                  f"inline_documents={inline}")
+    finally:
+        client.close()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
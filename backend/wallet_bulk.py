@@ -0,0 +1,298 @@
+"""Batched wallet writes for POST /wallet/bulk.
+
+A bulk request is a list of operations, each one of
+
+* ``{"op": "insert", "title": ..., "content": ..., "tags": [...]}``
+* ``{"op": "delete", "id": ...}``
+* ``{"op": "tag", "id": ..., "add": [...], "remove": [...]}``
+
+sent either as newline-delimited JSON (``application/x-ndjson``), which is
+parsed as it arrives, or as a JSON body ``{"operations": [...]}``.
+Operations are applied in batches of ``batch_size`` with one
+``bulk_write(ordered=False)`` each, after a single query for which of the
+batch's ids belong to the user. Every operation gets its own result, so a
+bad item fails on its own rather than failing the request. Inserted bodies
+go to wallet blobs with one ``acquire`` per batch.
+
+A ``DeleteOne`` that matched nothing is not a write error, so a delete
+racing another request for the same entry still looks successful. Blob
+references are therefore given back per batch only when the write's
+``deleted_count`` shows every delete removed its entry. If none did, the
+deletes are 404s. If only some did, which ones is unknown and nothing is
+released: a count left too high only costs space.
+
+Past ``max_items`` operations, or ``max_bytes`` of an NDJSON body, reading
+stops and the response is marked ``truncated``: the operations reported
+were applied and nothing after them was. A JSON body is only parsed once
+complete, so past ``max_bytes`` nothing has been applied and it is
+rejected with a 413 (``BulkRequestError``) instead.
+"""
+import json
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+OPS = ("insert", "delete", "tag")
+COUNTED_AS = {"insert": "inserted", "delete": "deleted", "tag": "updated"}
+
+
+class BulkRequestError(Exception):
+    """The request as a whole cannot be processed"""
+
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+class BulkLimitExceeded(Exception):
+    pass
+
+
+async def iter_operations(
+    chunks: AsyncIterator[bytes],
+    content_type: str,
+    max_bytes: int,
+) -> AsyncIterator[Tuple[Any, Optional[str]]]:
+    """Yield (operation, parse error) per operation in the body.
+
+    Raises BulkLimitExceeded once more than ``max_bytes`` have been read.
+    """
+    received = 0
+    if content_type == "application/x-ndjson":
+        buffer = b""
+        async for chunk in chunks:
+            received += len(chunk)
+            if received > max_bytes:
+                raise BulkLimitExceeded(f"Request body is larger than {max_bytes} bytes")
+            buffer += chunk
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                if line.strip():
+                    yield _parse_line(line)
+        if buffer.strip():
+            yield _parse_line(buffer)
+        return
+
+    body = bytearray()
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > max_bytes:
+            raise BulkRequestError(f"Request body is larger than {max_bytes} bytes", status=413)
+        body += chunk
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise BulkRequestError("Request body is not valid JSON")
+    operations = data.get("operations") if isinstance(data, dict) else None
+    if not isinstance(operations, list):
+        raise BulkRequestError("Expected {\"operations\": [...]}")
+    for operation in operations:
+        yield operation, None
+
+
+def _parse_line(line: bytes) -> Tuple[Any, Optional[str]]:
+    try:
+        return json.loads(line), None
+    except ValueError:
+        return None, "Invalid JSON"
+
+
+def _tag_list(value: Any) -> Optional[List[str]]:
+    if value is None:
+        return []
+    if isinstance(value, list) and all(isinstance(tag, str) for tag in value):
+        return value
+    return None
+
+
+class WalletBulkWriter:
+    def __init__(
+        self,
+        collection,
+        make_doc: Callable[[Dict[str, Any], Optional[str]], Dict[str, Any]],
+        blobs=None,
+        max_items: int = 1000,
+        max_bytes: int = 10 * 1024 * 1024,
+        batch_size: int = 200,
+    ):
+        # ``make_doc`` validates an insert and returns the document to store;
+        # with ``blobs`` (a WalletBlobs) its content is stored there instead
+        self.collection = collection
+        self.make_doc = make_doc
+        self.blobs = blobs
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self._stats = {"requests": 0, "operations": 0, "failed": 0, "truncated": 0, "bulk_writes": 0}
+
+    async def run(self, user_id: Optional[str], chunks: AsyncIterator[bytes], content_type: str) -> Dict[str, Any]:
+        self._stats["requests"] += 1
+        results: List[Dict[str, Any]] = []
+        batch: List[Tuple[int, Any, Optional[str]]] = []
+        truncated = None
+        try:
+            async for operation, error in iter_operations(chunks, content_type, self.max_bytes):
+                if len(results) + len(batch) >= self.max_items:
+                    truncated = f"More than {self.max_items} operations"
+                    break
+                batch.append((len(results) + len(batch), operation, error))
+                if len(batch) >= self.batch_size:
+                    results.extend(await self._apply(user_id, batch))
+                    batch = []
+        except BulkLimitExceeded as e:
+            truncated = str(e)
+        if batch:
+            results.extend(await self._apply(user_id, batch))
+        if truncated:
+            self._stats["truncated"] += 1
+
+        counts = {"inserted": 0, "deleted": 0, "updated": 0, "failed": 0}
+        for result in results:
+            counts[COUNTED_AS[result["op"]] if result["ok"] else "failed"] += 1
+        self._stats["operations"] += len(results)
+        self._stats["failed"] += counts["failed"]
+        return {"results": results, **counts, "truncated": truncated}
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._stats, "max_items": self.max_items, "max_bytes": self.max_bytes, "batch_size": self.batch_size}
+
+    async def _apply(self, user_id: Optional[str], batch: List[Tuple[int, Any, Optional[str]]]) -> List[Dict[str, Any]]:
+        results: Dict[int, Dict[str, Any]] = {}
+        planned: List[Tuple[int, str, Dict[str, Any]]] = []
+        for index, operation, error in batch:
+            op = operation.get("op") if isinstance(operation, dict) else None
+            if error is None and op not in OPS:
+                error = f"op must be one of {', '.join(OPS)}"
+            if error is None and op != "insert" and not isinstance(operation.get("id"), str):
+                error = "id is required"
+            if error:
+                results[index] = _failure(index, op, None, 400, error)
+            else:
+                planned.append((index, op, operation))
+
+        # One read for which ids this user owns, so a missing or foreign
+        # document is a 404 for that item, and for their blob hashes
+        ids = [operation["id"] for _, op, operation in planned if op != "insert"]
+        owned: Dict[str, Optional[str]] = {}
+        if ids:
+            cursor = self.collection.find({"id": {"$in": ids}, "user_id": user_id}, {"_id": 0, "id": 1, "content_hash": 1})
+            owned = {doc["id"]: doc.get("content_hash") async for doc in cursor}
+
+        requests: List[Any] = []
+        request_items: List[int] = []
+        new_docs: List[Tuple[int, Dict[str, Any]]] = []
+        deleted_hashes: Dict[int, Optional[str]] = {}
+        for index, op, operation in planned:
+            doc_id = operation.get("id")
+            if op == "insert":
+                try:
+                    doc = self.make_doc(operation, user_id)
+                except ValueError as e:
+                    results[index] = _failure(index, op, None, 422, _first_error(e))
+                    continue
+                doc_id = doc["id"]
+                new_docs.append((len(requests), doc))
+                writes = [InsertOne(doc)]
+            elif doc_id not in owned:
+                results[index] = _failure(index, op, doc_id, 404, "Document not found")
+                continue
+            elif op == "delete":
+                # Later operations in the request see it as gone
+                deleted_hashes[len(requests)] = owned.pop(doc_id)
+                writes = [DeleteOne({"id": doc_id, "user_id": user_id})]
+            else:
+                add, remove = _tag_list(operation.get("add")), _tag_list(operation.get("remove"))
+                if add is None or remove is None:
+                    results[index] = _failure(index, op, doc_id, 400, "add and remove must be lists of strings")
+                    continue
+                if not add and not remove or set(add) & set(remove):
+                    results[index] = _failure(index, op, doc_id, 400, "add and remove must be non-empty and disjoint")
+                    continue
+                # $addToSet and $pull cannot touch the same field in one update;
+                # disjoint tags make the order of the two irrelevant
+                writes = []
+                if add:
+                    writes.append(UpdateOne({"id": doc_id, "user_id": user_id}, {"$addToSet": {"tags": {"$each": add}}}))
+                if remove:
+                    writes.append(UpdateOne({"id": doc_id, "user_id": user_id}, {"$pull": {"tags": {"$in": remove}}}))
+            results[index] = {"index": index, "op": op, "id": doc_id, "ok": True}
+            requests.extend(writes)
+            request_items.extend([index] * len(writes))
+
+        if requests:
+            await self._write(requests, request_items, new_docs, deleted_hashes, results)
+
+        return [results[index] for index, _, _ in batch]
+
+    async def _write(
+        self,
+        requests: List[Any],
+        request_items: List[int],
+        new_docs: List[Tuple[int, Dict[str, Any]]],
+        deleted_hashes: Dict[int, Optional[str]],
+        results: Dict[int, Dict[str, Any]],
+    ):
+        inserted_hashes: Dict[int, str] = {}
+        try:
+            if self.blobs is not None and new_docs:
+                # InsertOne holds on to the dict, so the content can still be
+                # swapped for its blob reference here
+                refs = await self.blobs.acquire([doc.pop("content") for _, doc in new_docs])
+                for (position, doc), (key, size) in zip(new_docs, refs):
+                    doc.update(content_hash=key, content_size=size)
+                    inserted_hashes[position] = key
+            self._stats["bulk_writes"] += 1
+            failed = set()
+            try:
+                deleted = (await self.collection.bulk_write(requests, ordered=False)).deleted_count
+            except BulkWriteError as e:
+                deleted = e.details.get("nRemoved", 0)
+                for write_error in e.details.get("writeErrors", []):
+                    failed.add(write_error["index"])
+                    index = request_items[write_error["index"]]
+                    result = results[index]
+                    results[index] = _failure(index, result["op"], result["id"], 409, write_error.get("errmsg", "Write failed"))
+        except PyMongoError as e:
+            # Which writes landed is unknown, so no blob reference is given
+            # back: a count left too high only costs space
+            logger.error(f"Wallet bulk write failed: {e}")
+            for index in set(request_items):
+                result = results[index]
+                results[index] = _failure(index, result["op"], result["id"], 503, "Database unavailable")
+            return
+
+        released = [key for position, key in inserted_hashes.items() if position in failed]
+        deletes = {position: key for position, key in deleted_hashes.items() if position not in failed}
+        if deleted == len(deletes):
+            released += [key for key in deletes.values() if key]
+        elif deleted == 0:
+            for position in deletes:
+                index = request_items[position]
+                results[index] = _failure(index, "delete", results[index]["id"], 404, "Document not found")
+        else:
+            logger.warning(f"Wallet bulk delete removed {deleted} of {len(deletes)} entries; keeping their blob references")
+        if self.blobs is not None:
+            await self._release(released)
+
+    async def _release(self, hashes: List[str]):
+        try:
+            await self.blobs.release(hashes)
+        except PyMongoError as e:
+            logger.error(f"Releasing wallet blobs failed: {e}")
+
+
+def _failure(index: int, op: Optional[str], doc_id: Optional[str], status: int, error: str) -> Dict[str, Any]:
+    return {"index": index, "op": op, "id": doc_id, "ok": False, "status": status, "error": error}
+
+
+def _first_error(e: ValueError) -> str:
+    # pydantic's ValidationError is a ValueError with a list of errors
+    errors = getattr(e, "errors", None)
+    if callable(errors):
+        first = errors()[0]
+        return f"{'.'.join(str(part) for part in first['loc'])}: {first['msg']}"
+    return str(e)
@@ -0,0 +1,176 @@
+"""Async Google Custom Search client.
+
+One pooled ``httpx.AsyncClient`` is created at startup and reused for every
+request. Results are cached by normalized query; failures are cached for a
+shorter time so a bad query is not retried on every request, and a circuit
+breaker stops calling Google altogether while it is failing.
+
+The endpoint is configurable so tests and benchmarks can point the client at
+a local stub that speaks the CSE JSON format.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from cachetools import TTLCache
+
+from answer_cache import normalize_query
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CSE_ENDPOINT = "https://www.googleapis.com/customsearch/v1"
+
+_MISSING = object()
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe"""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, name: str = "Google search"):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def release(self):
+        """Give up a half-open probe without recording an outcome"""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            if self.opened_at is None:
+                logger.warning(f"{self.name} circuit opened after {self.failures} failures")
+            self.opened_at = time.monotonic()
+
+
+class GoogleSearchClient:
+    def __init__(
+        self,
+        api_key: str,
+        cse_id: str,
+        endpoint: str = DEFAULT_CSE_ENDPOINT,
+        timeout: float = 2.5,
+        cache_ttl: int = 60 * 60,
+        negative_ttl: int = 60,
+        cache_size: int = 2000,
+        max_connections: int = 20,
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.api_key = api_key
+        self.cse_id = cse_id
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.breaker = breaker or CircuitBreaker()
+        self._results: TTLCache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._failures: TTLCache = TTLCache(maxsize=cache_size, ttl=negative_ttl)
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key and self.cse_id)
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+            )
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def search(self, query: str, num: int = 5) -> Optional[List[Dict[str, str]]]:
+        """Return up to ``num`` results, or None when there are none or search is unavailable"""
+        if not self.enabled:
+            return None
+
+        key = normalize_query(query)
+        cached = self._results.get(key, _MISSING)
+        if cached is not _MISSING:
+            return [dict(item) for item in cached] if cached else None
+        if key in self._failures:
+            return None
+        if not self.breaker.allow():
+            return None
+
+        try:
+            items = await self._fetch(query, num)
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except httpx.HTTPStatusError as e:
+            # str(e) includes the request URL, and with it the API key
+            logger.error(f"Google search error: HTTP {e.response.status_code}")
+            self.breaker.record_failure()
+            self._failures[key] = True
+            return None
+        except Exception as e:
+            logger.error(f"Google search error: {type(e).__name__}")
+            self.breaker.record_failure()
+            self._failures[key] = True
+            return None
+
+        self.breaker.record_success()
+        self._results[key] = items
+        return [dict(item) for item in items] if items else None
+
+    async def _fetch(self, query: str, num: int) -> List[Dict[str, str]]:
+        if self._client is None:
+            await self.start()
+
+        response = await self._client.get(
+            self.endpoint,
+            params={
+                "key": self.api_key,
+                "cx": self.cse_id,
+                # Add India legal context to search
+                "q": f"{query} India law legal",
+                "num": num,
+            },
+        )
+        response.raise_for_status()
+        result: Dict[str, Any] = response.json()
+
+        return [
+            {
+                "title": item.get('title', 'Untitled'),
+                "url": item.get('link', ''),
+                "type": "Search Result",
+                "snippet": item.get('snippet', '')[:200]
+            }
+            for item in result.get('items', [])[:num]
+        ]
@@ -13,6 +13,8 @@ const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 export default function Wallet() {
   const [documents, setDocuments] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadDocuments();
@@ -22,6 +24,7 @@ export default function Wallet() {
     try {
       const response = await axios.get(`${BACKEND_URL}/api/v1/wallet/list`);
       setDocuments(response.data.documents || []);
+      setNextCursor(response.data.next_cursor || null);
     } catch (error) {
       console.error('Load wallet error:', error);
       // Mock data for demo
@@ -38,6 +41,23 @@ export default function Wallet() {
     }
   };
 
+  // The list is paginated; each page returns the cursor for the next one
+  const loadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${BACKEND_URL}/api/v1/wallet/list`, {
+        params: { cursor: nextCursor },
+      });
+      setDocuments((loaded) => [...loaded, ...(response.data.documents || [])]);
+      setNextCursor(response.data.next_cursor || null);
+    } catch (error) {
+      console.error('Load more wallet error:', error);
+      toast.error('Could not load more documents');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleDelete = async (id) => {
     try {
       await axios.delete(`${BACKEND_URL}/api/v1/wallet/${id}`);
@@ -130,6 +150,18 @@ export default function Wallet() {
                     </TableBody>
                   </Table>
                 )}
+                {!loading && nextCursor && (
+                  <div className="mt-4 text-center">
+                    <Button
+                      variant="outline"
+                      onClick={loadMore}
+                      disabled={loadingMore}
+                      data-testid="wallet-load-more"
+                    >
+                      {loadingMore ? 'Loading...' : 'Load more'}
+                    </Button>
+                  </div>
+                )}
               </CardContent>
             </Card>
           </TabsContent>
@@ -0,0 +1,92 @@
+import pytest
+
+from answer_cache import AnswerCache, jaccard, normalize_query, query_signature, shingles
+
+pytestmark = pytest.mark.anyio
+
+RESPONSE = {"title": "Arrest without a warrant", "summary": "...", "steps": [], "template": None}
+
+
+def signature(query):
+    return query_signature(normalize_query(query))
+
+
+def test_normalize_query():
+    assert normalize_query("  Can the POLICE arrest me?!  ") == "can the police arrest me"
+
+
+@pytest.mark.parametrize("a, b", [
+    ("Can the police arrest me?", "can police arrest me"),
+    ("Isn't this bailable?", "is this not bailable"),
+    ("I can't pay rent", "I cannot pay rent"),
+    ("I'm a tenant", "I am a tenant"),
+])
+def test_same_signature(a, b):
+    assert signature(a) == signature(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("can police arrest me", "can police not arrest me"),
+    ("is it bailable", "is it non bailable"),
+    ("section 3 of the act", "section 4 of the act"),
+    ("must I pay", "may I pay"),
+])
+def test_different_signature(a, b):
+    assert signature(a) != signature(b)
+
+
+def test_jaccard():
+    assert jaccard(shingles("abc"), shingles("abc")) == 1.0
+    assert jaccard(set(), shingles("abc")) == 0.0
+
+
+async def test_exact_hit():
+    cache = AnswerCache()
+    await cache.set("Can police arrest me?", "en", None, RESPONSE)
+    assert await cache.get("can police   arrest me", "en", None) == RESPONSE
+    assert await cache.get("can police arrest me", "hi", None) is None
+    assert await cache.get("can police arrest me", "en", "tenant") is None
+    assert cache.stats()["exact_hits"] == 1
+
+
+async def test_similar_hit_above_threshold():
+    cache = AnswerCache(similarity_threshold=0.85)
+    await cache.set("can police arrest me without a warrant", "en", None, RESPONSE)
+    assert await cache.get("can the police arrest me without a warrant", "en", None) == RESPONSE
+    assert cache.stats()["similar_hits"] == 1
+
+
+async def test_similar_miss_below_threshold():
+    cache = AnswerCache(similarity_threshold=0.95)
+    await cache.set("can police arrest me without a warrant", "en", None, RESPONSE)
+    assert await cache.get("can the police arrest me without a warrant", "en", None) is None
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["near_misses"] == 1
+
+
+async def test_negation_is_not_a_similar_hit():
+    cache = AnswerCache(similarity_threshold=0.85)
+    await cache.set("can police arrest me without a warrant", "en", None, RESPONSE)
+    # Scores about 0.88 on trigrams alone
+    assert await cache.get("can police not arrest me without a warrant", "en", None) is None
+    assert cache.stats()["signature_rejects"] == 1
+
+
+async def test_different_number_is_not_a_similar_hit():
+    cache = AnswerCache(similarity_threshold=0.8)
+    await cache.set("is theft under section 379 bailable", "en", None, RESPONSE)
+    assert await cache.get("is theft under section 378 bailable", "en", None) is None
+
+
+async def test_lru_eviction_and_ttl():
+    cache = AnswerCache(max_entries=2)
+    for query in ("first question", "second question", "third question"):
+        await cache.set(query, "en", None, RESPONSE)
+    assert await cache.get("first question", "en", None) is None
+    assert cache.stats()["evictions"] == 1
+
+    expired = AnswerCache(ttl_seconds=-1)
+    await expired.set("old question", "en", None, RESPONSE)
+    assert await expired.get("old question", "en", None) is None
+    assert expired.stats()["expirations"] == 1
@@ -0,0 +1,83 @@
+import json
+
+import pytest
+
+from answer_parser import MAX_STEPS, extract_json_object, parse_answer
+
+ANSWER = {
+    "title": "Police refused FIR",
+    "summary": "You can send your complaint to the SP.",
+    "steps": ["Write to the SP", "Approach the magistrate"],
+    "template": None,
+}
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(ANSWER),
+    f"```json\n{json.dumps(ANSWER)}\n```",
+    f"Sure! Here is the answer:\n{json.dumps(ANSWER)}\nHope this helps {{you}}.",
+])
+def test_json_with_fences_and_prose(text):
+    answer = parse_answer(text)
+    assert answer.status == "json"
+    assert answer.complete
+    assert (answer.title, answer.summary, answer.steps, answer.template) == (
+        ANSWER["title"], ANSWER["summary"], ANSWER["steps"], None,
+    )
+
+
+def test_braces_inside_strings():
+    data = {**ANSWER, "summary": "Use {name} and \"quotes\" here }"}
+    answer = parse_answer(f"{json.dumps(data)}\nSee {{name}} above.")
+    assert answer.status == "json"
+    assert answer.summary == data["summary"]
+
+
+def test_cut_off_output_is_repaired():
+    text = json.dumps(ANSWER)[:-40]
+    answer = parse_answer(text)
+    assert answer.status == "repaired"
+    assert not answer.complete
+    assert answer.title == ANSWER["title"]
+    assert answer.steps == ["Write to the SP"]
+
+
+def test_cut_off_inside_string_keeps_complete_fields():
+    answer = parse_answer('{"title": "Bail", "summary": "You may app')
+    assert answer.status == "repaired"
+    assert answer.title == "Bail"
+    assert answer.summary is None
+
+
+def test_wrong_types_dropped_per_field():
+    answer = parse_answer(json.dumps({
+        "title": 42,
+        "summary": "  ok  ",
+        "steps": ["one", {"step": "two"}, {"text": "three"}, None, "", "four", "five", "six"],
+        "template": ["not", "a", "string"],
+    }))
+    assert answer.title is None
+    assert answer.summary == "ok"
+    assert answer.steps == ["one", "two", "three", "four", "five"][:MAX_STEPS]
+    assert answer.template is None
+    assert not answer.complete
+
+
+def test_numbered_text_falls_back():
+    answer = parse_answer("## Your rights\nThe police must register an FIR.\n1. Go to the SP\n2) File a complaint\n- Keep copies")
+    assert answer.status == "text"
+    assert answer.summary == "The police must register an FIR."
+    assert answer.steps == ["Go to the SP", "File a complaint", "Keep copies"]
+
+
+def test_empty_reply():
+    answer = parse_answer("")
+    assert answer.status == "text"
+    assert answer.summary is None
+    assert answer.steps == []
+
+
+def test_extract_json_object():
+    assert extract_json_object('x {"a": "}", "b": [1, {"c": 2}]} y {"d": 3}') == '{"a": "}", "b": [1, {"c": 2}]}'
+    assert extract_json_object('{"a": [1, 2') is None
+    assert extract_json_object("no object") is None
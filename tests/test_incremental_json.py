@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from incremental_json import IncrementalAnswerParser
+
+ANSWER = {
+    "title": "Police refused your \"FIR\"",
+    "summary": "Approach the SP.\nThen the magistrate.",
+    "steps": ["Write to the SP", "File under Section 156(3)"],
+    "template": None,
+}
+
+
+def parse(text, chunk_size):
+    parser = IncrementalAnswerParser()
+    events = []
+    for i in range(0, len(text), chunk_size):
+        events.extend(parser.feed(text[i:i + chunk_size]))
+    return parser, events
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1000])
+def test_fields_and_items_regardless_of_chunking(chunk_size):
+    parser, events = parse(json.dumps(ANSWER), chunk_size)
+    assert parser.done
+    assert events == [
+        ("field", "title", ANSWER["title"]),
+        ("field", "summary", ANSWER["summary"]),
+        ("item", "steps", "Write to the SP"),
+        ("item", "steps", "File under Section 156(3)"),
+        ("field", "steps", ANSWER["steps"]),
+        ("field", "template", None),
+    ]
+
+
+def test_events_arrive_before_the_object_is_complete():
+    parser = IncrementalAnswerParser()
+    assert parser.feed('{"title": "Bail", "summ') == [("field", "title", "Bail")]
+    assert parser.feed('ary": "s", "steps": ["one", "tw') == [("field", "summary", "s"), ("item", "steps", "one")]
+    assert parser.feed('o"') == [("item", "steps", "two")]
+    assert not parser.done
+
+
+def test_leading_prose_and_code_fence_skipped():
+    parser, events = parse('Here you go:\n```json\n{"title": "x", "template": "Dear Sir"}\n```', 5)
+    assert parser.done
+    assert events == [("field", "title", "x"), ("field", "template", "Dear Sir")]
+
+
+def test_scalars_and_nested_values():
+    text = '{"count": 3, "ok": true, "meta": {"a": [1, {"b": "}"}]}, "steps": [{"n": 1}, 2]}'
+    _, events = parse(text, 4)
+    assert events == [
+        ("field", "count", 3),
+        ("field", "ok", True),
+        ("field", "meta", {"a": [1, {"b": "}"}]}),
+        ("item", "steps", {"n": 1}),
+        ("item", "steps", 2),
+        ("field", "steps", [{"n": 1}, 2]),
+    ]
+
+
+def test_text_after_the_object_ignored():
+    parser = IncrementalAnswerParser()
+    events = parser.feed('{"title": "x"} {"title": "y"}')
+    assert parser.done
+    assert events == [("field", "title", "x")]
@@ -0,0 +1,60 @@
+import os
+import uuid
+
+import pytest
+
+from indexes import QUERY_SHAPES, REQUIRED_INDEXES, _plan_stages, ensure_indexes, verify_query_plans
+
+pytestmark = pytest.mark.anyio
+
+
+def test_plan_stages_walks_nested_plans():
+    plan = {
+        "queryPlan": {
+            "stage": "FETCH",
+            "inputStage": {"stage": "OR", "inputStages": [{"stage": "IXSCAN"}, {"stage": "COLLSCAN"}]},
+        }
+    }
+    assert sorted(_plan_stages(plan)) == ["COLLSCAN", "FETCH", "IXSCAN", "OR"]
+
+
+def test_query_shapes_have_unique_names():
+    names = [name for name, _, _ in QUERY_SHAPES]
+    assert len(names) == len(set(names))
+
+
+@pytest.fixture
+async def mongo_db():
+    motor_asyncio = pytest.importorskip("motor.motor_asyncio")
+    from pymongo.errors import PyMongoError
+
+    client = motor_asyncio.AsyncIOMotorClient(
+        os.environ.get("MONGO_URL", "mongodb://localhost:27017"), serverSelectionTimeoutMS=1000
+    )
+    try:
+        await client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip("no mongod available")
+    name = f"adhikaar_test_{uuid.uuid4().hex[:8]}"
+    try:
+        yield client[name]
+    finally:
+        await client.drop_database(name)
+        client.close()
+
+
+async def test_query_plans_use_indexes(mongo_db):
+    await ensure_indexes(mongo_db)
+    for collection in REQUIRED_INDEXES:
+        names = set(await mongo_db[collection].index_information())
+        assert {index.document["name"] for index in REQUIRED_INDEXES[collection]} <= names
+
+    report = await verify_query_plans(mongo_db)
+    assert {row["name"] for row in report} == {name for name, _, _ in QUERY_SHAPES}
+
+
+async def test_verify_query_plans_reports_collscan(mongo_db):
+    await mongo_db.users.insert_one({"id": "x", "email": "x@example.com"})
+    with pytest.raises(RuntimeError, match="user_by_id"):
+        await verify_query_plans(mongo_db)
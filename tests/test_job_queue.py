@@ -0,0 +1,252 @@
+import asyncio
+import json
+import socket
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+
+import job_queue
+from job_queue import JobQueue, RetryableJobError, check_callback_url, sign_payload, validate_callback_url
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def jobs():
+    return mongomock_motor.AsyncMongoMockClient()["adhikaar_test"].ask_jobs
+
+
+class Handler:
+    """Returns the payload back, after raising the queued errors one by one"""
+
+    def __init__(self, *errors, delay=0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, job):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return {"answer": job["payload"]["question"]}
+
+
+def make_queue(collection, handler, **kwargs):
+    options = {"workers": 1, "poll_interval": 0.01, "retry_base_seconds": 0, "timeout": 1}
+    return JobQueue(collection, handler, **{**options, **kwargs})
+
+
+async def wait_for(queue, job_id, statuses=("succeeded", "failed"), timeout=3.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while loop.time() < deadline:
+        job = await queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+
+async def test_job_runs_and_expires(jobs):
+    queue = make_queue(jobs, Handler(), retention_seconds=60)
+    await queue.start()
+    job = await queue.enqueue({"question": "bail"}, user_id="u1")
+    done = await wait_for(queue, job["id"])
+    await queue.stop()
+
+    assert done["status"] == "succeeded"
+    assert done["result"] == {"answer": "bail"}
+    assert done["attempts"] == 1
+    stored = await jobs.find_one({"id": job["id"]})
+    assert stored["expires_at"] > stored["finished_at"]
+    assert await queue.counts() == {"queued": 0, "running": 0, "succeeded": 1, "failed": 0}
+
+
+async def test_retryable_error_runs_again(jobs):
+    handler = Handler(RetryableJobError("overloaded"))
+    queue = make_queue(jobs, handler)
+    await queue.start()
+    job = await queue.enqueue({"question": "bail"})
+    done = await wait_for(queue, job["id"])
+    await queue.stop()
+
+    assert done["status"] == "succeeded"
+    assert done["attempts"] == 2
+    assert done["error"] is None
+    assert queue.stats()["retried"] == 1
+
+
+async def test_retries_stop_at_max_attempts(jobs):
+    handler = Handler(*[RetryableJobError("overloaded", status=503)] * 3)
+    queue = make_queue(jobs, handler, max_attempts=2)
+    await queue.start()
+    job = await queue.enqueue({"question": "bail"})
+    done = await wait_for(queue, job["id"])
+    await queue.stop()
+
+    assert done["status"] == "failed"
+    assert done["error"] == {"status": 503, "detail": "overloaded"}
+    assert handler.calls == 2
+
+
+async def test_timeout_is_retryable_and_other_errors_are_not(jobs):
+    queue = make_queue(jobs, Handler(delay=1.0), timeout=0.02, max_attempts=2)
+    await queue.start()
+    slow = await queue.enqueue({"question": "slow"})
+    done = await wait_for(queue, slow["id"])
+    await queue.stop()
+    assert (done["error"]["status"], done["attempts"]) == (504, 2)
+
+    handler = Handler(KeyError("bug"))
+    queue = make_queue(jobs, handler, max_attempts=3)
+    await queue.start()
+    broken = await queue.enqueue({"question": "broken"})
+    done = await wait_for(queue, broken["id"])
+    await queue.stop()
+    assert done["error"] == {"status": 500, "detail": "The job failed"}
+    assert handler.calls == 1
+
+
+async def test_expired_lease_is_reclaimed(jobs):
+    now = datetime.now(timezone.utc)
+    base = {"payload": {"question": "bail"}, "attempts": 1, "created_at": now, "updated_at": now, "run_after": now}
+    await jobs.insert_many([
+        {**base, "id": "dead", "status": "running", "worker_id": "gone", "lease_until": now - timedelta(seconds=1)},
+        {**base, "id": "alive", "status": "running", "worker_id": "other", "lease_until": now + timedelta(hours=1)},
+    ])
+    queue = make_queue(jobs, Handler())
+    await queue.start()
+    done = await wait_for(queue, "dead")
+    await asyncio.sleep(0.05)
+    await queue.stop()
+
+    assert done["status"] == "succeeded"
+    assert done["attempts"] == 2
+    assert queue.stats()["reclaimed"] == 1
+    assert (await queue.get("alive"))["status"] == "running"
+
+
+async def test_stop_requeues_running_jobs(jobs):
+    queue = make_queue(jobs, Handler(delay=10))
+    await queue.start()
+    job = await queue.enqueue({"question": "bail"})
+    await wait_for(queue, job["id"], statuses=("running",))
+    await queue.stop()
+
+    stored = await queue.get(job["id"])
+    assert (stored["status"], stored["attempts"]) == ("queued", 0)
+
+
+async def test_worker_survives_failed_completion(jobs, caplog):
+    class FlakyJobs:
+        """Fails the first write that records a job's outcome"""
+
+        def __init__(self):
+            self.failures = 1
+
+        def __getattr__(self, name):
+            return getattr(jobs, name)
+
+        async def find_one_and_update(self, query, update, **kwargs):
+            if "projection" in kwargs and self.failures:
+                self.failures -= 1
+                raise ConnectionError("mongo down")
+            return await jobs.find_one_and_update(query, update, **kwargs)
+
+    queue = make_queue(FlakyJobs(), Handler())
+    await queue.start()
+    lost = await queue.enqueue({"question": "first"})
+    second = await queue.enqueue({"question": "second"})
+    done = await wait_for(queue, second["id"])
+    alive = not any(task.done() for task in queue._tasks)
+    await queue.stop()
+
+    assert done["status"] == "succeeded"
+    assert alive
+    assert "could not be completed" in caplog.text
+    # Left running under its lease, for the next claim after it expires
+    assert (await jobs.find_one({"id": lost["id"]}))["status"] in ("running", "queued")
+
+
+async def test_queue_full(jobs):
+    queue = make_queue(jobs, Handler(), workers=0, max_queued=1)
+    await queue.enqueue({"question": "a"})
+    with pytest.raises(job_queue.JobQueueFull):
+        await queue.enqueue({"question": "b"})
+
+
+@pytest.mark.parametrize("url", [
+    "https://127.0.0.1/hook",
+    "https://10.1.2.3/hook",
+    "https://100.64.0.1/hook",
+    "https://169.254.169.254/latest/meta-data",
+    "https://[::1]/hook",
+    "https://[::ffff:10.0.0.1]/hook",
+    "https://224.0.0.1/hook",
+])
+async def test_callback_to_private_address_rejected(url):
+    with pytest.raises(ValueError, match="public address"):
+        await check_callback_url(url)
+
+
+async def test_callback_checks():
+    assert await check_callback_url("https://8.8.8.8/hook") == "https://8.8.8.8/hook"
+    with pytest.raises(ValueError, match="https"):
+        await check_callback_url("http://8.8.8.8/hook")
+    with pytest.raises(ValueError, match="not allowed"):
+        validate_callback_url("https://8.8.8.8/hook", {"hooks.example.com"})
+    with pytest.raises(ValueError, match="does not resolve"):
+        await check_callback_url("https://host.invalid/hook")
+
+
+async def test_callback_host_with_any_private_address_rejected(monkeypatch):
+    loop = asyncio.get_running_loop()
+
+    async def getaddrinfo(host, port, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port)) for address in ("8.8.8.8", "10.0.0.5")]
+
+    monkeypatch.setattr(loop, "getaddrinfo", getaddrinfo)
+    with pytest.raises(ValueError, match="public address"):
+        await check_callback_url("https://hooks.example.com/hook", {"hooks.example.com"})
+
+
+async def test_webhook_delivered_with_signature(jobs):
+    delivered = []
+
+    def receive(request):
+        delivered.append(request)
+        return httpx.Response(204)
+
+    queue = make_queue(jobs, Handler(), webhook_secret="s3cret")
+    await queue.start()
+    await queue._client.aclose()
+    queue._client = httpx.AsyncClient(transport=httpx.MockTransport(receive))
+    job = await queue.enqueue({"question": "bail"}, callback_url="https://8.8.8.8/hook")
+    await wait_for(queue, job["id"])
+    await queue.stop()
+
+    [request] = delivered
+    assert request.headers["X-Adhikaar-Signature"] == sign_payload(request.content, "s3cret")
+    assert json.loads(request.content)["result"] == {"answer": "bail"}
+    assert (await jobs.find_one({"id": job["id"]}))["webhook"]["attempts"] == 1
+
+
+async def test_webhook_rechecked_at_delivery(jobs):
+    delivered = []
+    queue = make_queue(jobs, Handler(), webhook_attempts=1)
+    await queue.start()
+    await queue._client.aclose()
+    queue._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: delivered.append(request) or httpx.Response(204)))
+    # Stored directly, as if the host had resolved publicly at enqueue time
+    job = await queue.enqueue({"question": "bail"}, callback_url="https://127.0.0.1/hook")
+    await wait_for(queue, job["id"])
+    await queue.stop()
+
+    assert delivered == []
+    webhook = (await jobs.find_one({"id": job["id"]}))["webhook"]
+    assert "public address" in webhook["last_status"]
+    assert queue.stats()["webhooks_failed"] == 1
@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+
+from llm_client import LLMPool, MockProvider
+from llm_router import LLMRouter
+
+pytestmark = pytest.mark.anyio
+
+
+class FailingProvider(MockProvider):
+    async def complete(self, system, prompt):
+        self.calls += 1
+        await asyncio.sleep(self._delay())
+        raise RuntimeError("upstream error")
+
+    async def stream(self, system, prompt):
+        self.calls += 1
+        raise RuntimeError("upstream error")
+        yield
+
+
+def make_router(*providers, **kwargs):
+    pools = [LLMPool(provider, "system", name=f"route{i}") for i, provider in enumerate(providers)]
+    return LLMRouter(pools, **kwargs)
+
+
+async def test_single_pool_is_off():
+    router = make_router(MockProvider(reply="a"), policy="hedge")
+    assert router.policy == "off"
+    assert await router.complete("q", timeout=1) == "a"
+
+
+async def test_unknown_policy():
+    with pytest.raises(ValueError):
+        make_router(MockProvider(), MockProvider(), policy="fastest")
+
+
+async def test_hedge_answers_from_second_route_when_first_is_slow():
+    slow, fast = MockProvider(reply="slow", delay=1.0), MockProvider(reply="fast", delay=0.01)
+    router = make_router(slow, fast, policy="hedge", hedge_min_ms=20, hedge_max_ms=50)
+
+    assert await router.complete("q", timeout=2) == "fast"
+
+    stats = router.stats()
+    assert stats["hedges"] == 1
+    assert [route["wins"] for route in stats["routes"]] == [0, 1]
+    # The slow request is cancelled and its latency not recorded
+    assert stats["routes"][0]["cancelled"] == 1
+    assert stats["routes"][0]["samples"] == 0
+
+
+async def test_hedge_not_sent_when_first_route_answers_in_time():
+    first, second = MockProvider(reply="first", delay=0.01), MockProvider(reply="second")
+    router = make_router(first, second, policy="hedge", hedge_min_ms=200, hedge_max_ms=500)
+
+    assert await router.complete("q", timeout=2) == "first"
+    assert router.stats()["hedges"] == 0
+    assert second.calls == 0
+
+
+async def test_hedge_delay_follows_p95_within_bounds():
+    router = make_router(MockProvider(), MockProvider(), hedge_min_ms=100, hedge_max_ms=1000, min_samples=5)
+    route = router.routes[0]
+    assert router.hedge_delay(route) == 1.0
+    for ms in (200, 220, 240, 260, 300):
+        route.latency.record(ms)
+    assert router.hedge_delay(route) == 0.3
+    for _ in range(100):
+        route.latency.record(5000)
+    assert router.hedge_delay(route) == 1.0
+
+
+async def test_fallback_after_failure():
+    failing, working = FailingProvider(), MockProvider(reply="ok")
+    router = make_router(failing, working, policy="fallback")
+
+    assert await router.complete("q", timeout=1) == "ok"
+
+    stats = router.stats()
+    assert stats["fallbacks"] == 1
+    assert stats["hedges"] == 0
+    assert [route["failures"] for route in stats["routes"]] == [1, 0]
+
+
+async def test_last_error_raised_when_every_route_fails():
+    router = make_router(FailingProvider(), FailingProvider(), policy="fallback")
+    with pytest.raises(RuntimeError):
+        await router.complete("q", timeout=1)
+
+
+async def test_off_does_not_fall_back():
+    failing, working = FailingProvider(), MockProvider()
+    router = make_router(failing, working, policy="off")
+    with pytest.raises(RuntimeError):
+        await router.complete("q", timeout=1)
+    assert working.calls == 0
+
+
+async def test_deadline_covers_hedges():
+    router = make_router(MockProvider(delay=1.0), MockProvider(delay=1.0), policy="hedge", hedge_max_ms=20)
+    with pytest.raises(asyncio.TimeoutError):
+        await router.complete("q", timeout=0.1)
+
+
+async def test_fastest_route_is_tried_first():
+    first, second = MockProvider(reply="first"), MockProvider(reply="second")
+    router = make_router(first, second, policy="fallback", min_samples=3)
+    for _ in range(3):
+        router.routes[0].latency.record(900)
+        router.routes[1].latency.record(100)
+
+    assert await router.complete("q", timeout=1) == "second"
+    assert first.calls == 0
+
+
+async def test_stream_falls_back_before_first_chunk():
+    router = make_router(FailingProvider(), MockProvider(reply="streamed reply", chunk_size=4), policy="fallback")
+    chunks = [chunk async for chunk in router.stream("q", queue_timeout=1)]
+    assert "".join(chunks) == "streamed reply"
+    assert router.stats()["fallbacks"] == 1
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import metrics
+from log_writer import BatchedLogWriter
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeCollection:
+    def __init__(self, delay=0.0, error=None):
+        self.batches = []
+        self.delay = delay
+        self.error = error
+
+    async def insert_many(self, docs, ordered=True):
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        self.batches.append(list(docs))
+
+        class Result:
+            inserted_ids = list(range(len(docs)))
+
+        return Result()
+
+
+async def test_full_batch_flushes_without_waiting_for_interval():
+    collection = FakeCollection()
+    writer = BatchedLogWriter(collection, batch_size=3, flush_interval_ms=10000)
+    for i in range(3):
+        assert await writer.put({"i": i})
+    await asyncio.sleep(0.05)
+
+    assert collection.batches == [[{"i": 0}, {"i": 1}, {"i": 2}]]
+    await writer.stop()
+
+
+async def test_partial_batch_flushes_after_interval():
+    collection = FakeCollection()
+    writer = BatchedLogWriter(collection, batch_size=100, flush_interval_ms=20)
+    await writer.put({"i": 0})
+    await writer.put({"i": 1})
+    await asyncio.sleep(0.1)
+
+    assert collection.batches == [[{"i": 0}, {"i": 1}]]
+    assert writer.stats()["written"] == 2
+    await writer.stop()
+
+
+async def test_stop_flushes_queue_and_refuses_more():
+    collection = FakeCollection()
+    writer = BatchedLogWriter(collection, batch_size=100, flush_interval_ms=10000)
+    for i in range(5):
+        await writer.put({"i": i})
+    await writer.stop()
+
+    assert sum(len(batch) for batch in collection.batches) == 5
+    assert not await writer.put({"i": 5})
+    assert writer.stats()["dropped"] == 1
+
+
+async def test_drop_when_queue_full():
+    writer = BatchedLogWriter(FakeCollection(delay=1.0), batch_size=1, max_queue=2)
+    results = [await writer.put({"i": i}) for i in range(5)]
+
+    # put never waits with "drop", so the writer task has not taken any yet
+    assert results == [True, True, False, False, False]
+    assert writer.stats()["dropped"] == 3
+    await writer.stop(timeout=0.1)
+
+
+async def test_block_waits_for_space_then_drops():
+    writer = BatchedLogWriter(FakeCollection(delay=1.0), batch_size=1, max_queue=1, overflow="block", block_timeout=0.02)
+    await writer.put({"i": 0})
+    await asyncio.sleep(0)
+    await writer.put({"i": 1})
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    assert not await writer.put({"i": 2})
+    assert loop.time() - started >= 0.02
+    await writer.stop(timeout=0.1)
+
+
+async def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        BatchedLogWriter(FakeCollection(), overflow="spill")
+
+
+async def test_failed_flush_counted_and_writer_keeps_going():
+    collection = FakeCollection(error=ConnectionError("mongo down"))
+    writer = BatchedLogWriter(collection, batch_size=2, flush_interval_ms=10)
+    await writer.put({"i": 0})
+    await writer.put({"i": 1})
+    await asyncio.sleep(0.05)
+    assert writer.stats()["failed"] == 2
+
+    collection.error = None
+    await writer.put({"i": 2})
+    await writer.stop()
+    assert writer.stats()["written"] == 1
+    assert writer.stats()["flushes"] == 2
+
+
+async def test_partially_failed_flush():
+    error = BulkWriteError({"nInserted": 2, "writeErrors": [{"index": 2, "code": 11000}]})
+    writer = BatchedLogWriter(FakeCollection(error=error), batch_size=3, flush_interval_ms=10)
+    for i in range(3):
+        await writer.put({"i": i})
+    await writer.stop()
+
+    stats = writer.stats()
+    assert (stats["written"], stats["failed"]) == (2, 1)
+
+
+async def test_flushes_exported_by_outcome():
+    def flushes(outcome):
+        return metrics.log_flush_duration.labels("outcome_test", outcome).snapshot()[0]
+
+    collection = FakeCollection()
+    writer = BatchedLogWriter(collection, batch_size=1, flush_interval_ms=10, name="outcome_test")
+    await writer.put({"i": 0})
+    await asyncio.sleep(0.05)
+    collection.error = ConnectionError("mongo down")
+    await writer.put({"i": 1})
+    await writer.stop()
+
+    assert sum(flushes("ok")) == 1
+    assert sum(flushes("error")) == 1
+    assert 'adhikaar_log_flush_duration_seconds_count{collection="outcome_test",outcome="error"} 1' in metrics.registry.render()
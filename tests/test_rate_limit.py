@@ -0,0 +1,117 @@
+import pytest
+
+import rate_limit
+from rate_limit import LocalWindowStore, SlidingWindowLimiter, parse_rate
+
+pytestmark = pytest.mark.anyio
+
+
+class Clock:
+    def __init__(self, now: float):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class BrokenStore:
+    name = "broken"
+
+    async def incr(self, *args, **kwargs):
+        raise ConnectionError("store down")
+
+    async def decr(self, *args, **kwargs):
+        raise ConnectionError("store down")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Start of a minute bucket
+    clock = Clock(60 * 1000000)
+    monkeypatch.setattr(rate_limit.time, "time", clock)
+    return clock
+
+
+def test_parse_rate():
+    assert parse_rate("10/minute") == (10, 60)
+    assert parse_rate("100/5 minutes") == (100, 300)
+    assert parse_rate("1/day") == (1, 86400)
+    with pytest.raises(ValueError):
+        parse_rate("ten per minute")
+
+
+async def test_limit_within_window(clock):
+    limiter = SlidingWindowLimiter("3/minute")
+    assert [(await limiter.hit("a")).allowed for _ in range(4)] == [True, True, True, False]
+
+    refused = await limiter.hit("a")
+    assert not refused.allowed
+    assert refused.limit == 3
+    assert 1 <= refused.retry_after <= 60
+
+
+async def test_keys_are_independent(clock):
+    limiter = SlidingWindowLimiter("1/minute")
+    assert (await limiter.hit("a")).allowed
+    assert not (await limiter.hit("a")).allowed
+    assert (await limiter.hit("b")).allowed
+
+
+async def test_previous_bucket_weighted_by_overlap(clock):
+    limiter = SlidingWindowLimiter("4/minute")
+    for _ in range(4):
+        assert (await limiter.hit("a")).allowed
+
+    # Just into the next bucket the previous one still counts almost fully
+    clock.now += 61
+    assert not (await limiter.hit("a")).allowed
+
+    # Three quarters through it only a quarter of it does, which leaves room
+    # for three hits. A fresh limiter on the same store, since this one
+    # remembers the refusal until its retry time
+    clock.now += 44
+    limiter = SlidingWindowLimiter("4/minute", store=limiter.store)
+    assert [(await limiter.hit("a")).allowed for _ in range(4)] == [True, True, True, False]
+
+
+async def test_refusal_decided_locally_until_retry(clock):
+    limiter = SlidingWindowLimiter("1/minute")
+    await limiter.hit("a")
+    refused = await limiter.hit("a")
+    calls = limiter.stats()["store_calls"]
+
+    for _ in range(5):
+        assert not (await limiter.hit("a")).allowed
+    assert limiter.stats()["store_calls"] == calls
+
+    clock.now += refused.retry_after + 60
+    assert (await limiter.hit("a")).allowed
+
+
+async def test_lease_reserves_hits_per_store_call(clock):
+    limiter = SlidingWindowLimiter("10/minute", lease=5)
+    assert all([(await limiter.hit("a")).allowed for _ in range(10)])
+    assert not (await limiter.hit("a")).allowed
+
+    stats = limiter.stats()
+    assert stats["store_calls"] == 3
+    assert stats["decided_locally"] == 8
+
+
+async def test_lease_shared_between_workers(clock):
+    store = LocalWindowStore()
+    workers = [SlidingWindowLimiter("10/minute", store=store, lease=4) for _ in range(3)]
+    allowed = 0
+    for _ in range(6):
+        for worker in workers:
+            allowed += (await worker.hit("a")).allowed
+    assert allowed == 10
+
+
+async def test_broken_store_falls_back_to_local_counters(clock):
+    limiter = SlidingWindowLimiter("2/minute", store=BrokenStore())
+    assert [(await limiter.hit("a")).allowed for _ in range(3)] == [True, True, False]
+
+    stats = limiter.stats()
+    assert stats["fallbacks"] >= 1
+    assert stats["store"] == "broken"
@@ -0,0 +1,113 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+class Work:
+    def __init__(self, result="answer", error=None):
+        self.calls = 0
+        self.release = asyncio.Event()
+        self.cancelled = False
+        self.result = result
+        self.error = error
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def test_concurrent_callers_share_one_computation():
+    flights, work = SingleFlight(), Work()
+    callers = [asyncio.create_task(flights.do("q", work)) for _ in range(3)]
+    await asyncio.sleep(0)
+    assert flights.stats()["in_flight"] == 1
+    work.release.set()
+
+    results = await asyncio.gather(*callers)
+    assert [result for result, _ in results] == ["answer"] * 3
+    assert sorted(shared for _, shared in results) == [False, True, True]
+    assert work.calls == 1
+    assert flights.stats() == {"in_flight": 0, "started": 1, "joined": 2, "abandoned": 0}
+
+
+async def test_different_keys_run_separately():
+    flights, first, second = SingleFlight(), Work("a"), Work("b")
+    first.release.set()
+    second.release.set()
+    assert await asyncio.gather(flights.do("a", first), flights.do("b", second)) == [("a", False), ("b", False)]
+
+
+async def test_key_reusable_after_completion():
+    flights, work = SingleFlight(), Work()
+    work.release.set()
+    await flights.do("q", work)
+    await flights.do("q", work)
+    assert work.calls == 2
+
+
+async def test_error_reaches_every_caller_and_is_not_kept():
+    flights, work = SingleFlight(), Work(error=ValueError("bad answer"))
+    callers = [asyncio.create_task(flights.do("q", work)) for _ in range(2)]
+    await asyncio.sleep(0)
+    work.release.set()
+
+    results = await asyncio.gather(*callers, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flights.stats()["in_flight"] == 0
+
+
+async def test_starter_cancelled_others_still_get_result():
+    flights, work = SingleFlight(), Work()
+    starter = asyncio.create_task(flights.do("q", work))
+    await asyncio.sleep(0)
+    joiner = asyncio.create_task(flights.do("q", work))
+    await asyncio.sleep(0)
+
+    starter.cancel()
+    await asyncio.sleep(0)
+    assert not work.cancelled
+    work.release.set()
+
+    assert await joiner == ("answer", True)
+    with pytest.raises(asyncio.CancelledError):
+        await starter
+    assert flights.stats()["abandoned"] == 0
+
+
+async def test_work_cancelled_when_every_caller_is_gone():
+    flights, work = SingleFlight(), Work()
+    callers = [asyncio.create_task(flights.do("q", work)) for _ in range(2)]
+    await asyncio.sleep(0)
+    for caller in callers:
+        caller.cancel()
+    await asyncio.gather(*callers, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert work.cancelled
+    assert flights.stats()["abandoned"] == 1
+    assert flights.stats()["in_flight"] == 0
+
+
+async def test_join_only_waits_for_existing_flight():
+    flights, work = SingleFlight(), Work()
+    assert await flights.join("q") == (False, None)
+
+    starter = asyncio.create_task(flights.do("q", work))
+    await asyncio.sleep(0)
+    joiner = asyncio.create_task(flights.join("q"))
+    await asyncio.sleep(0)
+    work.release.set()
+
+    assert await joiner == (True, "answer")
+    assert await starter == ("answer", False)
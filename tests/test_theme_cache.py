@@ -0,0 +1,120 @@
+import importlib
+
+import pytest
+
+from theme_cache import ANY_OWNER, INITIAL_VERSION, ThemeCache, etag_matches
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+pytestmark = pytest.mark.anyio
+
+
+class FlakyVersions:
+    """A theme_versions collection whose writes fail while ``down`` is set"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.down = True
+
+    def __getattr__(self, name):
+        return getattr(self.collection, name)
+
+    async def bulk_write(self, *args, **kwargs):
+        if self.down:
+            raise ConnectionError("mongo down")
+        return await self.collection.bulk_write(*args, **kwargs)
+
+
+@pytest.fixture
+def versions():
+    return mongomock_motor.AsyncMongoMockClient()["adhikaar_test"].theme_versions
+
+
+def test_etag_matches():
+    etag = ThemeCache.etag("u1", "user", "v1")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", {etag.removeprefix("W/")}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches(ThemeCache.etag("u1", "user", "v2"), etag)
+
+
+async def test_bump_changes_owner_and_anonymous_versions(versions):
+    cache = ThemeCache(versions)
+    assert await cache.version("u1") == INITIAL_VERSION
+    cache.put("u1", "user", INITIAL_VERSION, b"[]")
+    assert cache.get("u1", "user", INITIAL_VERSION) == b"[]"
+
+    await cache.bump("u1")
+
+    version = await cache.version("u1")
+    assert version != INITIAL_VERSION
+    assert await cache.version(ANY_OWNER) == version
+    assert cache.get("u1", "user", version) is None
+    # Another worker reads the new version from Mongo
+    assert await ThemeCache(versions).version("u1") == version
+
+
+async def test_failed_bump_is_kept_and_stored_later(versions):
+    flaky = FlakyVersions(versions)
+    cache = ThemeCache(flaky, version_ttl=0, retry_interval=0)
+
+    await cache.bump("u1")
+    stats = cache.stats()
+    assert (stats["bump_failures"], stats["pending_bumps"]) == (1, 2)
+
+    # This worker already serves the new version, even past version_ttl
+    version = await cache.version("u1")
+    assert version != INITIAL_VERSION
+    assert await ThemeCache(versions).version("u1") == INITIAL_VERSION
+
+    flaky.down = False
+    assert await cache.version(ANY_OWNER) == version
+    assert cache.stats()["pending_bumps"] == 0
+    assert await ThemeCache(versions).version("u1") == version
+
+
+async def test_pending_bump_retried_at_most_every_interval(versions):
+    flaky = FlakyVersions(versions)
+    cache = ThemeCache(flaky, retry_interval=60)
+    await cache.bump("u1")
+    await cache.version("u1")
+    await cache.version("u1")
+    assert cache.stats()["bump_failures"] == 1
+
+
+@pytest.fixture
+def server(monkeypatch):
+    # server.py needs the emergentintegrations package; Mongo is replaced by mongomock
+    pytest.importorskip("emergentintegrations")
+    import motor.motor_asyncio
+
+    monkeypatch.setattr(motor.motor_asyncio, "AsyncIOMotorClient", mongomock_motor.AsyncMongoMockClient)
+    return importlib.import_module("server")
+
+
+async def test_theme_write_succeeds_when_bump_fails(server):
+    import httpx
+
+    flaky = FlakyVersions(server.theme_cache.versions)
+    server.theme_cache.versions = flaky
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as client:
+            before = await client.get("/api/v1/themes")
+
+            response = await client.post("/api/v1/themes", json={"name": "Dark", "tokens": {"bg": "#000"}})
+            assert response.status_code == 200
+            assert await server.db.themes.count_documents({"name": "Dark"}) == 1
+            assert server.theme_cache.stats()["pending_bumps"] == 1
+
+            # The client's cached listing is not reported as unchanged
+            after = await client.get("/api/v1/themes", headers={"If-None-Match": before.headers["ETag"]})
+            assert after.status_code == 200
+            assert [theme["name"] for theme in after.json()["themes"]] == ["Dark"]
+
+            flaky.down = False
+            server.theme_cache._retry_at = 0
+            await client.get("/api/v1/themes")
+            assert server.theme_cache.stats()["pending_bumps"] == 0
+    finally:
+        server.theme_cache.versions = flaky.collection
@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+
+from translation import TranslationCache, TranslationError, Translator, answer_language
+
+pytestmark = pytest.mark.anyio
+
+ANSWER = {
+    "title": "Bail",
+    "summary": "You can apply for bail.",
+    "steps": ["Hire a lawyer", "Apply to the court"],
+    "template": None,
+    "sources": [{"title": "CrPC", "url": "https://example.org"}],
+}
+
+
+class FakeLLM:
+    """Replies with each string in the prompt's JSON array upper-cased"""
+
+    def __init__(self, reply=None, delay=0.0):
+        self.prompts = []
+        self.reply = reply
+        self.delay = delay
+
+    async def __call__(self, prompt):
+        self.prompts.append(prompt)
+        await asyncio.sleep(self.delay)
+        if self.reply is not None:
+            return self.reply
+        texts = json.loads(prompt[prompt.index("["):])
+        return "```json\n" + json.dumps([text.upper() for text in texts]) + "\n```"
+
+
+@pytest.mark.parametrize("lang, expected", [("hi", "hi"), ("hi-IN", "hi"), ("TA_in", "ta"), ("fr", "en"), (None, "en")])
+def test_answer_language(lang, expected):
+    assert answer_language(lang) == expected
+
+
+async def test_english_is_not_translated():
+    llm = FakeLLM()
+    assert await Translator(llm, TranslationCache()).translate_answer(ANSWER, "en") is ANSWER
+    assert llm.prompts == []
+
+
+async def test_answer_translated_in_one_call_and_then_cached():
+    llm, cache = FakeLLM(), TranslationCache()
+    translator = Translator(llm, cache)
+
+    result = await translator.translate_answer(ANSWER, "hi")
+    assert result["title"] == "BAIL"
+    assert result["steps"] == ["HIRE A LAWYER", "APPLY TO THE COURT"]
+    assert result["template"] is None
+    assert result["sources"] == ANSWER["sources"]
+    assert result["lang"] == "hi"
+    assert "Hindi" in llm.prompts[0]
+
+    # Only the new step is sent the second time
+    other = {**ANSWER, "steps": ["Hire a lawyer", "Keep the receipt"]}
+    assert (await translator.translate_answer(other, "hi"))["steps"] == ["HIRE A LAWYER", "KEEP THE RECEIPT"]
+    assert len(llm.prompts) == 2
+    assert json.loads(llm.prompts[1][llm.prompts[1].index("["):]) == ["Keep the receipt"]
+
+    # Cached per language
+    await translator.translate_answer(ANSWER, "ta")
+    assert len(llm.prompts) == 3
+
+
+async def test_repeated_strings_translated_once():
+    llm = FakeLLM()
+    translated = await Translator(llm, TranslationCache()).translate_texts(["a", "b", "a"], "hi")
+    assert translated == ["A", "B", "A"]
+    assert json.loads(llm.prompts[0][llm.prompts[0].index("["):]) == ["a", "b"]
+
+
+async def test_concurrent_requests_share_one_call():
+    llm = FakeLLM(delay=0.02)
+    translator = Translator(llm, TranslationCache())
+    results = await asyncio.gather(*[translator.translate_answer(ANSWER, "hi") for _ in range(3)])
+    assert all(result == results[0] for result in results)
+    assert len(llm.prompts) == 1
+
+
+@pytest.mark.parametrize("reply", ["no array here", '["only one"]', '["A", ""]', "[not json]"])
+async def test_bad_reply_raises_and_is_not_cached(reply):
+    llm, cache = FakeLLM(reply=reply), TranslationCache()
+    translator = Translator(llm, cache)
+    with pytest.raises(TranslationError):
+        await translator.translate_texts(["a", "b"], "hi")
+    assert translator.stats()["failures"] == 1
+    assert cache.stats()["size"] == 0
+
+
+async def test_lru_bounded():
+    cache = TranslationCache(max_entries=2)
+    await cache.set_many({"a": "A", "b": "B", "c": "C"}, "hi")
+    assert await cache.get_many(["a", "b", "c"], "hi") == {"b": "B", "c": "C"}
+    assert cache.stats()["misses"] == 1
+
+
+async def test_mongo_mirror_shared_between_workers():
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    collection = mongomock_motor.AsyncMongoMockClient()["adhikaar_test"].translations
+
+    await TranslationCache(collection=collection).set_many({"a": "A"}, "hi")
+    doc = await collection.find_one({})
+    assert doc["lang"] == "hi"
+    assert doc["created_at"] is not None
+
+    other_worker = TranslationCache(collection=collection)
+    assert await other_worker.get_many(["a", "b"], "hi") == {"a": "A"}
+    stats = other_worker.stats()
+    assert (stats["mongo_hits"], stats["misses"]) == (1, 1)
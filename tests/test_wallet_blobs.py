@@ -0,0 +1,115 @@
+import random
+import string
+
+import pytest
+
+from wallet_blobs import WalletBlobs, content_hash, migrate
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+pytestmark = pytest.mark.anyio
+
+LONG = "Respected Sir, I wish to file a complaint. " * 50
+
+
+@pytest.fixture
+def db():
+    return mongomock_motor.AsyncMongoMockClient()["adhikaar_test"]
+
+
+@pytest.fixture
+def blobs(db):
+    return WalletBlobs(db.wallet_blobs, compress_min_bytes=100)
+
+
+async def refs(db, body):
+    blob = await db.wallet_blobs.find_one({"_id": content_hash(body)})
+    return blob["refs"] if blob else 0
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError):
+        WalletBlobs(None, codec="lz4")
+
+
+def test_encode_compresses_only_when_smaller(blobs):
+    short = blobs.encode("short")
+    assert (short["encoding"], short["data"], short["size"]) == ("raw", "short", 5)
+
+    long = blobs.encode(LONG)
+    assert long["encoding"] == "zlib"
+    assert len(long["data"]) < long["size"] == len(LONG.encode())
+    assert WalletBlobs.decode(long) == LONG
+
+    incompressible = "".join(random.Random(0).choices(string.ascii_letters + string.digits, k=120))
+    assert blobs.encode(incompressible)["encoding"] == "raw"
+
+
+async def test_acquire_counts_references(db, blobs):
+    refs_taken = await blobs.acquire([LONG, "short", LONG])
+    assert refs_taken == [(content_hash(LONG), len(LONG)), (content_hash("short"), 5), (content_hash(LONG), len(LONG))]
+    assert await refs(db, LONG) == 2
+    assert await refs(db, "short") == 1
+
+    await blobs.acquire([LONG])
+    assert await refs(db, LONG) == 3
+    assert await db.wallet_blobs.count_documents({}) == 2
+
+
+async def test_release_deletes_blob_at_zero(db, blobs):
+    [(key, _)] = await blobs.acquire(["hello"])
+    await blobs.acquire(["hello"])
+
+    await blobs.release([key])
+    assert await refs(db, "hello") == 1
+    assert await blobs.fetch([key]) == {key: "hello"}
+
+    await blobs.release([key])
+    assert await db.wallet_blobs.count_documents({}) == 0
+    assert await blobs.fetch([key]) == {}
+    assert blobs.stats()["blobs_deleted"] == 1
+
+
+async def test_release_same_hash_twice_in_one_call(db, blobs):
+    [(key, _)] = await blobs.acquire(["hello"])
+    await blobs.acquire(["hello", "hello"])
+    await blobs.release([key, key])
+    assert await refs(db, "hello") == 1
+
+
+async def test_fetch_uses_cache(db, blobs):
+    [(key, _)] = await blobs.acquire([LONG])
+    assert await blobs.fetch([key]) == {key: LONG}
+    assert blobs.stats()["cache_hits"] == 1
+
+    cold = WalletBlobs(db.wallet_blobs)
+    assert await cold.fetch([key]) == {key: LONG}
+    assert cold.stats()["cache_misses"] == 1
+
+
+async def test_inline_serves_blob_and_inline_entries(blobs):
+    [(key, size)] = await blobs.acquire([LONG])
+    docs = [
+        {"id": "new", "content_hash": key, "content_size": size},
+        {"id": "old", "content": "stored inline"},
+        {"id": "broken", "content_hash": content_hash("missing"), "content_size": 7},
+    ]
+    docs = await blobs.inline(docs)
+    assert [doc["content"] for doc in docs] == [LONG, "stored inline", ""]
+    assert all("content_hash" not in doc and "content_size" not in doc for doc in docs)
+
+
+async def test_migrate_moves_inline_bodies(db, blobs):
+    await db.wallet_docs.insert_many([{"id": str(i), "content": LONG} for i in range(3)] + [{"id": "x", "content": "short"}])
+
+    dry = await migrate(db, blobs, batch_size=2, dry_run=True)
+    assert dry == {"scanned": 4, "migrated": 0, "skipped": 0}
+
+    progress = await migrate(db, blobs, batch_size=2)
+    assert progress == {"scanned": 4, "migrated": 4, "skipped": 0}
+    assert await db.wallet_docs.count_documents({"content": {"$exists": True}}) == 0
+    assert await refs(db, LONG) == 3
+    assert await refs(db, "short") == 1
+
+    # Nothing left to move
+    assert (await migrate(db, blobs))["scanned"] == 0
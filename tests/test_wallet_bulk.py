@@ -0,0 +1,182 @@
+import asyncio
+import json
+import uuid
+
+import pytest
+
+from wallet_blobs import WalletBlobs, content_hash
+from wallet_bulk import BulkRequestError, WalletBulkWriter
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+pytestmark = pytest.mark.anyio
+
+BODY = "Respected Sir, I wish to file a complaint. " * 50
+
+
+def make_doc(item, user_id):
+    if not isinstance(item.get("title"), str) or not isinstance(item.get("content"), str):
+        raise ValueError("title and content are required")
+    return {"id": str(uuid.uuid4()), "user_id": user_id, "title": item["title"], "content": item["content"], "tags": item.get("tags", [])}
+
+
+@pytest.fixture
+def db():
+    return mongomock_motor.AsyncMongoMockClient()["adhikaar_test"]
+
+
+@pytest.fixture
+def blobs(db):
+    return WalletBlobs(db.wallet_blobs, compress_min_bytes=100)
+
+
+@pytest.fixture
+def writer(db, blobs):
+    return WalletBulkWriter(db.wallet_docs, make_doc, blobs, max_items=20, max_bytes=64 * 1024, batch_size=3)
+
+
+async def chunks_of(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+async def run_json(writer, user_id, operations):
+    return await writer.run(user_id, chunks_of(json.dumps({"operations": operations}).encode()), "application/json")
+
+
+async def run_ndjson(writer, user_id, lines):
+    return await writer.run(user_id, chunks_of(*[(line + "\n").encode() for line in lines]), "application/x-ndjson")
+
+
+async def refs(db, body=BODY):
+    blob = await db.wallet_blobs.find_one({"_id": content_hash(body)})
+    return blob["refs"] if blob else 0
+
+
+async def insert(writer, user_id, count, body=BODY):
+    result = await run_json(writer, user_id, [{"op": "insert", "title": f"t{i}", "content": body} for i in range(count)])
+    return [item["id"] for item in result["results"]]
+
+
+async def test_inserts_share_one_compressed_blob(db, blobs, writer):
+    result = await run_json(writer, "u1", [{"op": "insert", "title": f"t{i}", "content": BODY, "tags": ["fir"]} for i in range(5)])
+
+    assert result["inserted"] == 5
+    assert result["failed"] == 0
+    assert result["truncated"] is None
+    assert await refs(db) == 5
+    blob = await db.wallet_blobs.find_one({"_id": content_hash(BODY)})
+    assert blob["encoding"] == "zlib"
+
+    doc = await db.wallet_docs.find_one({"id": result["results"][0]["id"]}, {"_id": 0})
+    assert "content" not in doc
+    assert doc["content_hash"] == content_hash(BODY)
+    assert (await blobs.inline([doc]))[0]["content"] == BODY
+    # Five operations in batches of three
+    assert writer.stats()["bulk_writes"] == 2
+
+
+async def test_each_operation_gets_its_own_result(db, writer):
+    ids = await insert(writer, "u1", 2)
+    foreign = await insert(writer, "u2", 1)
+
+    result = await run_ndjson(writer, "u1", [
+        json.dumps({"op": "tag", "id": ids[0], "add": ["bail"], "remove": ["x"]}),
+        "{not json",
+        json.dumps({"op": "rename", "id": ids[0]}),
+        json.dumps({"op": "delete"}),
+        json.dumps({"op": "insert", "title": "no content"}),
+        json.dumps({"op": "delete", "id": foreign[0]}),
+        json.dumps({"op": "tag", "id": ids[1], "add": ["a"], "remove": ["a"]}),
+    ])
+
+    assert [(item["ok"], item.get("status")) for item in result["results"]] == [
+        (True, None), (False, 400), (False, 400), (False, 400), (False, 422), (False, 404), (False, 400),
+    ]
+    assert [item["index"] for item in result["results"]] == list(range(7))
+    assert (result["updated"], result["failed"]) == (1, 6)
+    assert (await db.wallet_docs.find_one({"id": ids[0]}))["tags"] == ["bail"]
+    assert await db.wallet_docs.find_one({"id": foreign[0]}) is not None
+
+
+async def test_delete_releases_blob_once(db, writer):
+    ids = await insert(writer, "u1", 2)
+
+    result = await run_json(writer, "u1", [{"op": "delete", "id": ids[0]}, {"op": "delete", "id": ids[0]}])
+    assert [(item["ok"], item.get("status")) for item in result["results"]] == [(True, None), (False, 404)]
+    assert await refs(db) == 1
+
+    await run_json(writer, "u1", [{"op": "delete", "id": ids[1]}])
+    assert await db.wallet_blobs.count_documents({}) == 0
+
+
+async def test_concurrent_deletes_release_blob_once(db, writer):
+    ids = await insert(writer, "u1", 2)
+    collection = writer.collection
+    both_read = asyncio.Barrier(2)
+
+    class InterleavedCollection:
+        """Both requests read ownership before either of them writes"""
+
+        def __getattr__(self, name):
+            return getattr(collection, name)
+
+        async def bulk_write(self, *args, **kwargs):
+            await both_read.wait()
+            return await collection.bulk_write(*args, **kwargs)
+
+    writer.collection = InterleavedCollection()
+    results = await asyncio.gather(*[run_json(writer, "u1", [{"op": "delete", "id": ids[0]}]) for _ in range(2)])
+
+    assert sorted(result["deleted"] for result in results) == [0, 1]
+    assert await refs(db) == 1
+    assert writer.stats()["bulk_writes"] == 3
+
+
+async def test_partly_raced_batch_keeps_references(db, writer):
+    ids = await insert(writer, "u1", 3)
+    collection = writer.collection
+
+    class RacingCollection:
+        """Another request deletes one of the entries between the ownership read and the write"""
+
+        def __getattr__(self, name):
+            return getattr(collection, name)
+
+        async def bulk_write(self, *args, **kwargs):
+            await collection.delete_one({"id": ids[0]})
+            return await collection.bulk_write(*args, **kwargs)
+
+    writer.collection = RacingCollection()
+    result = await run_json(writer, "u1", [{"op": "delete", "id": ids[0]}, {"op": "delete", "id": ids[1]}])
+
+    assert result["deleted"] == 2
+    assert await db.wallet_docs.count_documents({}) == 1
+    # Which of the two this request removed is unknown, so neither is released
+    assert await refs(db) == 3
+
+
+async def test_ndjson_over_max_bytes_is_truncated(db, writer):
+    writer.max_bytes = 200
+    lines = [json.dumps({"op": "insert", "title": f"t{i}", "content": "short"}) for i in range(10)]
+
+    result = await writer.run("u1", chunks_of(*[(line + "\n").encode() for line in lines]), "application/x-ndjson")
+
+    assert result["truncated"] == "Request body is larger than 200 bytes"
+    assert 0 < result["inserted"] < 10
+    assert await db.wallet_docs.count_documents({}) == result["inserted"]
+
+
+async def test_json_over_max_bytes_is_rejected(db, writer):
+    writer.max_bytes = 200
+    with pytest.raises(BulkRequestError) as e:
+        await run_json(writer, "u1", [{"op": "insert", "title": f"t{i}", "content": "short"} for i in range(10)])
+    assert e.value.status == 413
+    assert await db.wallet_docs.count_documents({}) == 0
+
+
+async def test_max_items_truncates(writer):
+    writer.max_items = 2
+    result = await run_json(writer, "u1", [{"op": "insert", "title": f"t{i}", "content": "short"} for i in range(3)])
+    assert result["inserted"] == 2
+    assert result["truncated"] == "More than 2 operations"
@@ -0,0 +1,123 @@
+import logging
+
+import httpx
+import pytest
+
+from web_search import CircuitBreaker, GoogleSearchClient
+
+pytestmark = pytest.mark.anyio
+
+CSE_RESPONSE = {
+    "items": [
+        {"title": "Section 154 CrPC", "link": "https://example.org/154", "snippet": "Information in cognizable cases"},
+        {"link": "https://example.org/untitled", "snippet": "x" * 300},
+    ]
+}
+
+
+def make_client(handler, **kwargs):
+    client = GoogleSearchClient("secret-key", "cse-id", **kwargs)
+    client._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return client
+
+
+async def test_search_parses_results():
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json=CSE_RESPONSE)
+
+    client = make_client(handler, endpoint="https://cse.test/v1")
+    results = await client.search("police refused FIR", num=2)
+    await client.close()
+
+    assert results == [
+        {"title": "Section 154 CrPC", "url": "https://example.org/154", "type": "Search Result", "snippet": "Information in cognizable cases"},
+        {"title": "Untitled", "url": "https://example.org/untitled", "type": "Search Result", "snippet": "x" * 200},
+    ]
+    params = requests[0].url.params
+    assert requests[0].url.host == "cse.test"
+    assert params["key"] == "secret-key"
+    assert params["cx"] == "cse-id"
+    assert params["q"] == "police refused FIR India law legal"
+    assert params["num"] == "2"
+
+
+async def test_results_cached_by_normalized_query():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=CSE_RESPONSE)
+
+    client = make_client(handler)
+    first = await client.search("Police refused FIR")
+    first[0]["title"] = "changed by caller"
+    second = await client.search("  police   refused fir ")
+    await client.close()
+
+    assert len(calls) == 1
+    assert second[0]["title"] == "Section 154 CrPC"
+
+
+async def test_no_items_is_none():
+    client = make_client(lambda request: httpx.Response(200, json={}))
+    assert await client.search("nothing") is None
+    await client.close()
+
+
+async def test_disabled_without_credentials():
+    client = GoogleSearchClient("", "cse-id")
+    assert not client.enabled
+    assert await client.search("anything") is None
+    assert client._client is None
+
+
+async def test_failure_cached_and_key_not_logged(caplog):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+
+    client = make_client(handler)
+    with caplog.at_level(logging.ERROR, logger="web_search"):
+        assert await client.search("query") is None
+        assert await client.search("query") is None
+    await client.close()
+
+    assert len(calls) == 1
+    assert "HTTP 500" in caplog.text
+    assert "secret-key" not in caplog.text
+
+
+async def test_breaker_stops_requests_while_open():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("refused", request=request)
+
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = make_client(handler, breaker=breaker)
+    for i in range(4):
+        assert await client.search(f"query {i}") is None
+    await client.close()
+
+    assert len(calls) == 2
+    assert breaker.state == "open"
+
+
+async def test_breaker_half_open_probe_closes_on_success():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    client = make_client(lambda request: httpx.Response(200, json=CSE_RESPONSE), breaker=breaker)
+    breaker.release()
+    assert await client.search("query") is not None
+    await client.close()
+    assert breaker.state == "closed"